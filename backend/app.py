@@ -14,10 +14,10 @@ import os
 # Force CPU mode to avoid GPU memory conflicts during training
 os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import (FastAPI, File, UploadFile, HTTPException, Query, Request, WebSocket, WebSocketDisconnect,
+                     Depends, Header)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
-from ultralytics import YOLO
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse, Response
 import cv2
 import numpy as np
 from PIL import Image
@@ -26,8 +26,39 @@ import json
 from datetime import datetime
 from pathlib import Path
 import base64
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
+import asyncio
+import time
+import copy
+import threading
+import uuid
+import zipfile
+import tempfile
+import shutil
+import hashlib
+import hmac
+import queue
+import sqlite3
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from detection_ops import IoUTracker, format_track, greedy_nms, make_tiles, merge_tile_detections, pairwise_iou
+
+# ultralytics / torch are imported on first use (see import_inference_libraries) so the
+# API process starts and answers /health while the model is still loading
+
+try:
+    import psutil  # Optional: portable process memory for /metrics
+except ImportError:
+    psutil = None
+
+try:
+    import msgpack  # Optional: compact MessagePack responses (Accept: application/msgpack)
+except ImportError:
+    msgpack = None
 
 # Configure logging
 logging.basicConfig(
@@ -50,6 +81,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Falcon-Meta"],
 )
 
 # Global variables
@@ -57,6 +89,89 @@ model = None
 MODEL_PATH = "../runs/train/falcon_yolov8m_final/weights/best.pt"
 CONFIDENCE_THRESHOLD = 0.15  # Lowered for better detection
 IOU_THRESHOLD = 0.45
+CLASS_THRESHOLDS_PATH = os.environ.get('FALCON_CLASS_THRESHOLDS', 'class_thresholds.json')  # From tune_thresholds.py
+IMAGE_SIZE = 640
+
+# Fast preprocessing - reduced-resolution JPEG decode and letterboxing into a reusable buffer
+FAST_PREPROCESS = os.environ.get('FALCON_FAST_PREPROCESS', '1') == '1'
+REDUCED_DECODE = os.environ.get('FALCON_REDUCED_DECODE', '1') == '1'
+REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+# Serving backend - exported models are produced by export_model.py
+# 'pytorch', 'onnx', 'openvino', or the INT8 variants 'onnx_int8' / 'openvino_int8'
+MODEL_BACKEND = os.environ.get('FALCON_MODEL_BACKEND', 'pytorch')
+PARITY_TOLERANCE = float(os.environ.get('FALCON_PARITY_TOLERANCE', '0.02'))  # Max confidence difference
+PARITY_TOLERANCE_INT8 = float(os.environ.get('FALCON_PARITY_TOLERANCE_INT8', '0.1'))
+PARITY_IMAGE = os.environ.get('FALCON_PARITY_IMAGE', '')
+model_backend = None
+
+# Model registry - named model versions that can be swapped without a restart
+DEFAULT_MODEL_NAME = os.environ.get('FALCON_DEFAULT_MODEL_NAME', 'default')
+EXTRA_MODELS = os.environ.get('FALCON_MODELS', '')  # "name=path,name=path", loaded (inactive) at startup
+MODEL_WATCH_INTERVAL = float(os.environ.get('FALCON_MODEL_WATCH_INTERVAL', '0'))  # Seconds, 0 = no file watcher
+MAX_WORKER_MODELS = int(os.environ.get('FALCON_MAX_WORKER_MODELS', '3'))  # Model copies kept per worker
+ADMIN_TOKEN = os.environ.get('FALCON_ADMIN_TOKEN', '')  # Required as X-Admin-Token to change models; unset = disabled
+model_watcher = None
+
+# Startup - the model loads in the background; /health is liveness, /ready is readiness
+BACKGROUND_STARTUP = os.environ.get('FALCON_BACKGROUND_STARTUP', '1') == '1'  # 0 = block startup until ready
+WARMUP_BATCH_SIZES = os.environ.get('FALCON_WARMUP_BATCH_SIZES', '')  # e.g. "1,4,8"; default 1, 2, 4 .. BATCH_MAX_SIZE
+WARMUP_RUNS = int(os.environ.get('FALCON_WARMUP_RUNS', '1'))  # Warm-up inferences per batch size, 0 disables
+WARMUP_BARRIER_TIMEOUT = 60.0  # Seconds a thread worker waits for the others during warm-up
+startup_state = {"status": "starting", "timings": {}}
+startup_task = None
+
+# Multi-process serving (python app.py) - HTTP workers forked after the model is loaded
+SERVER_WORKERS = int(os.environ.get('FALCON_SERVER_WORKERS', '1'))
+SERVER_HOST = os.environ.get('FALCON_HOST', '0.0.0.0')
+SERVER_PORT = int(os.environ.get('FALCON_PORT', '8000'))
+TORCH_THREADS = int(os.environ.get('FALCON_TORCH_THREADS', '0'))  # Intra-op threads per server worker, 0 = cores / workers
+CPU_AFFINITY = os.environ.get('FALCON_CPU_AFFINITY', '1') == '1'  # Pin each server worker to its own cores (Linux)
+
+# Inference worker pool - keeps blocking model.predict() off the event loop
+INFERENCE_EXECUTOR = os.environ.get('FALCON_INFERENCE_EXECUTOR', 'thread')  # 'thread' or 'process'
+INFERENCE_WORKERS = int(os.environ.get('FALCON_INFERENCE_WORKERS', '1'))
+INFERENCE_QUEUE_SIZE = int(os.environ.get('FALCON_INFERENCE_QUEUE_SIZE', '4'))  # Waiting jobs beyond busy workers
+RETRY_AFTER_SECONDS = int(os.environ.get('FALCON_RETRY_AFTER_SECONDS', '1'))
+
+# Micro-batching - requests arriving within the window share one model.predict() call
+BATCH_MAX_SIZE = int(os.environ.get('FALCON_BATCH_MAX_SIZE', '8'))
+BATCH_WINDOW_MS = float(os.environ.get('FALCON_BATCH_WINDOW_MS', '10'))
+
+# Batch uploads (/predict/batch)
+DECODE_WORKERS = int(os.environ.get('FALCON_DECODE_WORKERS', '4'))  # Parallel image decoding
+BATCH_UPLOAD_CHUNK_SIZE = int(os.environ.get('FALCON_BATCH_UPLOAD_CHUNK_SIZE', '8'))
+BATCH_ADMISSION_POLL_SECONDS = 0.05
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+# Tiled inference (opt-in per request) - keeps small objects in high-resolution images at full size
+TILE_SIZE = int(os.environ.get('FALCON_TILE_SIZE', '640'))  # Tile side in original image pixels
+TILE_OVERLAP = float(os.environ.get('FALCON_TILE_OVERLAP', '0.2'))  # Fraction of a tile shared with its neighbour
+TILE_BATCH_SIZE = int(os.environ.get('FALCON_TILE_BATCH_SIZE', '8'))  # Tiles per model call
+TILE_FULL_IMAGE = os.environ.get('FALCON_TILE_FULL_IMAGE', '1') == '1'  # Extra whole-image pass for large objects
+TILE_MERGE_THRESHOLD = float(os.environ.get('FALCON_TILE_MERGE_THRESHOLD', '0.6'))  # Intersection over smaller box
+
+# Video ingestion (/predict/video) - sampled frames, linked into per-object tracks
+VIDEO_STRIDE = int(os.environ.get('FALCON_VIDEO_STRIDE', '5'))  # Every Nth frame is a sampling candidate
+VIDEO_BATCH_SIZE = int(os.environ.get('FALCON_VIDEO_BATCH_SIZE', '8'))  # Sampled frames per inference chunk
+VIDEO_SCENE_THRESHOLD = float(os.environ.get('FALCON_VIDEO_SCENE_THRESHOLD', '0.08'))  # Mean gray difference, 0-1
+VIDEO_KEYFRAME_INTERVAL = int(os.environ.get('FALCON_VIDEO_KEYFRAME_INTERVAL', '150'))  # Scene mode: sample at least every N frames
+VIDEO_TRACK_IOU = float(os.environ.get('FALCON_VIDEO_TRACK_IOU', '0.3'))
+if not 0 < VIDEO_TRACK_IOU <= 1:
+    raise ValueError(f"FALCON_VIDEO_TRACK_IOU must be in (0, 1], got {VIDEO_TRACK_IOU}")
+VIDEO_TRACK_HIGH_THRESHOLD = float(os.environ.get('FALCON_VIDEO_TRACK_HIGH_THRESHOLD', '0.4'))  # Can start a track
+VIDEO_TRACK_MAX_AGE = int(os.environ.get('FALCON_VIDEO_TRACK_MAX_AGE', '3'))  # Sampled frames a track survives unmatched
+VIDEO_MIN_TRACK_HITS = int(os.environ.get('FALCON_VIDEO_MIN_TRACK_HITS', '2'))  # Shorter tracks are dropped as flicker
+
+inference_executor = None
+inference_batcher = None
+decode_executor = None
+inflight_inferences = 0
+_worker_state = threading.local()
 
 # Class names
 CLASS_NAMES = [
@@ -69,12 +184,190 @@ CLASS_NAMES = [
     'Fire_Extinguisher'
 ]
 
-# Detection history (in-memory storage)
-detection_history = []
+# Annotated image rendering (/predict/image?render=...)
+RENDER_JPEG_QUALITY = int(os.environ.get('FALCON_RENDER_JPEG_QUALITY', '80'))
+RENDER_MAX_SIDE = int(os.environ.get('FALCON_RENDER_MAX_SIDE', '1280'))  # 0 = original size
+RENDER_STORE_SIZE = int(os.environ.get('FALCON_RENDER_STORE_SIZE', '64'))  # Images kept for render=url
+# Compact response formats, chosen with the Accept header on /predict/image and /predict/base64
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack')
+PACKED_BOXES_MEDIA_TYPE = 'application/x-falcon-boxes'  # Little-endian float32 rows, metadata in X-Falcon-Meta
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+LABEL_FONT_SCALE = 0.7
+LABEL_FONT_THICKNESS = 2
+rendered_images = OrderedDict()
+
+# Result cache for repeated images
+RESULT_CACHE_SIZE = int(os.environ.get('FALCON_RESULT_CACHE_SIZE', '256'))  # 0 disables the cache
+RESULT_CACHE_TTL = float(os.environ.get('FALCON_RESULT_CACHE_TTL', '600'))  # Seconds
+model_version = 0  # Incremented on every model load, part of the cache key
+
+# Frame-difference gating for webcam sessions (/predict/base64 with "session", /ws/detect)
+FRAME_GATE_THRESHOLD = float(os.environ.get('FALCON_FRAME_GATE_THRESHOLD', '0.015'))  # Mean gray difference, 0-1; 0 disables
+FRAME_GATE_MAX_STALENESS = float(os.environ.get('FALCON_FRAME_GATE_MAX_STALENESS', '1.0'))  # Seconds a result may be reused
+FRAME_GATE_MAX_SESSIONS = int(os.environ.get('FALCON_FRAME_GATE_MAX_SESSIONS', '256'))  # Least recently seen are dropped
+FRAME_GATE_THUMBNAIL_SIZE = (64, 48)
+
+# Metrics (/metrics) - per-stage latency histograms and request counters
+DEBUG_TIMINGS = os.environ.get('FALCON_DEBUG_TIMINGS', '0') == '1'  # Always include timings in responses
+STAGE_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+stage_histograms = {}
+request_counts = Counter()
+request_latency = {}
+model_load_seconds = 0.0
+
+# Detection history (in-memory ring buffer)
+HISTORY_CAPACITY = int(os.environ.get('FALCON_HISTORY_CAPACITY', '100'))
+
+# Persistent detection log (SQLite, WAL mode)
+DETECTION_DB_PATH = os.environ.get('FALCON_DETECTION_DB', 'detections.db')
+DETECTION_DB_QUEUE_SIZE = int(os.environ.get('FALCON_DETECTION_DB_QUEUE_SIZE', '10000'))
+DETECTION_DB_BATCH_SIZE = int(os.environ.get('FALCON_DETECTION_DB_BATCH_SIZE', '256'))
+DETECTION_DB_FLUSH_INTERVAL = float(os.environ.get('FALCON_DETECTION_DB_FLUSH_INTERVAL', '0.5'))  # Seconds
+AGGREGATE_BUCKETS = {"minute": 60, "hour": 3600, "day": 86400}
+
+def get_exported_model_path(weights_path: Path, backend: str) -> Path:
+    """Path of the exported model that export_model.py writes next to the .pt weights"""
+    if backend == 'onnx':
+        return weights_path.with_suffix('.onnx')
+    if backend == 'openvino':
+        return weights_path.parent / f"{weights_path.stem}_openvino_model"
+    # INT8 models promoted by quantize_model.py
+    if backend == 'onnx_int8':
+        return weights_path.with_name(f"{weights_path.stem}_int8.onnx")
+    if backend == 'openvino_int8':
+        return weights_path.parent / f"{weights_path.stem}_int8_openvino_model"
+    return weights_path
+
+def get_fixed_batch_size(weights_path: Path, backend: str) -> Optional[int]:
+    """
+    Batch size an exported model is fixed to (export_model.py --static),
+    None for PyTorch and dynamic-batch exports
+    """
+    if backend == 'pytorch':
+        return None
+    exported_path = get_exported_model_path(weights_path, backend)
+    try:
+        if exported_path.is_dir():
+            # OpenVINO: the export metadata next to the IR
+            import yaml
+            metadata = yaml.safe_load((exported_path / "metadata.yaml").read_text())
+            if metadata.get("args", {}).get("dynamic"):
+                return None
+            return int(metadata.get("batch", 1))
+        import onnxruntime
+        session = onnxruntime.InferenceSession(str(exported_path), providers=['CPUExecutionProvider'])
+        batch = session.get_inputs()[0].shape[0]
+        return batch if isinstance(batch, int) else None
+    except Exception as e:
+        logger.warning(f"⚠️  Could not read the batch size of {exported_path} ({e}), assuming batch 1")
+        return 1
+
+def get_parity_image() -> np.ndarray:
+    """Image used for the startup parity check (a test3 image if available)"""
+    candidates = [Path(PARITY_IMAGE)] if PARITY_IMAGE else []
+    test_dir = Path("../test3/images")
+    if test_dir.exists():
+        candidates += sorted(test_dir.glob("*.png"))[:1] + sorted(test_dir.glob("*.jpg"))[:1]
+    for candidate in candidates:
+        image = cv2.imread(str(candidate))
+        if image is not None:
+            return image
+    
+    # Synthetic fallback - a smooth gradient with a few solid shapes
+    logger.warning("⚠️  No parity image found, using a synthetic image")
+    image = np.zeros((IMAGE_SIZE, IMAGE_SIZE, 3), np.uint8)
+    image[:] = np.linspace(0, 255, IMAGE_SIZE, dtype=np.uint8)[None, :, None]
+    cv2.rectangle(image, (100, 100), (260, 400), (40, 40, 220), -1)
+    cv2.circle(image, (450, 300), 80, (200, 200, 60), -1)
+    return image
+
+def check_backend_parity(candidate, reference, tolerance: float = PARITY_TOLERANCE) -> bool:
+    """
+    Compare detections of an exported model against the PyTorch model
+
+    Every reference box must be matched by a box of the same class with
+    IoU >= 0.9 and a confidence within tolerance.
+    """
+    image = get_parity_image()
+    predict_args = dict(conf=CONFIDENCE_THRESHOLD, iou=IOU_THRESHOLD, imgsz=IMAGE_SIZE,
+                        verbose=False, device='cpu')
+    ref_boxes = reference.predict(image, **predict_args)[0].boxes.data.cpu().numpy()
+    cand_boxes = candidate.predict(image, **predict_args)[0].boxes.data.cpu().numpy()
+    
+    if len(ref_boxes) != len(cand_boxes):
+        logger.error(f"❌ Parity check: {len(cand_boxes)} detections vs {len(ref_boxes)} (PyTorch)")
+        return False
+    
+    max_conf_diff = 0.0
+    for ref in ref_boxes:
+        same_class = cand_boxes[cand_boxes[:, 5] == ref[5]]
+        if len(same_class) == 0:
+            logger.error(f"❌ Parity check: no match for class {int(ref[5])}")
+            return False
+        # IoU of the reference box against all same-class candidates
+        iou = pairwise_iou(ref[None], same_class)[0]
+        best = int(np.argmax(iou))
+        conf_diff = abs(float(same_class[best, 4]) - float(ref[4]))
+        max_conf_diff = max(max_conf_diff, conf_diff)
+        if iou[best] < 0.9 or conf_diff > tolerance:
+            logger.error(f"❌ Parity check: class {int(ref[5])} IoU={iou[best]:.3f}, "
+                         f"confidence diff={conf_diff:.4f}")
+            return False
+    
+    logger.info(f"✅ Parity check passed: {len(ref_boxes)} detections, "
+                f"max confidence diff {max_conf_diff:.4f}")
+    return True
+
+def load_model_file(model_path: Path, check_parity: bool = True, backend: str = MODEL_BACKEND) -> tuple:
+    """
+    Load one set of weights for serving
+
+    The serving backend is picked by backend ('pytorch', 'onnx' or
+    'openvino'). Exported models are checked for numerical parity against the
+    PyTorch weights; on failure the PyTorch model is served.
+
+    Returns:
+        (model, backend actually served)
+    """
+    from ultralytics import YOLO
+    
+    if backend == 'pytorch':
+        return YOLO(str(model_path)), 'pytorch'
+    
+    reference = YOLO(str(model_path)) if check_parity else None
+    exported_model = load_exported_model(model_path, reference, backend)
+    if exported_model is not None:
+        return exported_model, backend
+    return reference or YOLO(str(model_path)), 'pytorch'
+
+def load_exported_model(weights_path: Path, reference, backend: str = MODEL_BACKEND):
+    """Load the exported backend version of weights_path (parity-checked against reference, if given)"""
+    exported_path = get_exported_model_path(weights_path, backend)
+    if not exported_path.exists():
+        logger.warning(f"⚠️  {backend} model not found at {exported_path}, using PyTorch")
+        logger.warning("Export it first: python export_model.py (INT8: python quantize_model.py)")
+        return None
+    
+    from ultralytics import YOLO
+    
+    logger.info(f"Loading {backend} model from {exported_path}")
+    exported_model = YOLO(str(exported_path), task='detect')
+    
+    tolerance = PARITY_TOLERANCE_INT8 if backend.endswith('_int8') else PARITY_TOLERANCE
+    if reference is not None and not check_backend_parity(exported_model, reference, tolerance):
+        logger.error(f"❌ {backend} model failed the parity check, using PyTorch")
+        return None
+    
+    logger.info(f"⚡ Serving with {backend} backend")
+    return exported_model
 
-def load_model():
-    """Load YOLOv8m model"""
-    global model
+def load_model(check_parity: bool = True):
+    """
+    Load YOLOv8m model
+
+    The first weights found in the fallback chain are registered as
+    DEFAULT_MODEL_NAME and activated.
+    """
     try:
         # Priority order for model paths
         model_paths = [
@@ -83,12 +376,9 @@ def load_model():
             Path("../yolov8m.pt"),  # Parent directory
         ]
         
-        model_loaded = False
         for model_path in model_paths:
             if model_path.exists():
-                logger.info(f"Loading model from {model_path}")
-                model = YOLO(str(model_path))
-                logger.info(f"✅ Model loaded successfully from {model_path}")
+                model_registry.load(DEFAULT_MODEL_NAME, model_path, check_parity, activate=True)
                 
                 # Check if this is the trained model
                 if "falcon_yolov8m" in str(model_path):
@@ -96,27 +386,1336 @@ def load_model():
                 else:
                     logger.warning("⚠️  Using pretrained YOLOv8m (not trained on your data)")
                     logger.warning("For best results, train your model: python train_model.py")
-                
-                model_loaded = True
-                break
+                return True
         
-        if not model_loaded:
-            logger.error("❌ No model file found")
-            return False
-        
-        return True
+        logger.error("❌ No model file found")
+        return False
     except Exception as e:
         logger.error(f"❌ Failed to load model: {e}")
         return False
 
+def load_extra_models():
+    """Load the FALCON_MODELS versions (inactive) for per-request selection"""
+    for spec in filter(None, (part.strip() for part in EXTRA_MODELS.split(','))):
+        name, _, path = spec.partition('=')
+        if not path or not Path(path).exists():
+            logger.error(f"❌ Skipping model '{spec}': expected name=path to an existing file")
+            continue
+        try:
+            model_registry.load(name.strip(), Path(path.strip()))
+        except Exception as e:
+            logger.error(f"❌ Failed to load model '{name}': {e}")
+
+def import_inference_libraries() -> float:
+    """Import ultralytics (and with it torch), returns the import time in seconds"""
+    started = time.perf_counter()
+    import torch
+    import ultralytics  # noqa: F401
+    if TORCH_THREADS and SERVER_WORKERS <= 1:
+        torch.set_num_threads(TORCH_THREADS)
+    return time.perf_counter() - started
+
+def get_warmup_batch_sizes() -> List[int]:
+    """Batch sizes the micro-batcher can produce, to warm up at (FALCON_WARMUP_BATCH_SIZES)"""
+    if WARMUP_BATCH_SIZES:
+        return sorted({int(size) for size in WARMUP_BATCH_SIZES.split(',') if size.strip()})
+    sizes, size = [], 1
+    while size < BATCH_MAX_SIZE:
+        sizes.append(size)
+        size *= 2
+    return sizes + [max(1, BATCH_MAX_SIZE)]
+
+def warm_up_worker(entry: "ModelEntry", batch_sizes: List[int], barrier=None):
+    """Run the warm-up inferences on one inference worker"""
+    if barrier is not None:
+        # Hold this thread until every worker has picked up a warm-up job
+        try:
+            barrier.wait(WARMUP_BARRIER_TIMEOUT)
+        except threading.BrokenBarrierError:
+            pass
+    image = np.full((IMAGE_SIZE, IMAGE_SIZE, 3), 114, np.uint8)
+    for batch_size in batch_sizes:
+        for _ in range(WARMUP_RUNS):
+            predict_batch_blocking([image] * batch_size, entry)
+
+def warm_up_model(entry: "ModelEntry") -> float:
+    """
+    Dummy inferences so the first real requests don't pay for lazy initialization
+
+    One inference in the loading thread fuses the shared weights, then every
+    inference worker runs each warm-up batch size, which sets up its
+    predictor and grows its input buffers and allocator pools. Process
+    workers pick up the jobs on a best-effort basis (and load their own copy
+    of the model while doing so).
+    """
+    started = time.perf_counter()
+    if WARMUP_RUNS <= 0:
+        return 0.0
+    batch_sizes = [size for size in get_warmup_batch_sizes()
+                   if entry.max_batch_size is None or size <= entry.max_batch_size]
+    warm_up_worker(entry, [1])
+    if inference_executor is not None:
+        barrier = threading.Barrier(INFERENCE_WORKERS) if INFERENCE_EXECUTOR == 'thread' else None
+        futures = [inference_executor.submit(warm_up_worker, entry, batch_sizes, barrier)
+                   for _ in range(INFERENCE_WORKERS)]
+        for future in futures:
+            future.result()
+    return (time.perf_counter() - started) * 1000
+
+class ModelEntry:
+    """One loaded model version in the registry"""
+
+    def __init__(self, name: str, path: Path, model, backend: str, version: int, file_signature: tuple):
+        self.name = name
+        self.path = str(path)
+        self.model = model
+        self.backend = backend
+        self.version = version
+        self.file_signature = file_signature  # (mtime, size) of the weights when loaded
+        self.loaded_at = datetime.now().isoformat()
+        self.load_seconds = 0.0
+        self.warmup_ms = 0.0
+        self.max_batch_size: Optional[int] = None  # Fixed-batch exports take at most this many images per call
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    def __getstate__(self):
+        # Process workers get the entry without the model and load their own copy
+        state = self.__dict__.copy()
+        state["model"] = None
+        return state
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "key": self.key,
+            "path": self.path,
+            "backend": self.backend,
+            "max_batch_size": self.max_batch_size,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 3),
+            "warmup_ms": round(self.warmup_ms, 1)
+        }
+
+class ModelRegistry:
+    """
+    Named model versions with an atomically swapped active model
+
+    Loading (and warming up) a version happens off the event loop while the
+    current models keep serving. Activation only repoints active_name.
+    Requests resolve their ModelEntry once on arrival and carry it through the
+    batcher, so in-flight requests finish on the version they started with
+    and the old weights are freed once the last of them completes.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, ModelEntry] = {}
+        self.active_name: Optional[str] = None
+        self._load_lock = threading.Lock()  # One load at a time
+        self._swap_lock = threading.Lock()
+
+    def get(self, name: Optional[str] = None) -> Optional[ModelEntry]:
+        """The named version, or the active one"""
+        return self.entries.get(self.active_name if name is None else name)
+
+    def load(self, name: str, path: Path, check_parity: bool = True, activate: bool = False) -> ModelEntry:
+        """Load and warm up weights as a new version of name (blocking)"""
+        global model_version
+        with self._load_lock:
+            started = time.perf_counter()
+            logger.info(f"Loading model '{name}' from {path}")
+            stat = os.stat(path)
+            loaded, backend = load_model_file(Path(path), check_parity)
+            with self._swap_lock:
+                model_version += 1
+                version = model_version
+            entry = ModelEntry(name, path, loaded, backend, version, (stat.st_mtime, stat.st_size))
+            entry.max_batch_size = get_fixed_batch_size(Path(path), backend)
+            if entry.max_batch_size is not None and entry.max_batch_size < BATCH_MAX_SIZE:
+                logger.warning(f"⚠️  {backend} model has a fixed batch size of {entry.max_batch_size}: micro-batches "
+                               f"are split to fit (set FALCON_BATCH_MAX_SIZE={entry.max_batch_size} to match)")
+            entry.warmup_ms = warm_up_model(entry)
+            entry.load_seconds = time.perf_counter() - started
+            logger.info(f"✅ Model {entry.key} ready in {entry.load_seconds:.2f}s "
+                        f"(warm-up {entry.warmup_ms:.0f} ms)")
+            
+            with self._swap_lock:
+                replaces_active = self.active_name == name
+                previous = self.entries.get(name)
+                self.entries[name] = entry
+            # Reloading the active name swaps the new version in immediately
+            if activate or replaces_active:
+                self.activate(name)
+            if previous is not None:
+                result_cache.evict_model(previous.key)
+            return entry
+
+    def activate(self, name: str):
+        """Make name the active model (KeyError if it isn't loaded)"""
+        global model, model_backend, model_load_seconds
+        with self._swap_lock:
+            entry = self.entries[name]
+            self.active_name = name
+            model, model_backend, model_load_seconds = entry.model, entry.backend, entry.load_seconds
+        logger.info(f"🔁 Active model: {entry.key} ({entry.backend})")
+
+    def unload(self, name: str):
+        """Drop a version; requests already holding it still finish"""
+        with self._swap_lock:
+            if name == self.active_name:
+                raise ValueError("Cannot unload the active model")
+            entry = self.entries.pop(name)
+        result_cache.evict_model(entry.key)
+        logger.info(f"🗑️  Unloaded model '{name}'")
+
+    def info(self) -> Dict[str, Any]:
+        active = self.get()
+        return {
+            "active": active.key if active else None,
+            "models": [entry.info() for entry in self.entries.values()]
+        }
+
+model_registry = ModelRegistry()
+
+async def watch_model_files():
+    """Reload a registered model when its weights file changes (FALCON_MODEL_WATCH_INTERVAL)"""
+    loop = asyncio.get_running_loop()
+    changed = {}  # name -> file signature seen on the previous poll
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        for entry in list(model_registry.entries.values()):
+            try:
+                stat = os.stat(entry.path)
+            except OSError:
+                continue
+            signature = (stat.st_mtime, stat.st_size)
+            if signature == entry.file_signature:
+                changed.pop(entry.name, None)
+                continue
+            # Reload only once the file has stopped changing (training may still be writing it)
+            if changed.get(entry.name) != signature:
+                changed[entry.name] = signature
+                continue
+            changed.pop(entry.name)
+            logger.info(f"🔄 {entry.path} changed, reloading '{entry.name}'")
+            try:
+                await loop.run_in_executor(None, model_registry.load, entry.name, Path(entry.path))
+            except Exception as e:
+                logger.error(f"❌ Reloading '{entry.name}' failed, keeping {entry.key}: {e}")
+                entry.file_signature = signature  # Don't retry the same file
+
+@app.middleware("http")
+async def count_requests(request: Request, call_next):
+    """
+    Count requests by endpoint/status and record their latency for /metrics
+
+    Latency runs until the last body chunk is sent, so the NDJSON streams
+    (/predict/batch, /predict/video) are timed to the end of the stream,
+    not to when their headers go out.
+    """
+    start = time.perf_counter()
+    
+    def record(status: int):
+        # Route templates keep the label set small (e.g. /results/{result_id}/image)
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        request_counts[(endpoint, request.method, status)] += 1
+        if endpoint not in request_latency:
+            request_latency[endpoint] = Histogram(STAGE_BUCKETS_MS)
+        request_latency[endpoint].observe((time.perf_counter() - start) * 1000)
+    
+    try:
+        response = await call_next(request)
+    except Exception:
+        record(500)
+        raise
+    
+    body = response.body_iterator
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            record(response.status_code)
+    
+    response.body_iterator = timed_body()
+    return response
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize model on startup"""
+    """Start the workers and load the model (in the background unless FALCON_BACKGROUND_STARTUP=0)"""
+    global startup_task
     logger.info("🚀 Starting Falcon Detection API...")
-    if load_model():
-        logger.info("✅ API ready!")
+    startup_state["started_at"] = time.perf_counter()
+    detection_store.start()
+    start_inference_executor()
+    start_inference_batcher()
+    start_decode_executor()
+    startup_task = asyncio.get_running_loop().create_task(initialize_model())
+    if not BACKGROUND_STARTUP:
+        await startup_task
+
+async def initialize_model():
+    """Import the inference libraries, load and warm up the models off the event loop, then report ready"""
+    global model_watcher
+    loop = asyncio.get_running_loop()
+    timings = startup_state["timings"]
+    try:
+        timings["import_s"] = round(await loop.run_in_executor(None, import_inference_libraries), 3)
+        logger.info(f"📦 Inference libraries imported in {timings['import_s']:.2f}s")
+        
+        entry = model_registry.get()
+        if entry is not None:
+            # Forked server worker: the supervisor already loaded the models, only warm up this worker
+            timings["load_s"] = 0.0
+            timings["warmup_ms"] = round(await loop.run_in_executor(None, warm_up_model, entry), 1)
+        else:
+            if not await loop.run_in_executor(None, load_model):
+                startup_state["status"] = "failed"
+                logger.error("❌ Failed to initialize model")
+                return
+            entry = model_registry.get()
+            timings["load_s"] = round(entry.load_seconds - entry.warmup_ms / 1000, 3)
+            timings["warmup_ms"] = round(entry.warmup_ms, 1)
+            await loop.run_in_executor(None, load_extra_models)
+        timings["warmup_batch_sizes"] = get_warmup_batch_sizes() if WARMUP_RUNS > 0 else []
+        
+        if MODEL_WATCH_INTERVAL > 0:
+            model_watcher = loop.create_task(watch_model_files())
+        
+        timings["ready_s"] = round(time.perf_counter() - startup_state["started_at"], 3)
+        startup_state["status"] = "ready"
+        logger.info(f"✅ API ready in {timings['ready_s']:.2f}s!")
+    except Exception as e:
+        startup_state["status"] = "failed"
+        logger.error(f"❌ Startup failed: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the batching scheduler, the inference worker pool and the detection log writer"""
+    if startup_task is not None and not startup_task.done():
+        startup_task.cancel()
+    if model_watcher is not None:
+        model_watcher.cancel()
+    if inference_batcher is not None:
+        await inference_batcher.stop()
+    if inference_executor is not None:
+        inference_executor.shutdown(wait=False)
+    if decode_executor is not None:
+        decode_executor.shutdown(wait=False)
+    detection_store.stop()
+
+def start_inference_executor():
+    """Create the thread or process pool that runs model inference"""
+    global inference_executor
+    if INFERENCE_EXECUTOR == 'process':
+        # Each worker process loads its own copy of a model version on first use
+        inference_executor = ProcessPoolExecutor(max_workers=INFERENCE_WORKERS)
+    else:
+        inference_executor = ThreadPoolExecutor(
+            max_workers=INFERENCE_WORKERS,
+            thread_name_prefix="inference"
+        )
+    logger.info(f"⚙️  Inference pool: {INFERENCE_WORKERS} {INFERENCE_EXECUTOR} worker(s), "
+                f"queue size {INFERENCE_QUEUE_SIZE}")
+
+def start_decode_executor():
+    """Create the thread pool that decodes batch uploads (cv2 releases the GIL)"""
+    global decode_executor
+    decode_executor = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="decode")
+
+def start_inference_batcher():
+    """Start the micro-batching scheduler on the running event loop"""
+    global inference_batcher
+    inference_batcher = InferenceBatcher(
+        max_batch_size=BATCH_MAX_SIZE,
+        window_ms=BATCH_WINDOW_MS,
+        max_concurrent_batches=INFERENCE_WORKERS
+    )
+    inference_batcher.start()
+    logger.info(f"⚙️  Micro-batching: up to {BATCH_MAX_SIZE} images per batch, "
+                f"{BATCH_WINDOW_MS:g} ms window")
+
+def get_worker_model(entry: ModelEntry):
+    """
+    Get the model instance for the current worker.
+
+    Ultralytics predictors keep per-call state, so every worker thread gets a
+    shallow copy of the entry's model with its own predictor. The weights are
+    shared. Process workers receive the entry without its model and load
+    their own copy (parity was already checked in the main process). Each
+    worker keeps copies of the last MAX_WORKER_MODELS versions it served.
+    """
+    models = getattr(_worker_state, 'models', None)
+    if models is None:
+        models = _worker_state.models = OrderedDict()
+    worker_model = models.get(entry.key)
+    if worker_model is None:
+        source = entry.model
+        if source is None:
+            source, _ = load_model_file(Path(entry.path), check_parity=False, backend=entry.backend)
+        worker_model = copy.copy(source)
+        worker_model.predictor = None
+        models[entry.key] = worker_model
+        while len(models) > max(1, MAX_WORKER_MODELS):
+            models.popitem(last=False)
+    models.move_to_end(entry.key)
+    return worker_model
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds (Prometheus-style buckets)"""
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last bucket is +Inf
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.total, self.count
+        buckets = {}
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds + [float('inf')], counts):
+            cumulative += bucket_count
+            buckets["+Inf" if bound == float('inf') else str(bound)] = cumulative
+        return {
+            "count": count,
+            "sum": round(total, 3),
+            "mean": round(total / count, 3) if count else 0.0,
+            "buckets": buckets
+        }
+
+class StageTimer:
+    """Per-request stage durations; every stage also feeds the /metrics histograms"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name: str, duration_ms: float):
+        self.timings[name] = round(self.timings.get(name, 0.0) + duration_ms, 3)
+        stage_histogram(name).observe(duration_ms)
+
+    def record_inference(self, results: Dict[str, Any]):
+        """Record queue wait and the model-reported preprocess / inference / NMS times"""
+        if "queue_wait_ms" in results:
+            self.record("queue_wait", results["queue_wait_ms"])
+        for stage, name in (("preprocess", "preprocess"), ("inference", "inference"), ("postprocess", "nms")):
+            if stage in results["speed"]:
+                self.record(name, results["speed"][stage])
+
+def stage_histogram(name: str) -> Histogram:
+    """Latency histogram (ms) of one request stage"""
+    histogram = stage_histograms.get(name)
+    if histogram is None:
+        histogram = stage_histograms.setdefault(name, Histogram(STAGE_BUCKETS_MS))
+    return histogram
+
+def get_process_rss() -> int:
+    """Resident set size of this process in bytes (0 if unknown)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def render_prometheus_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+
+    def add_histogram(name: str, help_text: str, series: List[tuple]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in series:
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {count}')
+            label_set = f"{{{labels.rstrip(',')}}}" if labels else ""
+            lines.append(f"{name}_sum{label_set} {snapshot['sum']}")
+            lines.append(f"{name}_count{label_set} {snapshot['count']}")
+
+    def add_gauge(name: str, help_text: str, value, metric_type: str = "gauge"):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.append(f"{name} {value}")
+
+    lines.append("# HELP falcon_requests_total HTTP requests by endpoint, method and status")
+    lines.append("# TYPE falcon_requests_total counter")
+    for (endpoint, method, status), count in sorted(request_counts.items()):
+        lines.append(f'falcon_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+    add_histogram("falcon_request_duration_ms", "HTTP request latency by endpoint, up to the last body chunk",
+                  [(f'endpoint="{endpoint}",', histogram) for endpoint, histogram in sorted(request_latency.items())])
+    add_histogram("falcon_stage_duration_ms", "Per-stage latency of /predict requests",
+                  [(f'stage="{stage}",', histogram) for stage, histogram in sorted(stage_histograms.items())])
+    if inference_batcher is not None:
+        add_histogram("falcon_batch_size", "Images per batched model.predict call",
+                      [("", inference_batcher.batch_size_histogram)])
+        add_histogram("falcon_queue_wait_ms", "Time images wait for a batch",
+                      [("", inference_batcher.queue_wait_histogram)])
+        add_gauge("falcon_batch_queue_depth", "Images waiting to be batched", inference_batcher.queue.qsize())
+
+    add_gauge("falcon_inflight_inferences", "Images admitted for inference", inflight_inferences)
+    add_gauge("falcon_inference_capacity", "Maximum admitted images", inference_capacity())
+    cache_stats = result_cache.stats()
+    add_gauge("falcon_result_cache_hits_total", "Result cache hits", cache_stats["hits"], "counter")
+    add_gauge("falcon_result_cache_misses_total", "Result cache misses", cache_stats["misses"], "counter")
+    add_gauge("falcon_result_cache_entries", "Result cache entries", cache_stats["entries"])
+    gate_stats = frame_gate.stats()
+    add_gauge("falcon_frame_gate_frames_total", "Webcam session frames checked for changes", gate_stats["frames"], "counter")
+    add_gauge("falcon_frame_gate_skipped_total", "Unchanged webcam frames answered without inference",
+              gate_stats["skipped"], "counter")
+    add_gauge("falcon_model_loaded", "Whether a model is loaded", int(model is not None))
+    add_gauge("falcon_model_load_seconds", "Load time of the active model", round(model_load_seconds, 3))
+    add_gauge("falcon_models_registered", "Model versions in the registry", len(model_registry.entries))
+    add_gauge("falcon_model_version", "Version number of the active model",
+              model_registry.get().version if model_registry.get() else 0)
+    add_gauge("falcon_process_resident_memory_bytes", "Resident memory of the API process", get_process_rss())
+    return "\n".join(lines) + "\n"
+
+def decode_image(data: bytes, target_size: int = IMAGE_SIZE) -> tuple:
+    """
+    Decode image bytes into a BGR image
+
+    JPEGs much larger than target_size are decoded at 1/2, 1/4 or 1/8
+    resolution directly in the DCT (IMREAD_REDUCED_*), which is far cheaper
+    than a full decode followed by a resize. The longest side never drops
+    below target_size.
+
+    Returns:
+        (image, scale) where scale = (sx, sy) maps decoded pixel coordinates
+        back to the original image, or (None, None) if decoding failed
+    """
+    nparr = np.frombuffer(data, np.uint8)
+    if REDUCED_DECODE and data[:3] == b'\xff\xd8\xff':  # JPEG
+        try:
+            with Image.open(io.BytesIO(data)) as header:  # Reads the header only
+                original_w, original_h = header.size
+        except Exception:
+            original_w = original_h = 0
+        longest = max(original_w, original_h)
+        for factor, flag in REDUCED_DECODE_FLAGS:
+            if longest // factor >= target_size:
+                image = cv2.imdecode(nparr, flag)
+                if image is None:
+                    break
+                # EXIF orientation may swap the axes relative to the header size
+                if (image.shape[1] >= image.shape[0]) != (original_w >= original_h):
+                    original_w, original_h = original_h, original_w
+                return image, (original_w / image.shape[1], original_h / image.shape[0])
+    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    return (image, (1.0, 1.0)) if image is not None else (None, None)
+
+def scale_boxes_to_original(results: Dict[str, Any], scale: tuple) -> Dict[str, Any]:
+    """Map boxes of a reduced-resolution decode back to original image coordinates"""
+    if scale == (1.0, 1.0) or not len(results["boxes"]):
+        return results
+    boxes = results["boxes"].copy()
+    boxes[:, [0, 2]] *= scale[0]
+    boxes[:, [1, 3]] *= scale[1]
+    return dict(results, boxes=boxes)
+
+def letterbox_batch(images: List[np.ndarray], rect: bool) -> tuple:
+    """
+    Letterbox images into the worker's preallocated input buffer
+
+    Images are resized (aspect ratio kept) and centred on gray padding,
+    converted BGR -> RGB, HWC -> CHW and normalized to 0-1 straight into a
+    reusable float32 buffer, which is handed to the model without a copy.
+    With rect=True the batch is padded only to the smallest stride-aligned
+    shape that fits every image (like ultralytics' minimal letterbox).
+
+    Returns:
+        (tensor of shape (N, 3, H, W), [(gain, pad_x, pad_y) per image])
+    """
+    sizes = []
+    for image in images:
+        h, w = image.shape[:2]
+        gain = min(IMAGE_SIZE / h, IMAGE_SIZE / w)
+        sizes.append((gain, int(round(w * gain)), int(round(h * gain))))
+    if rect:
+        stride = 32
+        batch_w = min(IMAGE_SIZE, -(-max(w for _, w, _ in sizes) // stride) * stride)
+        batch_h = min(IMAGE_SIZE, -(-max(h for _, _, h in sizes) // stride) * stride)
     else:
-        logger.error("❌ Failed to initialize model")
+        batch_w = batch_h = IMAGE_SIZE
+    
+    n = len(images)
+    capacity = n * 3 * batch_h * batch_w
+    if getattr(_worker_state, 'input_buffer', None) is None or _worker_state.input_buffer.size < capacity:
+        max_batch = max(n, BATCH_MAX_SIZE)
+        _worker_state.input_buffer = np.empty(max_batch * 3 * IMAGE_SIZE * IMAGE_SIZE, np.float32)
+        _worker_state.canvas = np.empty((IMAGE_SIZE, IMAGE_SIZE, 3), np.uint8)
+    batch = _worker_state.input_buffer[:capacity].reshape(n, 3, batch_h, batch_w)
+    canvas = _worker_state.canvas[:batch_h, :batch_w]
+    
+    letterbox_info = []
+    for i, (image, (gain, new_w, new_h)) in enumerate(zip(images, sizes)):
+        pad_x, pad_y = (batch_w - new_w) // 2, (batch_h - new_h) // 2
+        canvas[:] = 114
+        if (new_w, new_h) != (image.shape[1], image.shape[0]):
+            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = image
+        # BGR HWC uint8 -> RGB CHW float32 0-1, written into the batch buffer
+        np.multiply(canvas[:, :, ::-1].transpose(2, 0, 1), 1 / 255, out=batch[i], casting='unsafe')
+        letterbox_info.append((gain, pad_x, pad_y))
+    import torch
+    
+    return torch.from_numpy(batch), letterbox_info
+
+@lru_cache(maxsize=8)
+def get_class_thresholds(names: tuple) -> Optional[tuple]:
+    """
+    (confidence, NMS IoU) arrays indexed by class id for a model's (id, name)
+    pairs, read from CLASS_THRESHOLDS_PATH; None when there is no such file.
+    Classes the file does not list keep CONFIDENCE_THRESHOLD / IOU_THRESHOLD.
+    """
+    path = Path(CLASS_THRESHOLDS_PATH) if CLASS_THRESHOLDS_PATH else None
+    if path is None or not path.exists() or not names:
+        return None
+    try:
+        classes = json.loads(path.read_text()).get("classes", {})
+    except (OSError, ValueError) as e:
+        logger.error(f"❌ Ignoring per-class thresholds in {path}: {e}")
+        return None
+    
+    size = max(class_id for class_id, _ in names) + 1
+    conf = np.full(size, CONFIDENCE_THRESHOLD, dtype=np.float32)
+    iou = np.full(size, IOU_THRESHOLD, dtype=np.float32)
+    for class_id, name in names:
+        settings = classes.get(name, {})
+        conf[class_id] = settings.get("conf", CONFIDENCE_THRESHOLD)
+        iou[class_id] = settings.get("iou", IOU_THRESHOLD)
+    logger.info(f"🎚️  Per-class thresholds from {path} for {sum(name in classes for _, name in names)} classes")
+    return conf, iou
+
+def apply_class_thresholds(boxes: np.ndarray, conf: np.ndarray, iou: np.ndarray, model_iou: float) -> np.ndarray:
+    """
+    Keep boxes at or above their class' confidence, then suppress again
+    within the classes whose NMS IoU is stricter than the one the model ran with
+    """
+    boxes = boxes[boxes[:, 4] >= conf[boxes[:, 5].astype(int)]]
+    cls = boxes[:, 5].astype(int)
+    strict = iou[cls] < model_iou
+    if not strict.any():
+        return boxes
+    
+    return greedy_nms(boxes, np.where(strict, iou[cls], 1.0))
+
+def predict_batch_blocking(images: List[np.ndarray], entry: ModelEntry) -> List[Dict[str, Any]]:
+    """
+    Run one batched inference of a model version on decoded BGR images (executed inside the worker pool)
+
+    With per-class thresholds (CLASS_THRESHOLDS_PATH) the model runs at the
+    lowest class confidence and the loosest class IoU, and each class' own
+    thresholds are applied to the output with array masks.
+
+    Returns:
+        One dict per image with 'boxes' (N x 6 array of x1, y1, x2, y2, conf, cls)
+        in the image's own pixel coordinates, 'names' (class id -> name) and
+        'speed' (ms per stage, per image)
+    """
+    if entry.max_batch_size and len(images) > entry.max_batch_size:
+        # A fixed-batch export cannot take the whole micro-batch in one call
+        step = entry.max_batch_size
+        return [output for i in range(0, len(images), step)
+                for output in predict_batch_blocking(images[i:i + step], entry)]
+    worker_model = get_worker_model(entry)
+    thresholds = get_class_thresholds(tuple(sorted(worker_model.names.items())))
+    predict_args = dict(
+        conf=float(thresholds[0].min()) if thresholds else CONFIDENCE_THRESHOLD,
+        iou=float(thresholds[1].max()) if thresholds else IOU_THRESHOLD,
+        imgsz=IMAGE_SIZE,
+        verbose=False,
+        device='cpu'  # Force CPU since we disabled CUDA
+    )
+    if not FAST_PREPROCESS:
+        results = worker_model.predict(images, **predict_args)
+        outputs = [
+            {
+                "boxes": result.boxes.data.cpu().numpy(),
+                "names": result.names,
+                "speed": dict(result.speed),
+            }
+            for result in results
+        ]
+        if thresholds:
+            for output in outputs:
+                output["boxes"] = apply_class_thresholds(output["boxes"], *thresholds, predict_args["iou"])
+        return outputs
+    
+    started = time.perf_counter()
+    # Exported models may have a fixed 640x640 input, so only PyTorch gets rect batches
+    tensor, letterbox_info = letterbox_batch(images, rect=entry.backend == 'pytorch')
+    letterbox_ms = (time.perf_counter() - started) * 1000 / len(images)
+    results = worker_model.predict(tensor, **predict_args)
+    
+    outputs = []
+    for image, result, (gain, pad_x, pad_y) in zip(images, results, letterbox_info):
+        # Undo the letterbox: model input coordinates -> image coordinates
+        boxes = result.boxes.data.cpu().numpy().copy()
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / gain).clip(0, image.shape[1])
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / gain).clip(0, image.shape[0])
+        if thresholds:
+            boxes = apply_class_thresholds(boxes, *thresholds, predict_args["iou"])
+        speed = dict(result.speed)
+        speed["preprocess"] = speed.get("preprocess", 0.0) + letterbox_ms
+        outputs.append({"boxes": boxes, "names": result.names, "speed": speed})
+    return outputs
+
+class InferenceBatcher:
+    """
+    Dynamic micro-batching scheduler.
+
+    Requests are queued and collected until either BATCH_MAX_SIZE images are
+    waiting or BATCH_WINDOW_MS has passed since the first one arrived. The
+    batch then runs as a single model.predict() call in the worker pool and
+    the results are fanned back out to the waiting handlers. At most
+    INFERENCE_WORKERS batches run at the same time, so requests that arrive
+    while the workers are busy accumulate into larger batches.
+    """
+
+    def __init__(self, max_batch_size: int, window_ms: float, max_concurrent_batches: int):
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = window_ms / 1000.0
+        self.queue: "asyncio.Queue" = asyncio.Queue()
+        self.slots = asyncio.Semaphore(max_concurrent_batches)
+        self.batch_size_histogram = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_wait_histogram = Histogram([1, 2, 5, 10, 20, 50, 100, 250, 500, 1000])  # ms
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, image: np.ndarray, entry: ModelEntry) -> Dict[str, Any]:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((image, entry, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free worker first so the batch keeps growing meanwhile
+            await self.slots.acquire()
+            try:
+                batch = await self._collect()
+            except asyncio.CancelledError:
+                self.slots.release()
+                raise
+            loop.create_task(self._execute(batch))
+
+    async def _execute(self, batch: list):
+        try:
+            started = time.perf_counter()
+            batch = [item for item in batch if not item[2].done()]  # Skip cancelled requests
+            if not batch:
+                return
+            self.batch_size_histogram.observe(len(batch))
+            
+            # One model call per model version in the batch
+            groups = OrderedDict()
+            for item in batch:
+                queue_wait = (started - item[3]) * 1000
+                self.queue_wait_histogram.observe(queue_wait)
+                groups.setdefault(item[1].key, []).append((item, queue_wait))
+            
+            loop = asyncio.get_running_loop()
+            for group in groups.values():
+                images = [image for (image, _, _, _), _ in group]
+                entry = group[0][0][1]
+                try:
+                    results = await loop.run_in_executor(inference_executor, predict_batch_blocking, images, entry)
+                except Exception as e:
+                    for (_, _, future, _), _ in group:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for ((_, _, future, _), queue_wait), result in zip(group, results):
+                    if not future.done():
+                        future.set_result(dict(result, queue_wait_ms=queue_wait, batch_size=len(group)))
+        finally:
+            self.slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.window * 1000,
+            "queued": self.queue.qsize(),
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_ms": self.queue_wait_histogram.snapshot()
+        }
+
+class ResultCache:
+    """
+    LRU cache of inference results keyed by a hash of the uploaded bytes
+
+    Entries expire after ttl seconds. Keys include the model version
+    (get_cache_key), and the entries of a version are evicted when it is
+    replaced by a reload or unloaded, so they do not fill the LRU until
+    they expire.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def evict_model(self, model_key: str) -> int:
+        """Drop every entry computed by one model version, returns how many"""
+        marker = f":{model_key}:"
+        with self._lock:
+            stale = [key for key in self.entries if marker in key]
+            for key in stale:
+                del self.entries[key]
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+def frame_thumbnail(data: bytes) -> Optional[np.ndarray]:
+    """Small grayscale thumbnail of an encoded frame (JPEG decodes at 1/8 scale, so this is cheap)"""
+    buffer = np.frombuffer(data, np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if image is None:
+        return None
+    return cv2.resize(image, FRAME_GATE_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+class FrameGate:
+    """
+    Per-session change detection for webcam streams
+
+    Each session remembers the thumbnail of the last frame that actually ran
+    inference, its results and when it ran. A new frame whose thumbnail
+    differs from that one by less than threshold (mean absolute difference,
+    0-1) reuses the results instead of running the model, as long as they
+    are at most max_staleness seconds old. Comparing against the last
+    inferred frame rather than the previous one means slow drift still adds
+    up to a change. Only the max_sessions most recently seen sessions are
+    kept.
+    """
+
+    def __init__(self, threshold: float, max_staleness: float, max_sessions: int):
+        self.threshold = threshold
+        self.max_staleness = max_staleness
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.frames = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0 and self.max_sessions > 0
+
+    def _session(self, session_id: str) -> Dict[str, Any]:
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = {"thumbnail": None, "results": None, "model": None, "inferred_at": 0.0,
+                     "frames": 0, "skipped": 0}
+            self.sessions[session_id] = state
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session_id)
+        return state
+
+    def lookup(self, session_id: str, thumbnail: np.ndarray, model_key: str) -> Optional[tuple]:
+        """Counts the frame; (results, age in seconds) when it can reuse the last inference, else None"""
+        with self._lock:
+            state = self._session(session_id)
+            state["frames"] += 1
+            self.frames += 1
+            age = time.monotonic() - state["inferred_at"]
+            if (state["thumbnail"] is None or state["model"] != model_key or age > self.max_staleness
+                    or cv2.absdiff(thumbnail, state["thumbnail"]).mean() / 255 >= self.threshold):
+                return None
+            state["skipped"] += 1
+            self.skipped += 1
+            return state["results"], age
+
+    def update(self, session_id: str, thumbnail: np.ndarray, results: Any, model_key: str):
+        """Remember the frame that just ran inference"""
+        with self._lock:
+            state = self._session(session_id)
+            state.update(thumbnail=thumbnail, results=results, model=model_key, inferred_at=time.monotonic())
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self.sessions.pop(session_id, None)
+
+    def session_stats(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            state = self.sessions.get(session_id) or {"frames": 0, "skipped": 0}
+            return {
+                "frames": state["frames"],
+                "skipped": state["skipped"],
+                "skip_ratio": round(state["skipped"] / state["frames"], 4) if state["frames"] else 0.0
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "max_staleness_seconds": self.max_staleness,
+                "sessions": len(self.sessions),
+                "frames": self.frames,
+                "skipped": self.skipped,
+                "skip_ratio": round(self.skipped / self.frames, 4) if self.frames else 0.0
+            }
+
+frame_gate = FrameGate(FRAME_GATE_THRESHOLD, FRAME_GATE_MAX_STALENESS, FRAME_GATE_MAX_SESSIONS)
+
+class DetectionHistory:
+    """
+    Thread-safe fixed-capacity ring buffer of detection entries
+
+    Per-class object counters are updated on every insert and eviction, so
+    statistics cost O(classes) regardless of capacity.
+    """
+
+    def __init__(self, capacity: int):
+        self.entries = deque(maxlen=max(1, capacity))
+        self.object_counts = Counter()
+        self.total_objects = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, entry: Dict[str, Any]):
+        with self._lock:
+            if len(self.entries) == self.entries.maxlen:
+                self._forget(self.entries[0])  # Evicted by the append below
+            self.entries.append(entry)
+            objects = entry.get('objects', [])
+            self.object_counts.update(objects)
+            self.total_objects += len(objects)
+
+    def _forget(self, entry: Dict[str, Any]):
+        objects = entry.get('objects', [])
+        self.object_counts.subtract(objects)
+        self.total_objects -= len(objects)
+        for obj in objects:
+            if self.object_counts[obj] <= 0:
+                del self.object_counts[obj]
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.object_counts.clear()
+            self.total_objects = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            object_counts = dict(self.object_counts)
+            return {
+                "total_sessions": len(self.entries),
+                "total_objects_detected": self.total_objects,
+                "most_detected": max(object_counts.items(), key=lambda x: x[1])[0] if object_counts else None,
+                "object_breakdown": object_counts
+            }
+
+detection_history = DetectionHistory(HISTORY_CAPACITY)
+
+class DetectionStore:
+    """
+    Persistent detection log in SQLite (WAL mode)
+
+    The request path only enqueues records (never blocks). A background
+    writer thread drains the queue and inserts records in batched
+    transactions. Queries open their own read connection, which WAL allows
+    to run concurrently with the writer.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS requests (
+            id INTEGER PRIMARY KEY,
+            timestamp REAL NOT NULL,
+            source TEXT NOT NULL,
+            num_detections INTEGER NOT NULL,
+            image_width INTEGER,
+            image_height INTEGER,
+            inference_ms REAL
+        );
+        CREATE TABLE IF NOT EXISTS detections (
+            id INTEGER PRIMARY KEY,
+            request_id INTEGER NOT NULL REFERENCES requests(id),
+            timestamp REAL NOT NULL,
+            class_name TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            confidence REAL NOT NULL,
+            x1 REAL, y1 REAL, x2 REAL, y2 REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_requests_timestamp ON requests(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON detections(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_detections_class_timestamp ON detections(class_name, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_detections_request ON detections(request_id);
+    """
+
+    def __init__(self, path: str, queue_size: int, batch_size: int, flush_interval: float):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self._thread = None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def start(self):
+        with self._connect() as connection:
+            connection.executescript(self.SCHEMA)
+        self._thread = threading.Thread(target=self._write_loop, name="detection-store", daemon=True)
+        self._thread.start()
+        logger.info(f"💾 Detection log: {self.path}")
+
+    def stop(self):
+        if self._thread is not None:
+            self.queue.put(None)  # Flush and exit
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def log(self, source: str, timestamp: float, detections: List[Dict[str, Any]],
+            image_size: tuple = (None, None), inference_ms: float = None):
+        """Enqueue one request and its detections (dropped if the writer falls behind)"""
+        try:
+            self.queue.put_nowait(("log", (source, timestamp, detections, image_size, inference_ms)))
+        except queue.Full:
+            self.dropped += 1
+
+    def clear(self):
+        self.queue.put(("clear", None))
+
+    def _write_loop(self):
+        connection = self._connect()
+        running = True
+        while running:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with connection:
+                    for entry in batch:
+                        if entry is None:
+                            running = False
+                            continue
+                        command, payload = entry
+                        if command == "clear":
+                            connection.execute("DELETE FROM detections")
+                            connection.execute("DELETE FROM requests")
+                        else:
+                            self._insert(connection, *payload)
+            except sqlite3.Error as e:
+                logger.error(f"❌ Failed to write detection log: {e}")
+        connection.close()
+
+    def _insert(self, connection, source, timestamp, detections, image_size, inference_ms):
+        cursor = connection.execute(
+            "INSERT INTO requests (timestamp, source, num_detections, image_width, image_height, inference_ms) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (timestamp, source, len(detections), image_size[0], image_size[1], inference_ms)
+        )
+        connection.executemany(
+            "INSERT INTO detections (request_id, timestamp, class_name, class_id, confidence, x1, y1, x2, y2) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (cursor.lastrowid, timestamp, d["class"], d["class_id"], d["confidence"],
+                 d["bbox"]["x1"], d["bbox"]["y1"], d["bbox"]["x2"], d["bbox"]["y2"])
+                for d in detections
+            ]
+        )
+        self.written += 1
+
+    @staticmethod
+    def _filters(start, end, class_name, alias: str) -> tuple:
+        clauses, params = [], []
+        if start is not None:
+            clauses.append(f"{alias}.timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append(f"{alias}.timestamp < ?")
+            params.append(end)
+        if class_name is not None:
+            if alias == "d":
+                clauses.append("d.class_name = ?")
+            else:
+                clauses.append(f"EXISTS (SELECT 1 FROM detections d WHERE d.request_id = {alias}.id "
+                               f"AND d.class_name = ?)")
+            params.append(class_name)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, start: float = None, end: float = None, class_name: str = None,
+              limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Requests in [start, end), newest first, paginated; returned oldest first within the page"""
+        where, params = self._filters(start, end, class_name, "r")
+        connection = self._connect()
+        try:
+            total = connection.execute(f"SELECT COUNT(*) FROM requests r{where}", params).fetchone()[0]
+            rows = connection.execute(
+                f"SELECT r.id, r.timestamp, r.source, r.num_detections FROM requests r{where} "
+                f"ORDER BY r.timestamp DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+            objects = {}
+            if rows:
+                ids = [row[0] for row in rows]
+                placeholders = ",".join("?" * len(ids))
+                for request_id, class_name_ in connection.execute(
+                    f"SELECT request_id, class_name FROM detections WHERE request_id IN ({placeholders}) "
+                    f"ORDER BY id", ids
+                ):
+                    objects.setdefault(request_id, []).append(class_name_)
+        finally:
+            connection.close()
+        
+        history = [
+            {
+                "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+                "source": source,
+                "num_detections": num_detections,
+                "objects": objects.get(request_id, [])
+            }
+            for request_id, timestamp, source, num_detections in reversed(rows)
+        ]
+        return {"total": total, "history": history}
+
+    def aggregate(self, bucket_seconds: int, start: float = None, end: float = None,
+                  class_name: str = None) -> List[Dict[str, Any]]:
+        """Detection counts per class per time bucket (GROUP BY on the timestamp/class index)"""
+        where, params = self._filters(start, end, class_name, "d")
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"SELECT CAST(d.timestamp / ? AS INTEGER) * ? AS bucket, d.class_name, COUNT(*), "
+                f"AVG(d.confidence) FROM detections d{where} GROUP BY bucket, d.class_name "
+                f"ORDER BY bucket, d.class_name",
+                [bucket_seconds, bucket_seconds] + params
+            ).fetchall()
+        finally:
+            connection.close()
+        return [
+            {
+                "bucket_start": datetime.fromtimestamp(bucket).isoformat(),
+                "class": class_name_,
+                "count": count,
+                "avg_confidence": round(avg_confidence, 4)
+            }
+            for bucket, class_name_, count, avg_confidence in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped
+        }
+
+detection_store = DetectionStore(DETECTION_DB_PATH, DETECTION_DB_QUEUE_SIZE, DETECTION_DB_BATCH_SIZE,
+                                 DETECTION_DB_FLUSH_INTERVAL)
+
+def get_cache_key(image_bytes: bytes, model_key: str, variant: str = '') -> str:
+    """Cache key: content hash + everything else that changes the inference result"""
+    digest = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+    return f"{digest}:{model_key}:{CONFIDENCE_THRESHOLD}:{IOU_THRESHOLD}:{IMAGE_SIZE}:{variant}"
+
+def resolve_model(name: Optional[str] = None) -> ModelEntry:
+    """
+    Model version for a request: the named one, or the active one
+
+    Resolved once per request, so a swap never changes the model halfway.
+    """
+    entry = model_registry.get(name)
+    if entry is None:
+        if name is not None and model_registry.active_name is not None:
+            raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return entry
+
+def inference_capacity() -> int:
+    """Maximum number of images admitted for inference at once"""
+    return INFERENCE_WORKERS * BATCH_MAX_SIZE + INFERENCE_QUEUE_SIZE
+
+async def run_inference(image: np.ndarray, entry: ModelEntry) -> Dict[str, Any]:
+    """
+    Submit an image to the micro-batching scheduler with bounded admission.
+
+    Raises HTTP 503 with a Retry-After header when all workers are busy and
+    the waiting queue is full, instead of letting latency pile up.
+    """
+    global inflight_inferences
+    if inference_batcher is None:
+        raise HTTPException(status_code=503, detail="Inference workers not running")
+    if inflight_inferences >= inference_capacity():
+        raise HTTPException(
+            status_code=503,
+            detail="Inference queue is full, retry later",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    
+    inflight_inferences += 1
+    started = time.perf_counter()
+    try:
+        results = await inference_batcher.submit(image, entry)
+    finally:
+        inflight_inferences -= 1
+    if "first_inference_ms" not in startup_state["timings"]:
+        startup_state["timings"]["first_inference_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return results
+
+async def run_tiled_inference(image: np.ndarray, entry: ModelEntry, tile_size: int = TILE_SIZE,
+                              overlap: float = TILE_OVERLAP) -> Dict[str, Any]:
+    """
+    Sliced inference for high-resolution images
+
+    The image is split into overlapping tiles (plus a downscaled whole-image
+    pass for objects larger than a tile), the tiles run through the model in
+    batches of TILE_BATCH_SIZE, and the detections are merged with
+    merge_tile_detections() (detection_ops.py, shared with bulk_inference.py
+    and benchmark_tiling.py). Tile batches go straight to the inference
+    workers rather than through the micro-batcher, one after another, and
+    count against admission as one full batch. Images that fit in a single
+    tile use the normal path.
+    """
+    global inflight_inferences
+    height, width = image.shape[:2]
+    windows = make_tiles(width, height, tile_size, overlap, TILE_FULL_IMAGE)
+    if len(windows) == 1:
+        return await run_inference(image, entry)
+    
+    if inference_executor is None:
+        raise HTTPException(status_code=503, detail="Inference workers not running")
+    weight = min(len(windows), max(1, TILE_BATCH_SIZE))
+    if inflight_inferences and inflight_inferences + weight > inference_capacity():
+        raise HTTPException(
+            status_code=503,
+            detail="Inference queue is full, retry later",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    
+    crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+    chunk_size = max(1, TILE_BATCH_SIZE)
+    loop = asyncio.get_running_loop()
+    inflight_inferences += weight
+    try:
+        # One chunk at a time, so the request never runs more than the one batch it was admitted for
+        results = []
+        for i in range(0, len(crops), chunk_size):
+            results.extend(await loop.run_in_executor(
+                inference_executor, predict_batch_blocking, crops[i:i + chunk_size], entry))
+    finally:
+        inflight_inferences -= weight
+    
+    speed = {stage: sum(result["speed"].get(stage, 0.0) for result in results) for stage in results[0]["speed"]}
+    return {
+        "boxes": merge_tile_detections([result["boxes"] for result in results], windows, TILE_MERGE_THRESHOLD),
+        "names": results[0]["names"],
+        "speed": speed,
+        "tiles": len(windows)
+    }
 
 @app.get("/")
 async def root():
@@ -125,137 +1724,167 @@ async def root():
         "message": "🛰️ Falcon Detection API - NASA Space Apps Challenge 2025",
         "status": "online",
         "model_loaded": model is not None,
+        "model_backend": model_backend,
         "version": "1.0.0",
         "endpoints": {
             "predict_image": "/predict/image",
             "predict_base64": "/predict/base64",
+            "predict_batch": "/predict/batch",
+            "predict_video": "/predict/video",
+            "ws_detect": "/ws/detect",
+            "models": "/models",
             "health": "/health",
+            "ready": "/ready",
             "history": "/history",
-            "stats": "/stats"
+            "history_aggregate": "/history/aggregate",
+            "stats": "/stats",
+            "inference_stats": "/stats/inference",
+            "metrics": "/metrics"
         }
     }
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness probe - answers as soon as the process is up, also while the model loads"""
     return {
         "status": "healthy",
+        "startup": startup_state["status"],
         "model_loaded": model is not None,
+        "model_backend": model_backend,
+        "active_model": model_registry.active_name,
+        "inference_queue": {
+            "inflight": inflight_inferences,
+            "capacity": inference_capacity()
+        },
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe - 200 once the model is loaded and warmed up, 503 until then (or if startup failed)"""
+    ready = startup_state["status"] == "ready" and model is not None
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "status": startup_state["status"],
+            "active_model": model_registry.get().key if model_registry.get() else None,
+            "timings": startup_state["timings"]
+        }
+    )
+
 @app.post("/predict/image")
-async def predict_image(file: UploadFile = File(...)):
+async def predict_image(
+    file: UploadFile = File(...),
+    render: str = Query('none', pattern='^(none|jpeg|url)$'),
+    quality: int = Query(RENDER_JPEG_QUALITY, ge=1, le=100),
+    max_side: int = Query(RENDER_MAX_SIDE, ge=0),
+    debug: bool = Query(False),
+    tiled: bool = Query(False),
+    tile_size: int = Query(TILE_SIZE, ge=128, le=4096),
+    tile_overlap: float = Query(TILE_OVERLAP, ge=0.0, lt=0.9),
+    model_name: Optional[str] = Query(None, alias="model"),
+    accept: Optional[str] = Header(None)
+):
     """
     Predict objects in uploaded image
     
     Args:
         file: Image file (jpg, png, etc.)
+        render: Annotated image rendering
+            - none: detections only (default)
+            - jpeg: annotated JPEG inlined as a base64 data URL
+            - url: annotated JPEG stored server-side, fetch it from
+              GET /results/{result_id}/image (kept per process, so with
+              FALCON_SERVER_WORKERS > 1 the follow-up GET may miss it)
+        quality: JPEG quality of the annotated image
+        max_side: Longest side of the annotated image in pixels (0 = original size)
+        debug: Include the per-stage latency breakdown ("timings_ms")
+        tiled: Sliced inference over overlapping tiles at full resolution -
+            slower, but finds small objects in high-resolution images
+        tile_size: Tile side in original image pixels (tiled only)
+        tile_overlap: Fraction of each tile shared with its neighbour (tiled only)
+        model: Registered model version to use instead of the active one (see /models)
     
     Returns:
-        JSON with detections, annotated image, and metadata
+        JSON with detections, optional annotated image, and metadata. With
+        Accept: application/msgpack or application/x-falcon-boxes the
+        detections come back compact (see compact_response).
     """
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    entry = resolve_model(model_name)
+    response_format = negotiate_response_format(accept)
+    if response_format == 'packed' and render == 'jpeg':
+        raise HTTPException(status_code=406, detail="render=jpeg needs a JSON or MessagePack response")
     
+    timer = StageTimer()
     try:
-        # Read and decode image
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image file")
+        with timer.stage("read"):
+            contents = await file.read()
+        with timer.stage("cache_lookup"):
+            cache_key = get_cache_key(contents, entry.key, f"tiled:{tile_size}:{tile_overlap}" if tiled else '')
+            cached = result_cache.get(cache_key)
         
-        # Log image info
-        logger.info(f"Processing image: {image.shape[1]}x{image.shape[0]} pixels")
+        # Decode only when inference or rendering needs the pixels, at no more
+        # resolution than the model (or the rendered image) needs. Tiling
+        # needs the full resolution.
+        image = None
+        if cached is None or render != 'none':
+            target_size = IMAGE_SIZE if render == 'none' else (max(IMAGE_SIZE, max_side) if max_side else 1 << 30)
+            if tiled:
+                target_size = 1 << 30
+            with timer.stage("decode"):
+                image, scale = decode_image(contents, target_size)
+            
+            if image is None:
+                raise HTTPException(status_code=400, detail="Invalid image file")
         
-        # Run inference with optimized parameters
-        logger.info(f"Running inference (conf={CONFIDENCE_THRESHOLD}, iou={IOU_THRESHOLD})")
-        results = model.predict(
-            image,
-            conf=CONFIDENCE_THRESHOLD,
-            iou=IOU_THRESHOLD,
-            imgsz=640,  # Standard YOLO size
-            verbose=False,
-            device='cpu'  # Force CPU since we disabled CUDA
-        )[0]
+        if cached is None:
+            image_shape = (int(round(image.shape[0] * scale[1])), int(round(image.shape[1] * scale[0])))
+            # Log image info
+            logger.info(f"Processing image: {image_shape[1]}x{image_shape[0]} pixels "
+                        f"(decoded at {image.shape[1]}x{image.shape[0]})")
+            
+            # Run inference with optimized parameters
+            logger.info(f"Running inference (conf={CONFIDENCE_THRESHOLD}, iou={IOU_THRESHOLD})")
+            with timer.stage("inference_total"):
+                if tiled:
+                    results = await run_tiled_inference(image, entry, tile_size, tile_overlap)
+                else:
+                    results = await run_inference(image, entry)
+            timer.record_inference(results)
+            results = scale_boxes_to_original(results, scale)
+            result_cache.put(cache_key, (results, image_shape))
+            
+            logger.info(f"Raw detections: {len(results['boxes'])} objects found")
+        else:
+            results, image_shape = cached
+            logger.info(f"Cache hit: {len(results['boxes'])} objects")
         
-        logger.info(f"Raw detections: {len(results.boxes)} objects found")
+        # Process detections (one array -> list conversion, not one per coordinate)
+        detections = format_detections(results["boxes"], results["names"])
+        for detection in detections:
+            logger.info(f"Detected: {detection['class']} (conf: {detection['confidence']:.2f})")
         
-        # Process detections
-        detections = []
-        annotated_image = image.copy()
+        image_info = {
+            "width": int(image_shape[1]),
+            "height": int(image_shape[0])
+        }
         
-        for box in results.boxes:
-            # Extract box data
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            confidence = float(box.conf[0])
-            class_id = int(box.cls[0])
-            
-            # Get class name - handle both trained and pretrained models
-            if hasattr(model, 'names') and class_id in model.names:
-                class_name = model.names[class_id]
-            elif class_id < len(CLASS_NAMES):
-                class_name = CLASS_NAMES[class_id]
-            else:
-                class_name = f"Unknown_{class_id}"
-            
-            logger.info(f"Detected: {class_name} (conf: {confidence:.2f})")
-            
-            # Add to detections list
-            detections.append({
-                "class": class_name,
-                "class_id": class_id,
-                "confidence": round(confidence, 4),
-                "bbox": {
-                    "x1": float(x1),
-                    "y1": float(y1),
-                    "x2": float(x2),
-                    "y2": float(y2),
-                    "width": float(x2 - x1),
-                    "height": float(y2 - y1)
-                }
-            })
-            
-            # Draw bounding box with thicker line
-            color = get_color_for_class(class_id)
-            cv2.rectangle(annotated_image, (int(x1), int(y1)), (int(x2), int(y2)), color, 3)
-            
-            # Format class name with spaces instead of underscores
-            display_name = class_name.replace('_', ' ')
-            
-            # Draw label with background - larger and more visible
-            label = f"{display_name} {confidence:.1%}"
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            font_scale = 0.7
-            font_thickness = 2
-            
-            label_size, baseline = cv2.getTextSize(label, font, font_scale, font_thickness)
-            
-            # Draw filled rectangle for label background
-            cv2.rectangle(
-                annotated_image,
-                (int(x1), int(y1) - label_size[1] - 15),
-                (int(x1) + label_size[0] + 10, int(y1)),
-                color,
-                -1
-            )
-            
-            # Draw label text in white
-            cv2.putText(
-                annotated_image,
-                label,
-                (int(x1) + 5, int(y1) - 8),
-                font,
-                font_scale,
-                (255, 255, 255),
-                font_thickness
+        if render != 'none':
+            # Draw and encode off the event loop
+            loop = asyncio.get_running_loop()
+            decoded_boxes = scale_boxes_to_original(results, (1 / scale[0], 1 / scale[1]))["boxes"]
+            jpeg = await loop.run_in_executor(
+                None, render_annotated_jpeg, image, decoded_boxes, results["names"], quality, max_side, timer
             )
-        
-        # Convert annotated image to base64
-        _, buffer = cv2.imencode('.jpg', annotated_image)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
+            if render == 'jpeg':
+                with timer.stage("base64"):
+                    img_base64 = base64.b64encode(jpeg).decode('utf-8')
+                image_info["annotated"] = f"data:image/jpeg;base64,{img_base64}"
+            else:
+                result_id = store_rendered_image(jpeg)
+                image_info["result_id"] = result_id
+                image_info["annotated_url"] = f"/results/{result_id}/image"
         
         # Create response
         response = {
@@ -263,13 +1892,15 @@ async def predict_image(file: UploadFile = File(...)):
             "timestamp": datetime.now().isoformat(),
             "num_detections": len(detections),
             "detections": detections,
-            "image": {
-                "width": image.shape[1],
-                "height": image.shape[0],
-                "annotated": f"data:image/jpeg;base64,{img_base64}"
-            },
-            "inference_time_ms": float(results.speed['inference']),
+            "image": image_info,
+            "inference_time_ms": float(results["speed"]['inference']),
+            "cached": cached is not None,
+            "model": entry.key,
         }
+        if tiled:
+            response["tiles"] = results.get("tiles", 1)
+        if debug or DEBUG_TIMINGS:
+            response["timings_ms"] = timer.timings  # JSON serialization is only in /metrics
         
         # Save to history
         detection_history.append({
@@ -277,124 +1908,788 @@ async def predict_image(file: UploadFile = File(...)):
             "num_detections": len(detections),
             "objects": [d["class"] for d in detections]
         })
+        detection_store.log("image", time.time(), detections, (image_info["width"], image_info["height"]),
+                            response["inference_time_ms"])
         
-        # Keep only last 100 detections
-        if len(detection_history) > 100:
-            detection_history.pop(0)
-        
-        return JSONResponse(content=response)
+        if response_format != 'json':
+            del response["detections"]
+            with timer.stage(response_format):
+                return compact_response(response_format, results["boxes"], results["names"], response)
+        with timer.stage("json"):
+            return JSONResponse(content=response)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during prediction: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/predict/batch")
+async def predict_batch(
+    files: List[UploadFile] = File(None),
+    archive: UploadFile = File(None),
+    render: str = Query('none', pattern='^(none|jpeg|url)$'),
+    quality: int = Query(RENDER_JPEG_QUALITY, ge=1, le=100),
+    max_side: int = Query(RENDER_MAX_SIDE, ge=0),
+    debug: bool = Query(False),
+    model_name: Optional[str] = Query(None, alias="model")
+):
+    """
+    Score many images in one request
+    
+    Args:
+        files: Image files (multipart list)
+        archive: Zip archive of images (alternative to files)
+        render: Annotated images per result - none (default), jpeg or url
+            (same as /predict/image)
+        quality: JPEG quality of the annotated images
+        max_side: Longest side of the annotated images in pixels (0 = original size)
+        debug: Include each image's per-stage latency breakdown ("timings_ms")
+        model: Registered model version to use instead of the active one
+    
+    Returns:
+        NDJSON stream with one line per image (in upload order), emitted as
+        each chunk finishes, followed by a {"summary": ...} line.
+    
+    Uploads are spooled to disk by the multipart parser and read one chunk at
+    a time, so memory use does not grow with the number of images. The next
+    chunk is decoded in parallel while the current one runs inference.
+    """
+    entry = resolve_model(model_name)
+    if not files and archive is None:
+        raise HTTPException(status_code=400, detail="Upload images as 'files' or a zip 'archive'")
+    
+    # FastAPI closes uploads when the handler returns, before the response is
+    # streamed. Keep the spooled files open for the stream and give the form
+    # empty placeholders to close instead.
+    handles = []
+    for upload in (files or []) + ([archive] if archive is not None else []):
+        handles.append(upload.file)
+        upload.file = io.BytesIO()
+    
+    sources = []
+    if archive is not None:
+        try:
+            zip_file = zipfile.ZipFile(handles[-1])
+        except zipfile.BadZipFile:
+            for handle in handles:
+                handle.close()
+            raise HTTPException(status_code=400, detail="Invalid zip archive")
+        for info in zip_file.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                sources.append((info.filename, partial(zip_file.read, info)))
+    for upload, handle in zip(files or [], handles):
+        sources.append((upload.filename, handle.read))
+    
+    return StreamingResponse(
+        stream_batch_predictions(sources, handles, render, quality, max_side, entry, debug),
+        media_type="application/x-ndjson"
+    )
+
+def load_and_decode(loader, target_size: int = IMAGE_SIZE) -> tuple:
+    """Read one image's bytes and decode them (runs in the decode pool), returns (image, scale, timer)"""
+    timer = StageTimer()
+    with timer.stage("read"):
+        contents = loader()
+    with timer.stage("decode"):
+        image, scale = decode_image(contents, target_size)
+    return image, scale, timer
+
+async def run_inference_chunk(images: List[np.ndarray], entry: ModelEntry) -> List[Dict[str, Any]]:
+    """
+    Run inference on a chunk of images for bulk callers
+
+    Instead of failing with 503 when the queue is full, the chunk waits until
+    there is room, so bulk work yields to interactive requests.
+    """
+    global inflight_inferences
+    while inflight_inferences and inflight_inferences + len(images) > inference_capacity():
+        await asyncio.sleep(BATCH_ADMISSION_POLL_SECONDS)
+    inflight_inferences += len(images)
+    try:
+        return await asyncio.gather(*(inference_batcher.submit(image, entry) for image in images))
+    finally:
+        inflight_inferences -= len(images)
+
+async def stream_batch_predictions(sources: List[tuple], handles: list, render: str, quality: int,
+                                   max_side: int, entry: ModelEntry, debug: bool = False):
+    """Yield NDJSON result lines for /predict/batch, chunk by chunk"""
+    loop = asyncio.get_running_loop()
+    chunk_size = max(1, min(BATCH_UPLOAD_CHUNK_SIZE, inference_capacity()))
+    chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), chunk_size)]
+    
+    target_size = IMAGE_SIZE if render == 'none' else (max(IMAGE_SIZE, max_side) if max_side else 1 << 30)
+    
+    def schedule_decode(chunk):
+        return asyncio.gather(
+            *(loop.run_in_executor(decode_executor, load_and_decode, loader, target_size) for _, loader in chunk),
+            return_exceptions=True
+        )
+    
+    started = time.perf_counter()
+    processed = failed = total_objects = 0
+    try:
+        pending = schedule_decode(chunks[0]) if chunks else None
+        for chunk_index, chunk in enumerate(chunks):
+            images = await pending
+            # Prefetch: decode the next chunk while this one runs inference
+            pending = schedule_decode(chunks[chunk_index + 1]) if chunk_index + 1 < len(chunks) else None
+            
+            valid = [i for i, decoded in enumerate(images)
+                     if isinstance(decoded, tuple) and decoded[0] is not None]
+            inference_started = time.perf_counter()
+            results = await run_inference_chunk([images[i][0] for i in valid], entry)
+            inference_ms = (time.perf_counter() - inference_started) * 1000
+            results_by_index = dict(zip(valid, results))
+            
+            lines = []
+            for i, (filename, _) in enumerate(chunk):
+                index = chunk_index * chunk_size + i
+                if i not in results_by_index:
+                    failed += 1
+                    error = {"index": index, "filename": filename, "error": "Invalid image file"}
+                    lines.append(json.dumps(error) + "\n")
+                    continue
+                
+                (image, scale, timer), result = images[i], results_by_index[i]
+                timer.record("inference_total", inference_ms)  # Every image of the chunk waits for all of it
+                timer.record_inference(result)
+                original = scale_boxes_to_original(result, scale)
+                width, height = int(round(image.shape[1] * scale[0])), int(round(image.shape[0] * scale[1]))
+                detections = format_detections(original["boxes"], result["names"])
+                line = {
+                    "index": index,
+                    "filename": filename,
+                    "num_detections": len(detections),
+                    "detections": detections,
+                    "image": {"width": width, "height": height},
+                    "inference_time_ms": float(result["speed"]['inference'])
+                }
+                if render != 'none':
+                    jpeg = await loop.run_in_executor(
+                        decode_executor, render_annotated_jpeg, image, result["boxes"], result["names"],
+                        quality, max_side, timer
+                    )
+                    if render == 'jpeg':
+                        with timer.stage("base64"):
+                            img_base64 = base64.b64encode(jpeg).decode('utf-8')
+                        line["image"]["annotated"] = f"data:image/jpeg;base64,{img_base64}"
+                    else:
+                        result_id = store_rendered_image(jpeg)
+                        line["image"]["result_id"] = result_id
+                        line["image"]["annotated_url"] = f"/results/{result_id}/image"
+                
+                detection_store.log("batch", time.time(), detections, (width, height),
+                                    line["inference_time_ms"])
+                if debug or DEBUG_TIMINGS:
+                    line["timings_ms"] = timer.timings  # JSON serialization is only in /metrics
+                processed += 1
+                total_objects += len(detections)
+                with timer.stage("json"):
+                    lines.append(json.dumps(line) + "\n")
+            
+            yield "".join(lines)
+        
+        elapsed = time.perf_counter() - started
+        yield json.dumps({"summary": {
+            "images": len(sources),
+            "processed": processed,
+            "failed": failed,
+            "total_objects_detected": total_objects,
+            "elapsed_s": round(elapsed, 3),
+            "images_per_second": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "model": entry.key
+        }}) + "\n"
+    finally:
+        for handle in handles:
+            handle.close()
+
+class VideoFrameSampler:
+    """
+    Sequential frame sampler over a video file
+
+    Every stride-th frame is a candidate. Without scene_change every
+    candidate is sampled; with it, only candidates whose downscaled grayscale
+    differs from the last sampled frame by more than scene_threshold (mean
+    absolute difference, 0-1), plus at least one every
+    VIDEO_KEYFRAME_INTERVAL frames. Frames that are not sampled are only
+    grabbed, never converted to images. Sampled frames larger than the model
+    input are downscaled, so memory per batch is bounded whatever the video
+    resolution or length.
+    """
+
+    def __init__(self, path: str, stride: int, scene_change: bool = False,
+                 scene_threshold: float = VIDEO_SCENE_THRESHOLD):
+        self.capture = cv2.VideoCapture(path)
+        self.stride = max(1, stride)
+        self.scene_change = scene_change
+        self.scene_threshold = scene_threshold
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self._last_thumbnail = None
+        self._last_sampled = -VIDEO_KEYFRAME_INTERVAL
+
+    @property
+    def opened(self) -> bool:
+        return self.capture.isOpened()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "width": int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": round(self.fps, 3),
+            "frame_count": int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        }
+
+    def timestamp(self, frame_index: int) -> Optional[float]:
+        return round(frame_index / self.fps, 3) if self.fps > 0 else None
+
+    def read_batch(self, size: int) -> List[tuple]:
+        """Next size sampled frames as (frame index, BGR image, scale to original), [] at the end"""
+        batch = []
+        while len(batch) < size:
+            if not self.capture.grab():
+                break
+            index = self.frames_read
+            self.frames_read += 1
+            if index % self.stride:
+                continue
+            ok, frame = self.capture.retrieve()
+            if not ok:
+                continue
+            if self.scene_change and index - self._last_sampled < VIDEO_KEYFRAME_INTERVAL:
+                thumbnail = cv2.cvtColor(cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA),
+                                         cv2.COLOR_BGR2GRAY)
+                if self._last_thumbnail is not None:
+                    difference = cv2.absdiff(thumbnail, self._last_thumbnail).mean() / 255
+                    if difference < self.scene_threshold:
+                        continue
+                self._last_thumbnail = thumbnail
+            elif self.scene_change:
+                self._last_thumbnail = cv2.cvtColor(cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA),
+                                                    cv2.COLOR_BGR2GRAY)
+            self._last_sampled = index
+            
+            scale = (1.0, 1.0)
+            h, w = frame.shape[:2]
+            if max(h, w) > IMAGE_SIZE:
+                gain = IMAGE_SIZE / max(h, w)
+                frame = cv2.resize(frame, (max(1, round(w * gain)), max(1, round(h * gain))),
+                                   interpolation=cv2.INTER_AREA)
+                scale = (w / frame.shape[1], h / frame.shape[0])
+            self.frames_sampled += 1
+            batch.append((index, frame, scale))
+        return batch
+
+    def close(self):
+        self.capture.release()
+
+def spool_to_file(source, suffix: str) -> str:
+    """Copy an upload to a named temporary file (OpenCV needs a path) in fixed-size chunks"""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as target:
+        shutil.copyfileobj(source, target, 1 << 20)
+        return target.name
+
+@app.post("/predict/video")
+async def predict_video(
+    file: UploadFile = File(...),
+    stride: int = Query(VIDEO_STRIDE, ge=1),
+    scene_change: bool = Query(False),
+    scene_threshold: float = Query(VIDEO_SCENE_THRESHOLD, gt=0.0, le=1.0),
+    min_hits: int = Query(VIDEO_MIN_TRACK_HITS, ge=1),
+    debug: bool = Query(False),
+    model_name: Optional[str] = Query(None, alias="model")
+):
+    """
+    Detect and track objects in a video file
+    
+    Args:
+        file: Video file (anything OpenCV/FFmpeg can read: mp4, avi, mkv, ...)
+        stride: Sample every Nth frame
+        scene_change: Of the stride candidates, only sample frames that differ
+            from the last sampled one (static footage is skipped)
+        scene_threshold: Mean grayscale difference (0-1) that counts as a change
+        min_hits: Drop tracks detected in fewer sampled frames
+        debug: Include the per-stage latency breakdown ("timings_ms", summed
+            over all frames) in the summary
+        model: Registered model version to use instead of the active one
+    
+    Returns:
+        NDJSON stream: a {"video": ...} line, one {"track": ...} line per
+        object track as soon as it ends, then a {"summary": ...} line.
+    
+    Frames are decoded sequentially and batched through the model while the
+    next batch is decoded, and only live tracks are kept, so memory stays
+    constant however long the video is.
+    """
+    entry = resolve_model(model_name)
+    loop = asyncio.get_running_loop()
+    suffix = Path(file.filename or '').suffix or '.mp4'
+    timer = StageTimer()
+    with timer.stage("read"):
+        path = await loop.run_in_executor(None, spool_to_file, file.file, suffix)
+    
+    sampler = await loop.run_in_executor(None, VideoFrameSampler, path, stride, scene_change, scene_threshold)
+    if not sampler.opened:
+        sampler.close()
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail="Invalid or unsupported video file")
+    
+    return StreamingResponse(
+        stream_video_tracks(sampler, path, entry, min_hits, timer, debug),
+        media_type="application/x-ndjson"
+    )
+
+async def stream_video_tracks(sampler: VideoFrameSampler, path: str, entry: ModelEntry, min_hits: int,
+                              timer: StageTimer, debug: bool = False):
+    """Yield NDJSON track lines for /predict/video"""
+    loop = asyncio.get_running_loop()
+    tracker = IoUTracker(VIDEO_TRACK_IOU, VIDEO_TRACK_HIGH_THRESHOLD, VIDEO_TRACK_MAX_AGE)
+    names: Dict[int, str] = {}
+    started = time.perf_counter()
+    reported = detections = 0
+    pending = None
+    
+    def track_lines(finished: list) -> str:
+        nonlocal reported
+        with timer.stage("json"):
+            lines = [json.dumps({"track": format_track(track, names)}) + "\n"
+                     for track in finished if track["hits"] >= min_hits]
+        reported += len(lines)
+        return "".join(lines)
+    
+    def read_frames() -> List[tuple]:
+        with timer.stage("decode"):
+            return sampler.read_batch(VIDEO_BATCH_SIZE)
+    
+    try:
+        yield json.dumps({"video": sampler.info()}) + "\n"
+        pending = loop.run_in_executor(decode_executor, read_frames)
+        while True:
+            frames = await pending
+            pending = None
+            if not frames:
+                break
+            # Prefetch: decode the next batch while this one runs inference
+            pending = loop.run_in_executor(decode_executor, read_frames)
+            
+            with timer.stage("inference_total"):
+                results = await run_inference_chunk([image for _, image, _ in frames], entry)
+            finished = []
+            for (index, _, scale), result in zip(frames, results):
+                timer.record_inference(result)
+                names = result["names"]
+                boxes = scale_boxes_to_original(result, scale)["boxes"]
+                detections += len(boxes)
+                with timer.stage("tracking"):
+                    finished += tracker.update(boxes, index, sampler.timestamp(index))
+            lines = track_lines(finished)
+            if lines:
+                yield lines
+        
+        lines = track_lines(tracker.flush())
+        if lines:
+            yield lines
+        elapsed = time.perf_counter() - started
+        summary = {
+            "frames_read": sampler.frames_read,
+            "frames_sampled": sampler.frames_sampled,
+            "detections": detections,
+            "tracks": reported,
+            "elapsed_s": round(elapsed, 3),
+            "frames_per_second": round(sampler.frames_read / elapsed, 2) if elapsed > 0 else 0.0,
+            "model": entry.key
+        }
+        if debug or DEBUG_TIMINGS:
+            summary["timings_ms"] = timer.timings
+        yield json.dumps({"summary": summary}) + "\n"
+    finally:
+        if pending is not None:
+            try:
+                await pending  # The capture must not be released mid-read
+            except Exception:
+                pass
+        sampler.close()
+        os.unlink(path)
+
+@app.get("/results/{result_id}/image")
+async def get_result_image(result_id: str):
+    """Get the annotated JPEG of a /predict/image?render=url result"""
+    jpeg = rendered_images.get(result_id)
+    if jpeg is None:
+        raise HTTPException(status_code=404, detail="Result image not found or expired")
+    return Response(content=jpeg, media_type="image/jpeg")
+
 @app.post("/predict/base64")
-async def predict_base64(data: Dict[str, Any]):
+async def predict_base64(data: Dict[str, Any], debug: bool = Query(False), accept: Optional[str] = Header(None)):
     """
     Predict objects from base64 encoded image (for webcam streams)
     
     Args:
-        data: JSON with 'image' field containing base64 string
+        data: JSON with 'image' field containing base64 string, and optionally
+            'model' to use a registered model version instead of the active one
+            and 'session', an id the client keeps for the whole webcam session
+        debug: Include the per-stage latency breakdown ("timings_ms")
     
     Returns:
-        JSON with detections
+        JSON with detections, or MessagePack / packed float32 rows when the
+        Accept header asks for them (see compact_response)
+    
+    With a session id, frames that barely differ from the session's last
+    inferred frame reuse its detections for up to FRAME_GATE_MAX_STALENESS
+    seconds ("gated": true, "gate_age_ms"), and "frame_gate" reports how many
+    of the session's frames skipped inference.
     """
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    entry = resolve_model(data.get('model'))
+    response_format = negotiate_response_format(accept)
+    session_id = data.get('session')
+    gate = session_id is not None and frame_gate.enabled
     
+    timer = StageTimer()
     try:
         # Decode base64 image
-        image_data = data.get('image', '')
-        if image_data.startswith('data:image'):
-            image_data = image_data.split(',')[1]
-        
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image data")
-        
-        # Run inference
-        results = model.predict(
-            image,
-            conf=CONFIDENCE_THRESHOLD,
-            iou=IOU_THRESHOLD,
-            verbose=False
-        )[0]
+        with timer.stage("base64"):
+            image_data = data.get('image', '')
+            if image_data.startswith('data:image'):
+                image_data = image_data.split(',')[1]
+            
+            image_bytes = base64.b64decode(image_data)
+        gated = None
+        if gate:
+            session_id = str(session_id)
+            with timer.stage("frame_gate"):
+                thumbnail = frame_thumbnail(image_bytes)
+                gated = frame_gate.lookup(session_id, thumbnail, entry.key) if thumbnail is not None else None
+        if gated is not None:
+            results, cached = gated[0], True
+        else:
+            with timer.stage("cache_lookup"):
+                cache_key = get_cache_key(image_bytes, entry.key)
+                results = result_cache.get(cache_key)
+            cached = results is not None
         
-        # Process detections
-        detections = []
-        for box in results.boxes:
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            confidence = float(box.conf[0])
-            class_id = int(box.cls[0])
-            class_name = CLASS_NAMES[class_id] if class_id < len(CLASS_NAMES) else f"Class_{class_id}"
+        if gated is not None:
+            results = results[0]
+        elif not cached:
+            with timer.stage("decode"):
+                image, scale = decode_image(image_bytes)
             
-            detections.append({
-                "class": class_name,
-                "class_id": class_id,
-                "confidence": round(confidence, 4),
-                "bbox": {
-                    "x1": float(x1),
-                    "y1": float(y1),
-                    "x2": float(x2),
-                    "y2": float(y2)
-                }
-            })
+            if image is None:
+                raise HTTPException(status_code=400, detail="Invalid image data")
+            
+            # Run inference
+            with timer.stage("inference_total"):
+                results = await run_inference(image, entry)
+            timer.record_inference(results)
+            results = scale_boxes_to_original(results, scale)
+            image_shape = (int(round(image.shape[0] * scale[1])), int(round(image.shape[1] * scale[0])))
+            result_cache.put(cache_key, (results, image_shape))
+            if gate and thumbnail is not None:
+                frame_gate.update(session_id, thumbnail, (results, image_shape), entry.key)
+        else:
+            if gate and thumbnail is not None:
+                frame_gate.update(session_id, thumbnail, results, entry.key)
+            results = results[0]
         
-        return JSONResponse(content={
+        response = {
             "success": True,
-            "num_detections": len(detections),
-            "detections": detections,
-            "inference_time_ms": float(results.speed['inference'])
-        })
+            "inference_time_ms": float(results["speed"]['inference']),
+            "cached": cached,
+            "model": entry.key
+        }
+        if gate:
+            response["gated"] = gated is not None
+            if gated is not None:
+                response["gate_age_ms"] = round(gated[1] * 1000, 1)
+            response["frame_gate"] = frame_gate.session_stats(session_id)
+        if debug or DEBUG_TIMINGS:
+            response["timings_ms"] = timer.timings  # JSON serialization is only in /metrics
         
+        if response_format != 'json':
+            with timer.stage(response_format):
+                return compact_response(response_format, results["boxes"], results["names"], response)
+        
+        detections = format_detections(results["boxes"], results["names"])
+        response["num_detections"] = len(detections)
+        response["detections"] = detections
+        with timer.stage("json"):
+            return JSONResponse(content=response)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during base64 prediction: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.websocket("/ws/detect")
+async def websocket_detect(websocket: WebSocket):
+    """
+    Streaming detection for the webcam path
+
+    The client sends binary JPEG frames. Every frame received is numbered
+    with a per-connection sequence number (starting at 1), so the client can
+    match replies to the frames it sent and measure end-to-end latency.
+    
+    Backpressure is latest-frame-wins: while a frame is being processed only
+    the newest incoming frame is kept, older ones are dropped.
+    
+    Connect with ?model=<name> to pin a registered model version; otherwise
+    every frame uses whichever model is active when it arrives, so sessions
+    survive model swaps.
+    
+    The connection is a frame-gate session: a frame that barely differs from
+    the last inferred one reuses its detections ("gated": true) and
+    "skip_ratio" is the share of the connection's frames that did.
+    
+    Reply format (compact JSON text frames, or binary MessagePack frames of
+    the same message when connected with ?format=msgpack):
+        {"seq": 12, "detections": [[x1, y1, x2, y2, conf, class_id], ...],
+         "inference_time_ms": 41.2, "dropped": 3, "gated": false, "skip_ratio": 0.62}
+    """
+    await websocket.accept()
+    model_name = websocket.query_params.get("model")
+    use_msgpack = websocket.query_params.get("format") == "msgpack"
+    if use_msgpack and msgpack is None:
+        await websocket.send_text(json.dumps({"error": "MessagePack is not available on this server"}))
+        await websocket.close(code=1003)
+        return
+    session_id = f"ws-{uuid.uuid4().hex}"
+    
+    latest = {"seq": 0, "frame": None, "closed": False}
+    frame_ready = asyncio.Event()
+    dropped = 0
+    
+    async def receive_frames():
+        nonlocal dropped
+        try:
+            while True:
+                frame = await websocket.receive_bytes()
+                latest["seq"] += 1
+                if latest["frame"] is not None:
+                    dropped += 1  # Previous frame was never processed
+                latest["frame"] = frame
+                frame_ready.set()
+        except (WebSocketDisconnect, RuntimeError, KeyError):
+            # KeyError: text message received instead of bytes
+            pass
+        finally:
+            latest["closed"] = True
+            frame_ready.set()
+    
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if latest["closed"]:
+                break
+            seq, frame = latest["seq"], latest["frame"]
+            latest["frame"] = None
+            if frame is None:
+                continue
+            
+            thumbnail = frame_thumbnail(frame) if frame_gate.enabled else None
+            image, scale = (None, None) if frame_gate.enabled else decode_image(frame)  # Gated frames skip decoding
+            if thumbnail is None and image is None:
+                await websocket.send_text(json.dumps({"seq": seq, "error": "Invalid image data"}))
+                continue
+            try:
+                entry = resolve_model(model_name)
+            except HTTPException as e:
+                await websocket.send_text(json.dumps({"seq": seq, "error": e.detail}))
+                continue
+            
+            gated = frame_gate.lookup(session_id, thumbnail, entry.key) if thumbnail is not None else None
+            if gated is not None:
+                results = gated[0]
+            else:
+                if image is None:
+                    image, scale = decode_image(frame)
+                    if image is None:
+                        await websocket.send_text(json.dumps({"seq": seq, "error": "Invalid image data"}))
+                        continue
+                try:
+                    results = scale_boxes_to_original(await run_inference(image, entry), scale)
+                except HTTPException as e:
+                    dropped += 1
+                    await websocket.send_text(json.dumps({"seq": seq, "error": e.detail, "dropped": dropped}))
+                    continue
+                if thumbnail is not None:
+                    frame_gate.update(session_id, thumbnail, results, entry.key)
+            
+            boxes = results["boxes"].astype(np.float64)  # Round in double so the JSON stays short
+            message = {
+                "seq": seq,
+                "detections": [
+                    coords + [confidence, class_id] for coords, confidence, class_id in
+                    zip(boxes[:, :4].round(1).tolist(), boxes[:, 4].round(4).tolist(), boxes[:, 5].astype(int).tolist())
+                ],
+                "inference_time_ms": round(float(results["speed"]['inference']), 2),
+                "dropped": dropped
+            }
+            if frame_gate.enabled:
+                message["gated"] = gated is not None
+                message["skip_ratio"] = frame_gate.session_stats(session_id)["skip_ratio"]
+            if use_msgpack:
+                await websocket.send_bytes(msgpack.packb(message, use_single_float=True))
+            else:
+                await websocket.send_text(json.dumps(message, separators=(',', ':')))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Error during websocket detection: {e}")
+    finally:
+        receiver.cancel()
+        frame_gate.discard(session_id)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Guard for model management: loading weights unpickles server-side files,
+    so without FALCON_ADMIN_TOKEN the write routes are refused outright
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model management is disabled (set FALCON_ADMIN_TOKEN)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Admin-Token")
+
+@app.get("/models")
+async def list_models():
+    """Registered model versions and the active one"""
+    return model_registry.info()
+
+@app.post("/models/{name}", dependencies=[Depends(require_admin)])
+async def load_named_model(name: str, path: Optional[str] = None, activate: bool = False):
+    """
+    Load (or reload) a named model version and warm it up
+    
+    Args:
+        name: Registry name (reloading the active name swaps the new version in)
+        path: .pt weights (the MODEL_BACKEND export next to it is served if
+            configured); defaults to the path name was loaded from
+        activate: Make it the active model once it is warm
+    
+    Requests keep being served by the current models while it loads.
+    """
+    current = model_registry.entries.get(name)
+    weights = Path(path) if path else (Path(current.path) if current else None)
+    if weights is None:
+        raise HTTPException(status_code=400, detail="path is required for a new model")
+    if not weights.exists():
+        raise HTTPException(status_code=404, detail=f"Weights not found: {weights}")
+    
+    loop = asyncio.get_running_loop()
+    try:
+        entry = await loop.run_in_executor(None, model_registry.load, name, weights, True, activate)
+    except Exception as e:
+        logger.error(f"❌ Failed to load model '{name}': {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to load model: {e}")
+    return {"loaded": entry.info(), "active": model_registry.get().key}
+
+@app.post("/models/{name}/activate", dependencies=[Depends(require_admin)])
+async def activate_model(name: str):
+    """Atomically switch the active model; in-flight requests finish on the previous one"""
+    if name not in model_registry.entries:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    model_registry.activate(name)
+    return model_registry.info()
+
+@app.delete("/models/{name}", dependencies=[Depends(require_admin)])
+async def unload_model(name: str):
+    """Unload an inactive model version"""
+    if name not in model_registry.entries:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    try:
+        model_registry.unload(name)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_registry.info()
+
 @app.get("/history")
-async def get_history():
-    """Get detection history"""
+async def get_history(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    class_name: Optional[str] = Query(None, alias="class"),
+    limit: int = Query(20, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Query the persistent detection log
+    
+    Args:
+        start: Only entries at or after this time (ISO 8601)
+        end: Only entries before this time (ISO 8601)
+        class: Only entries containing this class
+        limit: Page size (newest entries first)
+        offset: Number of newer entries to skip
+    
+    Returns:
+        Matching entry count and one page of entries in chronological order
+    """
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        None, lambda: detection_store.query(
+            start.timestamp() if start else None, end.timestamp() if end else None, class_name, limit, offset
+        )
+    )
     return {
-        "total_detections": len(detection_history),
-        "history": detection_history[-20:]  # Last 20 detections
+        "total_detections": result["total"],
+        "limit": limit,
+        "offset": offset,
+        "history": result["history"]
     }
 
+@app.get("/history/aggregate")
+async def get_history_aggregate(
+    bucket: str = Query('hour', pattern='^(minute|hour|day)$'),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    class_name: Optional[str] = Query(None, alias="class")
+):
+    """Detection counts per class per time bucket from the persistent log"""
+    loop = asyncio.get_running_loop()
+    counts = await loop.run_in_executor(
+        None, lambda: detection_store.aggregate(
+            AGGREGATE_BUCKETS[bucket], start.timestamp() if start else None,
+            end.timestamp() if end else None, class_name
+        )
+    )
+    return {"bucket": bucket, "counts": counts}
+
 @app.get("/stats")
 async def get_stats():
     """Get detection statistics"""
-    if not detection_history:
-        return {
-            "total_sessions": 0,
-            "total_objects_detected": 0,
-            "most_detected": None
-        }
-    
-    # Count object occurrences
-    object_counts = {}
-    total_objects = 0
-    
-    for detection in detection_history:
-        for obj in detection.get('objects', []):
-            object_counts[obj] = object_counts.get(obj, 0) + 1
-            total_objects += 1
-    
-    most_detected = max(object_counts.items(), key=lambda x: x[1])[0] if object_counts else None
-    
+    stats = detection_history.stats()
+    if not stats["total_sessions"]:
+        del stats["object_breakdown"]
+    stats["result_cache"] = result_cache.stats()
+    stats["frame_gate"] = frame_gate.stats()
+    stats["detection_log"] = detection_store.stats()
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms, request counters, queue depth, memory"""
+    return PlainTextResponse(render_prometheus_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/inference")
+async def get_inference_stats():
+    """Get inference scheduler statistics (batch-size and queue-wait histograms)"""
+    if inference_batcher is None:
+        raise HTTPException(status_code=503, detail="Inference workers not running")
     return {
-        "total_sessions": len(detection_history),
-        "total_objects_detected": total_objects,
-        "most_detected": most_detected,
-        "object_breakdown": object_counts
+        "executor": INFERENCE_EXECUTOR,
+        "workers": INFERENCE_WORKERS,
+        "inflight": inflight_inferences,
+        "capacity": inference_capacity(),
+        "batching": inference_batcher.stats()
     }
 
 @app.delete("/history")
 async def clear_history():
-    """Clear detection history"""
-    global detection_history
-    detection_history = []
+    """Clear detection history (in-memory and persistent)"""
+    detection_history.clear()
+    detection_store.clear()
     return {"success": True, "message": "History cleared"}
 
 def get_color_for_class(class_id: int) -> tuple:
@@ -410,18 +2705,266 @@ def get_color_for_class(class_id: int) -> tuple:
     ]
     return colors[class_id % len(colors)]
 
+def format_detections(boxes: np.ndarray, names: Dict[int, str]) -> List[Dict[str, Any]]:
+    """Detections in the /predict/image response format"""
+    detections = []
+    for x1, y1, x2, y2, confidence, class_id in boxes.tolist():
+        class_id = int(class_id)
+        detections.append({
+            "class": get_class_name(class_id, names),
+            "class_id": class_id,
+            "confidence": round(confidence, 4),
+            "bbox": {
+                "x1": x1,
+                "y1": y1,
+                "x2": x2,
+                "y2": y2,
+                "width": x2 - x1,
+                "height": y2 - y1
+            }
+        })
+    return detections
+
+def negotiate_response_format(accept: Optional[str]) -> str:
+    """'msgpack', 'packed' or 'json' - the client's most preferred format in the Accept header that we can produce"""
+    ranked = []
+    for position, item in enumerate((accept or '').split(',')):
+        media, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    pass
+        ranked.append((-quality, position, media.lower()))
+    for negative_quality, _, media in sorted(ranked):
+        if negative_quality >= 0:
+            break
+        if media in MSGPACK_MEDIA_TYPES and msgpack is not None:
+            return 'msgpack'
+        if media == PACKED_BOXES_MEDIA_TYPE:
+            return 'packed'
+        if media in ('application/json', 'application/*', '*/*'):
+            return 'json'
+    return 'json'
+
+def compact_response(response_format: str, boxes: np.ndarray, names: Dict[int, str],
+                     meta: Dict[str, Any]) -> Response:
+    """
+    Detections without per-box JSON objects
+    
+    msgpack: the response fields plus "boxes" as [x1, y1, x2, y2, conf,
+    class_id] rows (float32) and "classes" mapping the class ids present to
+    names. packed: the raw N x 6 little-endian float32 array as the body and
+    the other fields as compact JSON in the X-Falcon-Meta header.
+    """
+    boxes = np.ascontiguousarray(boxes[:, :6], dtype='<f4')
+    class_ids = np.unique(boxes[:, 5]).astype(int).tolist()
+    meta = {**meta, "num_detections": len(boxes),
+            "classes": {str(class_id): get_class_name(class_id, names) for class_id in class_ids}}
+    if response_format == 'packed':
+        return Response(content=boxes.tobytes(), media_type=PACKED_BOXES_MEDIA_TYPE,
+                        headers={"X-Falcon-Meta": json.dumps(meta, separators=(',', ':'))})
+    meta["boxes"] = boxes.tolist()
+    return Response(content=msgpack.packb(meta, use_single_float=True), media_type=MSGPACK_MEDIA_TYPES[0])
+
+def get_class_name(class_id: int, names: Dict[int, str]) -> str:
+    """Get class name - handle both trained and pretrained models"""
+    if class_id in names:
+        return names[class_id]
+    elif class_id < len(CLASS_NAMES):
+        return CLASS_NAMES[class_id]
+    return f"Unknown_{class_id}"
+
+@lru_cache(maxsize=4096)
+def get_label(class_name: str, confidence_bucket: int) -> tuple:
+    """
+    Label text and its rendered size for a class and confidence bucket (0.1% steps)
+
+    Returns:
+        (label, (text_width, text_height))
+    """
+    # Format class name with spaces instead of underscores
+    label = f"{class_name.replace('_', ' ')} {confidence_bucket / 10:.1f}%"
+    label_size, _ = cv2.getTextSize(label, LABEL_FONT, LABEL_FONT_SCALE, LABEL_FONT_THICKNESS)
+    return label, label_size
+
+def render_annotated_jpeg(image: np.ndarray, boxes: np.ndarray, names: Dict[int, str],
+                          quality: int = RENDER_JPEG_QUALITY, max_side: int = RENDER_MAX_SIDE,
+                          timer: StageTimer = None) -> bytes:
+    """
+    Draw detections on the image and encode it as JPEG
+
+    The image is downscaled to max_side before drawing, so large uploads are
+    never drawn on or encoded at full resolution.
+    """
+    timer = timer or StageTimer()
+    with timer.stage("annotate"):
+        annotated_image = draw_detections(image, boxes, names, max_side)
+    with timer.stage("jpeg_encode"):
+        _, buffer = cv2.imencode('.jpg', annotated_image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+def draw_detections(image: np.ndarray, boxes: np.ndarray, names: Dict[int, str],
+                    max_side: int = RENDER_MAX_SIDE) -> np.ndarray:
+    """Draw boxes and labels on a copy of the image, downscaled to max_side"""
+    scale = 1.0
+    longest = max(image.shape[:2])
+    if max_side and longest > max_side:
+        scale = max_side / longest
+        annotated_image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    else:
+        annotated_image = image.copy()
+    
+    # Scale all boxes and bucket all confidences at once
+    coords = np.rint(boxes[:, :4] * scale).astype(np.int32) if len(boxes) else np.zeros((0, 4), np.int32)
+    class_ids = boxes[:, 5].astype(np.int32) if len(boxes) else []
+    confidence_buckets = np.rint(boxes[:, 4] * 1000).astype(np.int32) if len(boxes) else []
+    
+    for (x1, y1, x2, y2), class_id, bucket in zip(coords.tolist(), class_ids, confidence_buckets):
+        color = get_color_for_class(int(class_id))
+        label, (text_width, text_height) = get_label(get_class_name(int(class_id), names), int(bucket))
+        
+        # Draw bounding box with thicker line
+        cv2.rectangle(annotated_image, (x1, y1), (x2, y2), color, 3)
+        
+        # Draw filled rectangle for label background
+        cv2.rectangle(annotated_image, (x1, y1 - text_height - 15), (x1 + text_width + 10, y1), color, -1)
+        
+        # Draw label text in white
+        cv2.putText(annotated_image, label, (x1 + 5, y1 - 8), LABEL_FONT, LABEL_FONT_SCALE,
+                    (255, 255, 255), LABEL_FONT_THICKNESS)
+    
+    return annotated_image
+
+def store_rendered_image(jpeg: bytes) -> str:
+    """Keep an annotated JPEG for GET /results/{result_id}/image (oldest evicted first)"""
+    result_id = uuid.uuid4().hex
+    rendered_images[result_id] = jpeg
+    while len(rendered_images) > RENDER_STORE_SIZE:
+        rendered_images.popitem(last=False)
+    return result_id
+
+def configure_worker_cpus(worker_index: int, worker_count: int):
+    """Give a server worker its share of the cores: torch intra-op threads and (on Linux) CPU affinity"""
+    import torch
+    
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    threads = TORCH_THREADS or max(1, len(cores) // worker_count)
+    torch.set_num_threads(threads)
+    
+    pinned = None
+    if CPU_AFFINITY and worker_count > 1 and hasattr(os, 'sched_setaffinity'):
+        first = (worker_index * threads) % len(cores)
+        pinned = sorted({cores[(first + i) % len(cores)] for i in range(threads)})
+        os.sched_setaffinity(0, pinned)
+    logger.info(f"🧵 Worker {worker_index} (pid {os.getpid()}): {threads} torch threads"
+                + (f", cores {pinned}" if pinned else ""))
+
+def serve_workers(worker_count: int):
+    """
+    Serve with worker_count HTTP worker processes sharing one copy of the weights
+
+    The supervisor loads (and fuses) the models, binds the listening socket
+    and then forks the workers, so the weight pages are shared copy-on-write
+    instead of every worker loading its own copy. Workers that die are forked
+    again from the loaded supervisor. Per-process state is not shared: the
+    result cache, render=url images, /metrics and model registry changes
+    apply to the worker that handled the request.
+    """
+    import signal
+    import socket
+    import uvicorn
+    
+    if not hasattr(os, 'fork'):
+        # No fork (Windows): plain uvicorn workers, each loading its own copy of the model
+        logger.warning("⚠️  fork() is not available, every worker loads its own model copy")
+        uvicorn.run("app:app", host=SERVER_HOST, port=SERVER_PORT, workers=worker_count, log_level="info")
+        return
+    
+    import torch
+    # Stay single-threaded in torch until after the fork: children of a process
+    # whose OpenMP thread pool is already running can deadlock
+    torch.set_num_threads(1)
+    import_inference_libraries()
+    if not load_model():
+        raise SystemExit(1)
+    load_extra_models()
+    
+    listener = socket.socket(socket.AF_INET6 if ':' in SERVER_HOST else socket.AF_INET)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((SERVER_HOST, SERVER_PORT))
+    listener.listen(2048)
+    listener.set_inheritable(True)
+    
+    children = {}
+    stopping = False
+    
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                configure_worker_cpus(index, worker_count)
+                uvicorn.Server(uvicorn.Config(app, log_level="info")).run(sockets=[listener])
+            except BaseException as e:
+                logger.error(f"❌ Worker {index} failed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(worker_count):
+        spawn(index)
+    logger.info(f"👷 Supervisor {os.getpid()}: {worker_count} workers on {SERVER_HOST}:{SERVER_PORT}")
+    
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            logger.warning(f"⚠️  Worker {index} (pid {pid}) exited, restarting it")
+            spawn(index)
+    listener.close()
+
 if __name__ == "__main__":
     import uvicorn
     
     print("🚀 Starting Falcon Detection API Server...")
-    print("📍 API will be available at: http://localhost:8000")
-    print("📚 Docs available at: http://localhost:8000/docs")
-    print("🔧 Admin interface at: http://localhost:8000/redoc")
+    print(f"📍 API will be available at: http://localhost:{SERVER_PORT}")
+    print(f"📚 Docs available at: http://localhost:{SERVER_PORT}/docs")
+    print(f"🔧 Admin interface at: http://localhost:{SERVER_PORT}/redoc")
+    if SERVER_WORKERS > 1:
+        print(f"👷 Workers: {SERVER_WORKERS}")
     print("\n⚡ Press Ctrl+C to stop\n")
     
-    uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=8000,
-        log_level="info"
-    )
+    if SERVER_WORKERS > 1:
+        serve_workers(SERVER_WORKERS)
+    else:
+        uvicorn.run(
+            app,
+            host=SERVER_HOST,
+            port=SERVER_PORT,
+            log_level="info"
+        )
@@ -0,0 +1,199 @@
+"""
+Box operations shared by the backend (app.py) and the command-line tools
+(video_inference.py, bulk_inference.py, benchmark_tiling.py,
+evaluate_predictions.py), so the endpoints and the tools run the same code.
+
+Only needs NumPy. Boxes are N x 6 arrays of x1, y1, x2, y2, conf, class
+unless noted otherwise.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def _intersections(a: np.ndarray, b: np.ndarray) -> tuple:
+    """N x M intersection areas and the areas of a and b"""
+    inter_w = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    inter_h = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter_w.clip(0) * inter_h.clip(0), area_a, area_b
+
+
+def pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """N x M IoU between the x1, y1, x2, y2 columns of two box arrays"""
+    inter, area_a, area_b = _intersections(a, b)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def pairwise_ios(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """N x M intersection over the smaller of the two boxes"""
+    inter, area_a, area_b = _intersections(a, b)
+    return inter / np.maximum(np.minimum(area_a[:, None], area_b[None, :]), 1e-9)
+
+
+def greedy_nms(boxes: np.ndarray, threshold, overlap=pairwise_iou) -> np.ndarray:
+    """
+    Class-aware greedy NMS
+
+    Boxes are visited by descending confidence and every kept box suppresses
+    the later boxes of its class that overlap it by more than its threshold.
+    threshold is one value for all boxes or one per box; a box with a
+    threshold of 1 or more suppresses nothing. overlap is pairwise_iou or
+    pairwise_ios. Returns the kept boxes sorted by confidence.
+    """
+    if len(boxes) < 2:
+        return boxes
+    order = np.argsort(-boxes[:, 4], kind='stable')
+    boxes = boxes[order]
+    thresholds = np.broadcast_to(np.asarray(threshold, dtype=np.float64), (len(boxes),))[order]
+    overlaps = overlap(boxes, boxes)
+    overlaps[boxes[:, None, 5] != boxes[None, :, 5]] = 0
+
+    keep = np.ones(len(boxes), dtype=bool)
+    for i in np.flatnonzero(thresholds < 1):
+        if keep[i]:
+            keep[i + 1:] &= overlaps[i, i + 1:] <= thresholds[i]
+    return boxes[keep]
+
+
+def make_tiles(width: int, height: int, tile_size: int, overlap: float, full_image: bool = False) -> List[tuple]:
+    """
+    Overlapping (x1, y1, x2, y2) tile windows that cover the whole image
+
+    With full_image a whole-image window is added for objects larger than a
+    tile, unless the image already fits in a single tile.
+    """
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        stride = max(1, int(tile_size * (1 - overlap)))
+        count = -(-(length - tile_size) // stride) + 1
+        return np.linspace(0, length - tile_size, count).round().astype(int).tolist()
+
+    windows = [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+               for y in starts(height) for x in starts(width)]
+    if full_image and len(windows) > 1:
+        windows.append((0, 0, width, height))
+    return windows
+
+
+def merge_tile_detections(tile_boxes: List[np.ndarray], windows: List[tuple], threshold: float) -> np.ndarray:
+    """
+    Shift each tile's boxes to image coordinates and merge them with
+    class-aware greedy NMS
+
+    Overlap is measured as intersection over the smaller box, so an object cut
+    off at a tile border is suppressed by the complete box from the
+    neighbouring tile even though their IoU is low.
+    """
+    boxes = np.concatenate([
+        tile + np.array([x1, y1, x1, y1, 0, 0], dtype=tile.dtype)
+        for tile, (x1, y1, _, _) in zip(tile_boxes, windows)
+    ])
+    return greedy_nms(boxes, threshold, pairwise_ios)
+
+
+class IoUTracker:
+    """
+    Lightweight ByteTrack-style tracker that associates on IoU alone
+
+    Detections at or above high_threshold are matched to live tracks first;
+    the remaining low-confidence ones are only matched to tracks still
+    unmatched, so a briefly weak object keeps its id while low-confidence
+    noise never starts a track. Matching is greedy by IoU within a class.
+    Tracks unmatched for max_age sampled frames are finished and returned,
+    so only live tracks are held in memory.
+    """
+
+    def __init__(self, iou_threshold: float, high_threshold: float, max_age: int):
+        if not 0 < iou_threshold <= 1:
+            raise ValueError(f"Track IoU threshold must be in (0, 1], got {iou_threshold}")
+        self.iou_threshold = iou_threshold
+        self.high_threshold = high_threshold
+        self.max_age = max_age
+        self.tracks: List[Dict[str, Any]] = []
+        self.next_id = 1
+
+    def _match(self, tracks: list, boxes: np.ndarray) -> tuple:
+        """Greedy same-class IoU matching, returns ([(track, box)], unmatched tracks, unmatched boxes)"""
+        if not tracks or not len(boxes):
+            return [], tracks, boxes
+        track_boxes = np.array([track["box"] for track in tracks])
+        iou = pairwise_iou(track_boxes, boxes)
+        iou[track_boxes[:, None, 5] != boxes[None, :, 5]] = 0
+
+        matches, matched_tracks, matched_boxes = [], set(), set()
+        for _ in range(min(len(tracks), len(boxes))):
+            t, b = np.unravel_index(np.argmax(iou), iou.shape)
+            if iou[t, b] < self.iou_threshold:
+                break
+            matches.append((tracks[t], boxes[b]))
+            matched_tracks.add(t)
+            matched_boxes.add(b)
+            iou[t, :] = -1
+            iou[:, b] = -1
+        return (matches, [track for i, track in enumerate(tracks) if i not in matched_tracks],
+                boxes[[i for i in range(len(boxes)) if i not in matched_boxes]])
+
+    def update(self, boxes: np.ndarray, frame_index: int, timestamp: Optional[float]) -> List[Dict[str, Any]]:
+        """Associate one sampled frame's detections, returns the tracks that just finished"""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        high = boxes[boxes[:, 4] >= self.high_threshold]
+        low = boxes[boxes[:, 4] < self.high_threshold]
+
+        matches, unmatched, new_boxes = self._match(self.tracks, high)
+        low_matches, unmatched, _ = self._match(unmatched, low)
+        for track, box in matches + low_matches:
+            confidence = float(box[4])
+            track["box"] = box
+            track["last_frame"] = frame_index
+            track["end_s"] = timestamp
+            track["hits"] += 1
+            track["misses"] = 0
+            track["confidence_sum"] += confidence
+            if confidence > track["max_confidence"]:
+                track["max_confidence"], track["best_box"], track["best_frame"] = confidence, box, frame_index
+
+        finished = []
+        for track in unmatched:
+            track["misses"] += 1
+            if track["misses"] > self.max_age:
+                finished.append(track)
+        finished_ids = {track["id"] for track in finished}
+        self.tracks = [track for track in self.tracks if track["id"] not in finished_ids]
+
+        for box in new_boxes:
+            self.tracks.append({
+                "id": self.next_id, "class_id": int(box[5]), "box": box,
+                "first_frame": frame_index, "last_frame": frame_index, "start_s": timestamp, "end_s": timestamp,
+                "hits": 1, "misses": 0, "confidence_sum": float(box[4]),
+                "max_confidence": float(box[4]), "best_box": box, "best_frame": frame_index
+            })
+            self.next_id += 1
+        return finished
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Finish every live track (end of the video)"""
+        finished, self.tracks = self.tracks, []
+        return finished
+
+
+def format_track(track: Dict[str, Any], names: Dict[int, str]) -> Dict[str, Any]:
+    """JSON summary of a finished track"""
+    x1, y1, x2, y2 = (float(v) for v in track["best_box"][:4])
+    return {
+        "track_id": track["id"],
+        "class": names.get(track["class_id"], f"Unknown_{track['class_id']}"),
+        "class_id": track["class_id"],
+        "first_frame": track["first_frame"],
+        "last_frame": track["last_frame"],
+        "start_s": track["start_s"],
+        "end_s": track["end_s"],
+        "frames_detected": track["hits"],
+        "max_confidence": round(track["max_confidence"], 4),
+        "mean_confidence": round(track["confidence_sum"] / track["hits"], 4),
+        "best_frame": track["best_frame"],
+        "best_bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "width": x2 - x1, "height": y2 - y1}
+    }
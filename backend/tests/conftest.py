@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# CI runs `pytest tests/` from backend/, make app.py importable from here
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,38 @@
+"""
+Model management must fail closed: without FALCON_ADMIN_TOKEN no client may
+load, activate or unload models.
+
+Run from backend/:  python -m pytest -q tests/
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as backend
+
+
+@pytest.fixture
+def client():
+    # No context manager: startup (and the model load) is not needed for the guard
+    return TestClient(backend.app)
+
+
+@pytest.mark.parametrize("method, url", [
+    ("post", "/models/candidate?path=yolov8m.pt"),
+    ("post", "/models/candidate/activate"),
+    ("delete", "/models/candidate"),
+])
+def test_unset_token_rejects_model_changes(client, monkeypatch, method, url):
+    monkeypatch.setattr(backend, "ADMIN_TOKEN", "")
+    response = client.request(method, url, headers={"X-Admin-Token": ""})
+    assert response.status_code == 403
+    response = client.request(method, url, headers={"X-Admin-Token": "anything"})
+    assert response.status_code == 403
+
+
+def test_token_required_when_set(client, monkeypatch):
+    monkeypatch.setattr(backend, "ADMIN_TOKEN", "secret")
+    assert client.delete("/models/candidate").status_code == 403
+    assert client.delete("/models/candidate", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    # Past the guard: an unknown model is a 404, not a 403
+    assert client.delete("/models/candidate", headers={"X-Admin-Token": "secret"}).status_code == 404
@@ -0,0 +1,317 @@
+"""
+📈 Falcon Detection - API Benchmark Suite
+Reproducible latency / throughput benchmark of the backend endpoints, using
+synthetic images so it runs without the dataset.
+
+Two modes:
+- inprocess: the FastAPI app is imported and driven through its test client
+  in this process (no network, no server process; CPU and memory include
+  the client)
+- server:    the backend is started under uvicorn and driven over HTTP, as
+  in production (CPU and memory are the server's own)
+
+For every endpoint and concurrency level the same seeded request sequence is
+replayed: images are drawn from the --sizes mix (with --mix weights) and
+every request carries a distinct image, and the result cache is disabled, so
+each request runs inference. A few unmeasured warm-up requests come first.
+
+Reported per endpoint and concurrency: p50/p95/p99 latency, requests/s (and
+images/s for /predict/batch), errors, process CPU utilization (100% = one
+core busy) and peak RSS.
+
+Results go to JSON together with the git commit and server environment, so
+runs can be diffed between commits and backends (e.g. --env
+FALCON_MODEL_BACKEND=onnx).
+
+Requires httpx (the test client and the HTTP client are built on it).
+
+Usage:
+    python benchmark_api.py
+    python benchmark_api.py --mode server --endpoints image base64 --concurrency 1 4 8 --requests 100
+    python benchmark_api.py --sizes 640x480 1920x1080 --mix 3 1 --env FALCON_MODEL_BACKEND=onnx
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import base64
+import json
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import httpx
+import numpy as np
+
+from benchmark_startup import free_port, wait_for
+
+try:
+    import psutil  # Optional: CPU and memory on non-Linux hosts
+except ImportError:
+    psutil = None
+
+ENDPOINTS = ('image', 'base64', 'batch')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def synthetic_image(rng, width: int, height: int) -> np.ndarray:
+    """Noisy background with random filled shapes, so NMS has candidates to work on"""
+    image = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    for _ in range(rng.integers(3, 10)):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        size = int(rng.integers(min(width, height) // 20, min(width, height) // 4))
+        if rng.random() < 0.5:
+            cv2.rectangle(image, (x, y), (x + size, y + size * 2), color, -1)
+        else:
+            cv2.circle(image, (x, y), size, color, -1)
+    return image
+
+
+def make_workload(sizes: list, weights: list, count: int, seed: int) -> list:
+    """count distinct JPEGs drawn from the size mix, the same sequence for the same seed"""
+    rng = np.random.default_rng(seed)
+    probabilities = np.array(weights, dtype=float) / sum(weights)
+    workload = []
+    for index in rng.choice(len(sizes), size=count, p=probabilities):
+        width, height = sizes[index]
+        jpeg = cv2.imencode('.jpg', synthetic_image(rng, width, height), [cv2.IMWRITE_JPEG_QUALITY, 90])[1]
+        workload.append((f"{width}x{height}", jpeg.tobytes()))
+    return workload
+
+
+def send(client, endpoint: str, jpegs: list) -> bool:
+    """One request, True on success (the batch response is read to the end)"""
+    if endpoint == 'image':
+        response = client.post('/predict/image', files={'file': ('image.jpg', jpegs[0], 'image/jpeg')})
+    elif endpoint == 'base64':
+        response = client.post('/predict/base64', json={'image': base64.b64encode(jpegs[0]).decode()})
+    else:
+        files = [('files', (f"image_{i}.jpg", jpeg, 'image/jpeg')) for i, jpeg in enumerate(jpegs)]
+        response = client.post('/predict/batch', files=files)
+        if response.status_code == 200:
+            return '"summary"' in response.text
+    return response.status_code == 200
+
+
+def process_cpu_seconds(pid: int) -> float:
+    """User + system CPU time of the process and its reaped children"""
+    stat = Path(f"/proc/{pid}/stat")
+    if stat.exists():
+        fields = stat.read_text().rsplit(')', 1)[1].split()
+        return sum(int(value) for value in fields[11:15]) / CLOCK_TICKS
+    if psutil is not None:
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    return 0.0
+
+
+def process_rss_mb(pid: int) -> float:
+    status = Path(f"/proc/{pid}/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    if psutil is not None:
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    return 0.0
+
+
+class ResourceSampler:
+    """Samples a process' RSS in the background and measures its CPU time over the run"""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_rss_mb = max(self.peak_rss_mb, process_rss_mb(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.cpu_started = process_cpu_seconds(self.pid)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        elapsed = time.perf_counter() - self.started
+        self.cpu_percent = (process_cpu_seconds(self.pid) - self.cpu_started) / elapsed * 100 if elapsed else 0.0
+        self.peak_rss_mb = max(self.peak_rss_mb, process_rss_mb(self.pid))
+
+
+def run_level(client, endpoint: str, workload: list, args, concurrency: int, pid: int) -> dict:
+    """Replay the workload against one endpoint with concurrency clients"""
+    per_request = args.batch_images if endpoint == 'batch' else 1
+    requests = [[jpeg for _, jpeg in workload[i:i + per_request]] for i in range(0, len(workload), per_request)]
+    warmup, measured = requests[:args.warmup], requests[args.warmup:]
+
+    for jpegs in warmup:
+        send(client, endpoint, jpegs)
+
+    def timed(jpegs):
+        started = time.perf_counter()
+        try:
+            ok = send(client, endpoint, jpegs)
+        except httpx.HTTPError:
+            ok = False
+        return ok, (time.perf_counter() - started) * 1000
+
+    with ResourceSampler(pid) as resources, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, measured))
+    elapsed = time.perf_counter() - resources.started
+
+    latencies = np.array([ms for ok, ms in outcomes if ok]) if any(ok for ok, _ in outcomes) else np.zeros(1)
+    succeeded = sum(ok for ok, _ in outcomes)
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': len(measured),
+        'errors': len(measured) - succeeded,
+        'throughput_rps': succeeded / elapsed,
+        'images_per_second': succeeded * per_request / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'cpu_percent': resources.cpu_percent,
+        'peak_rss_mb': resources.peak_rss_mb,
+    }
+
+
+def run_all(client, args, pid: int) -> list:
+    results = []
+    for endpoint in args.endpoints:
+        per_request = args.batch_images if endpoint == 'batch' else 1
+        for concurrency in args.concurrency:
+            # Same seed for every level, but distinct images per request within a level
+            workload = make_workload(args.sizes, args.mix, (args.requests + args.warmup) * per_request, args.seed)
+            print(f"\n🔬 /predict/{endpoint}, concurrency {concurrency}...")
+            result = run_level(client, endpoint, workload, args, concurrency, pid)
+            print(f"   {result['throughput_rps']:.2f} req/s, p50 {result['p50_ms']:.1f}ms, "
+                  f"p99 {result['p99_ms']:.1f}ms, CPU {result['cpu_percent']:.0f}%, errors {result['errors']}")
+            results.append(result)
+    return results
+
+
+def run_inprocess(args, server_env: dict) -> list:
+    """Drive the app through its test client inside this process"""
+    os.environ.update(server_env)
+    os.chdir('backend')  # The app resolves its model paths relative to backend/
+    sys.path.insert(0, os.getcwd())
+    from fastapi.testclient import TestClient
+    import app as backend_app
+
+    with TestClient(backend_app.app) as client:
+        return run_all(client, args, os.getpid())
+
+
+def run_server(args, server_env: dict) -> list:
+    """Drive the app under uvicorn over local HTTP"""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd='backend', env={**os.environ, **server_env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for(f"{base}/ready", time.perf_counter() + args.timeout, process)
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        with httpx.Client(base_url=base, timeout=args.request_timeout, limits=limits) as client:
+            return run_all(client, args, process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(20)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency, throughput, CPU and memory of the API endpoints")
+    parser.add_argument('--mode', choices=['inprocess', 'server'], default='inprocess')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=['image', 'base64'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--requests', type=int, default=50, help="Measured requests per endpoint and concurrency")
+    parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests before each measurement")
+    parser.add_argument('--sizes', nargs='+', default=['640x480', '1280x720', '1920x1080'],
+                        help="Synthetic image sizes, WIDTHxHEIGHT")
+    parser.add_argument('--mix', type=float, nargs='+', default=None,
+                        help="Relative frequency of each size (default: equal)")
+    parser.add_argument('--batch-images', type=int, default=8, help="Images per /predict/batch request")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300.0, help="Seconds to wait for the server")
+    parser.add_argument('--request-timeout', type=float, default=120.0)
+    parser.add_argument('--env', nargs='*', default=[], help="Extra server env vars, e.g. FALCON_MODEL_BACKEND=onnx")
+    parser.add_argument('--output', default='benchmark_api_results.json')
+    args = parser.parse_args()
+
+    args.sizes = [tuple(int(v) for v in size.lower().split('x')) for size in args.sizes]
+    args.mix = args.mix or [1.0] * len(args.sizes)
+    if len(args.mix) != len(args.sizes):
+        parser.error("--mix needs one weight per --sizes entry")
+    output = Path(args.output).resolve()
+    server_env = {
+        'FALCON_RESULT_CACHE_SIZE': '0',
+        'FALCON_BACKGROUND_STARTUP': '0',
+        'FALCON_DETECTION_DB': str(Path('benchmark_api.db').resolve()),
+        **dict(item.split('=', 1) for item in args.env),
+    }
+
+    print("\n" + "=" * 70)
+    print("📈 FALCON API BENCHMARK")
+    print("=" * 70)
+    print(f"\n🖥️  Mode: {args.mode}, CPU cores: {os.cpu_count()}")
+    print(f"   Endpoints: {args.endpoints}, concurrency: {args.concurrency}")
+    print(f"   Image mix: " + ", ".join(f"{w}x{h} ({m:g})" for (w, h), m in zip(args.sizes, args.mix)))
+
+    commit = git_commit()
+    results = run_inprocess(args, server_env) if args.mode == 'inprocess' else run_server(args, server_env)
+
+    print("\n" + "=" * 70)
+    print("📊 RESULTS")
+    print("=" * 70)
+    print(f"{'Endpoint':<9} {'Conc':>5} {'req/s':>8} {'img/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'CPU':>6} {'RSS':>8} {'Err':>4}")
+    print("-" * 70)
+    for r in results:
+        print(f"{r['endpoint']:<9} {r['concurrency']:>5} {r['throughput_rps']:>8.2f} {r['images_per_second']:>8.2f} "
+              f"{r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms {r['cpu_percent']:>5.0f}% "
+              f"{r['peak_rss_mb']:>6.0f}MB {r['errors']:>4}")
+
+    with open(output, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'commit': commit,
+            'mode': args.mode,
+            'cpu_count': os.cpu_count(),
+            'server_env': server_env,
+            'sizes': [f"{w}x{h}" for w, h in args.sizes],
+            'mix': args.mix,
+            'requests': args.requests,
+            'batch_images': args.batch_images,
+            'seed': args.seed,
+            'results': results,
+        }, f, indent=2)
+    print(f"\n💾 Results saved to: {output}")
@@ -0,0 +1,124 @@
+"""
+⏱️ Falcon Detection - Backend Latency Benchmark
+Compares per-image CPU inference latency of the PyTorch, ONNX Runtime and
+OpenVINO versions of the trained model (see export_model.py).
+
+Usage:
+    python benchmark_backends.py
+    python benchmark_backends.py --images 50 --backends pytorch onnx
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+MODEL_PATH = "runs/train/falcon_yolov8m_final/weights/best.pt"
+TEST_IMAGE_DIR = Path("test3/images")
+
+
+def backend_paths(weights: Path) -> dict:
+    """Model path for every backend (same layout as backend/app.py)"""
+    return {
+        'pytorch': weights,
+        'onnx': weights.with_suffix('.onnx'),
+        'openvino': weights.parent / f"{weights.stem}_openvino_model",
+    }
+
+
+def load_images(count: int, imgsz: int) -> list:
+    """Load test3 images, or generate synthetic ones if the dataset is missing"""
+    images = []
+    if TEST_IMAGE_DIR.exists():
+        for path in sorted(TEST_IMAGE_DIR.glob("*.png"))[:count]:
+            image = cv2.imread(str(path))
+            if image is not None:
+                images.append(image)
+    if not images:
+        print("⚠️  test3 images not found, using synthetic images")
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 256, (imgsz, imgsz, 3), dtype=np.uint8) for _ in range(count)]
+    return images
+
+
+def benchmark(model, images: list, imgsz: int, warmup: int) -> dict:
+    """Time single-image predictions and return latency statistics in ms"""
+    predict_args = dict(conf=0.15, iou=0.45, imgsz=imgsz, verbose=False, device='cpu')
+    for image in images[:warmup]:
+        model.predict(image, **predict_args)
+
+    latencies = []
+    for image in images:
+        start = time.perf_counter()
+        model.predict(image, **predict_args)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies = np.array(latencies)
+    return {
+        'images': len(latencies),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'fps': float(1000 / latencies.mean()),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare inference latency across model backends")
+    parser.add_argument('--weights', default=MODEL_PATH)
+    parser.add_argument('--backends', nargs='+', default=['pytorch', 'onnx', 'openvino'])
+    parser.add_argument('--images', type=int, default=20, help="Number of timed images")
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--output', default='benchmark_backends_results.json')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("⏱️  FALCON BACKEND LATENCY BENCHMARK")
+    print("=" * 70)
+
+    weights = Path(args.weights)
+    paths = backend_paths(weights)
+    images = load_images(args.images, args.imgsz)
+    print(f"\n📸 Images: {len(images)}")
+
+    results = {}
+    for backend in args.backends:
+        path = paths.get(backend)
+        if path is None or not path.exists():
+            print(f"⚠️  Skipping {backend}: {path} not found (run python export_model.py)")
+            continue
+        print(f"\n🔬 Benchmarking {backend} ({path})...")
+        model = YOLO(str(path), task='detect')
+        results[backend] = benchmark(model, images, args.imgsz, args.warmup)
+
+    if not results:
+        print("\n❌ No backend could be benchmarked")
+        exit(1)
+
+    print("\n" + "=" * 70)
+    print("📊 RESULTS (per image)")
+    print("=" * 70)
+    print(f"{'Backend':<12} {'Mean':>10} {'p50':>10} {'p95':>10} {'FPS':>8} {'Speedup':>9}")
+    print("-" * 70)
+    baseline = results.get('pytorch', next(iter(results.values())))['mean_ms']
+    for backend, stats in results.items():
+        print(f"{backend:<12} {stats['mean_ms']:>8.1f}ms {stats['p50_ms']:>8.1f}ms "
+              f"{stats['p95_ms']:>8.1f}ms {stats['fps']:>8.1f} {baseline / stats['mean_ms']:>8.2f}x")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'weights': str(weights),
+            'imgsz': args.imgsz,
+            'results': results,
+        }, f, indent=2)
+    print(f"\n💾 Results saved to: {args.output}")
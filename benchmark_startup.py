@@ -0,0 +1,219 @@
+"""
+🧊 Falcon Detection - Cold-Start Benchmark
+Measures how long a fresh process takes before it can serve detections.
+
+Two modes, each repeated over several cold starts (a new Python process
+every run):
+- library: import torch + ultralytics, load the weights, first inference,
+  then the steady-state inference latency for comparison
+- server:  start the backend with uvicorn and time /health (liveness),
+  /ready (readiness), the first /predict/base64 request and the following
+  ones. The backend loads its usual model (see load_model in
+  backend/app.py) and its own /ready timings (import, load, warm-up) are
+  recorded as well.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --mode server --runs 5 --env FALCON_WARMUP_RUNS=0
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import base64
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+MODEL_PATH = "runs/train/falcon_yolov8m_final/weights/best.pt"
+
+# Runs in a fresh interpreter, prints one JSON line with the timings
+LIBRARY_PROBE = """
+import json, os, sys, time
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+started = time.perf_counter()
+import torch
+import ultralytics
+from ultralytics import YOLO
+import numpy as np
+imported = time.perf_counter()
+model = YOLO(sys.argv[1], task='detect')
+loaded = time.perf_counter()
+image = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+args = dict(imgsz=int(sys.argv[2]), verbose=False, device='cpu')
+model.predict(image, **args)
+first = time.perf_counter()
+steady = []
+for _ in range(int(sys.argv[3])):
+    t = time.perf_counter()
+    model.predict(image, **args)
+    steady.append(time.perf_counter() - t)
+print(json.dumps({
+    'import_s': imported - started,
+    'load_s': loaded - imported,
+    'first_inference_ms': (first - loaded) * 1000,
+    'steady_inference_ms': sum(steady) / len(steady) * 1000 if steady else None,
+}))
+"""
+
+
+def run_library(weights: str, imgsz: int, steady: int) -> dict:
+    """One cold start of the bare model in a new interpreter"""
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', LIBRARY_PROBE, weights, str(imgsz), str(steady)],
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_s'] = time.perf_counter() - started
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def http(url: str, payload: dict = None, timeout: float = 60.0) -> tuple:
+    """(status code, parsed JSON body) of a GET, or of a POST when payload is given"""
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def wait_for(url: str, deadline: float, process) -> float:
+    """Poll url until it returns 200, returns the time it happened"""
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if http(url, timeout=1.0)[0] == 200:
+                return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} not ready in time")
+
+
+def run_server(env: dict, steady: int, timeout: float) -> dict:
+    """One cold start of the backend under uvicorn"""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    # A different image per request so the result cache never answers
+    rng = np.random.default_rng(0)
+    payloads = [
+        {'image': base64.b64encode(cv2.imencode('.jpg', rng.integers(0, 256, (480, 640, 3), dtype=np.uint8))[1]
+                                   .tobytes()).decode()}
+        for _ in range(steady + 1)
+    ]
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd='backend', env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        live = wait_for(f"{base}/health", deadline, process)
+        ready = wait_for(f"{base}/ready", deadline, process)
+        _, readiness = http(f"{base}/ready")
+
+        t = time.perf_counter()
+        http(f"{base}/predict/base64", payloads[0])
+        first_ms = (time.perf_counter() - t) * 1000
+        latencies = []
+        for payload in payloads[1:]:
+            t = time.perf_counter()
+            http(f"{base}/predict/base64", payload)
+            latencies.append((time.perf_counter() - t) * 1000)
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    return {
+        'live_s': live - started,
+        'ready_s': ready - started,
+        'first_request_ms': first_ms,
+        'steady_request_ms': sum(latencies) / len(latencies) if latencies else None,
+        'backend_timings': readiness.get('timings', {}) if readiness else {},
+    }
+
+
+def summarize(runs: list) -> dict:
+    """Mean / min / max of every numeric field across runs"""
+    summary = {}
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)):
+            values = [run[key] for run in runs if run.get(key) is not None]
+            summary[key] = {'mean': float(np.mean(values)), 'min': float(np.min(values)),
+                            'max': float(np.max(values))}
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start (import, load, first inference) benchmark")
+    parser.add_argument('--mode', choices=['library', 'server', 'both'], default='both')
+    parser.add_argument('--weights', default=MODEL_PATH)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--runs', type=int, default=3, help="Cold starts per mode")
+    parser.add_argument('--steady', type=int, default=5, help="Inferences after the first one")
+    parser.add_argument('--timeout', type=float, default=300.0, help="Seconds to wait for the server")
+    parser.add_argument('--env', nargs='*', default=[], help="Extra server env vars, e.g. FALCON_WARMUP_RUNS=0")
+    parser.add_argument('--output', default='benchmark_startup_results.json')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("🧊 FALCON COLD-START BENCHMARK")
+    print("=" * 70)
+
+    weights = args.weights
+    if not Path(weights).exists():
+        print(f"\n⚠️  Trained model not found at {weights}, using pretrained: yolov8m.pt")
+        weights = 'yolov8m.pt'
+    server_env = dict(item.split('=', 1) for item in args.env)
+
+    results = {}
+    if args.mode in ('library', 'both'):
+        print(f"\n🔬 Library cold starts ({args.runs})...")
+        runs = [run_library(weights, args.imgsz, args.steady) for _ in range(args.runs)]
+        results['library'] = {'runs': runs, 'summary': summarize(runs)}
+    if args.mode in ('server', 'both'):
+        print(f"\n🔬 Server cold starts ({args.runs})...")
+        runs = [run_server(server_env, args.steady, args.timeout) for _ in range(args.runs)]
+        results['server'] = {'runs': runs, 'summary': summarize(runs)}
+
+    print("\n" + "=" * 70)
+    print("📊 RESULTS (mean over cold starts)")
+    print("=" * 70)
+    for mode, result in results.items():
+        print(f"\n{mode}:")
+        for key, stats in result['summary'].items():
+            unit = 'ms' if key.endswith('_ms') else 's'
+            print(f"   {key:<22} {stats['mean']:>10.2f}{unit}  (min {stats['min']:.2f}, max {stats['max']:.2f})")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'weights': weights,
+            'imgsz': args.imgsz,
+            'server_env': server_env,
+            'results': results,
+        }, f, indent=2)
+    print(f"\n💾 Results saved to: {args.output}")
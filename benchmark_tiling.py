@@ -0,0 +1,172 @@
+"""
+🧩 Falcon Detection - Tiled Inference Benchmark
+Measures what sliced inference costs and what it buys: per-image latency
+against recall for plain inference at --imgsz and for every tile size /
+overlap combination, on labelled test3 images.
+
+Recall is reported overall and for small objects (longest side under
+--small-px pixels once the image is resized to --imgsz), which are the
+ones plain inference misses. Tiles are cut and merged by
+backend/detection_ops.py, the same code the backend's tiled /predict/image
+runs, with its default full-image pass and merge threshold.
+
+Usage:
+    python benchmark_tiling.py
+    python benchmark_tiling.py --images 50 --tile-sizes 480 640 960 --overlaps 0.1 0.2
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from bulk_inference import predict_tiled
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend'))
+from detection_ops import pairwise_iou
+
+MODEL_PATH = "runs/train/falcon_yolov8m_final/weights/best.pt"
+TEST_IMAGE_DIR = Path("test3/images")
+TEST_LABEL_DIR = Path("test3/labels")
+
+
+def load_labelled_images(count: int) -> list:
+    """(image, ground truth boxes as N x 5 [x1, y1, x2, y2, class]) for the first count test3 images"""
+    samples = []
+    for path in sorted(TEST_IMAGE_DIR.glob("*.png"))[:count]:
+        label_path = TEST_LABEL_DIR / f"{path.stem}.txt"
+        image = cv2.imread(str(path))
+        if image is None or not label_path.exists():
+            continue
+        h, w = image.shape[:2]
+        labels = np.loadtxt(label_path, ndmin=2).reshape(-1, 5)
+        cls, cx, cy, bw, bh = labels.T
+        gt = np.stack([(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h, cls], axis=1)
+        samples.append((image, gt))
+    return samples
+
+
+def match(pred: np.ndarray, gt: np.ndarray, iou_threshold: float) -> tuple:
+    """Greedy confidence-ordered matching, returns (matched gt mask, true positive count)"""
+    matched = np.zeros(len(gt), dtype=bool)
+    if not len(pred) or not len(gt):
+        return matched, 0
+    pred = pred[np.argsort(-pred[:, 4])]
+    ious = pairwise_iou(pred, gt)
+    ious[pred[:, None, 5] != gt[None, :, 4]] = 0
+    for row in ious:
+        row = np.where(matched, 0, row)
+        best = row.argmax()
+        if row[best] >= iou_threshold:
+            matched[best] = True
+    return matched, int(matched.sum())
+
+
+def evaluate(samples: list, predict, imgsz: int, small_px: int, iou_threshold: float, warmup: int) -> dict:
+    """Run predict(image) -> boxes over every sample and collect latency and recall"""
+    for image, _ in samples[:warmup]:
+        predict(image)
+
+    latencies, total_gt, total_tp, total_pred, small_gt, small_tp = [], 0, 0, 0, 0, 0
+    for image, gt in samples:
+        start = time.perf_counter()
+        boxes = predict(image)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        matched, tp = match(boxes, gt, iou_threshold)
+        scale = imgsz / max(image.shape[:2])
+        small = np.maximum(gt[:, 2] - gt[:, 0], gt[:, 3] - gt[:, 1]) * scale < small_px
+        total_gt += len(gt)
+        total_tp += tp
+        total_pred += len(boxes)
+        small_gt += int(small.sum())
+        small_tp += int((matched & small).sum())
+
+    latencies = np.array(latencies)
+    return {
+        'mean_ms': float(latencies.mean()),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'recall': total_tp / total_gt if total_gt else 0.0,
+        'small_recall': small_tp / small_gt if small_gt else None,
+        'precision': total_tp / total_pred if total_pred else 0.0,
+        'small_objects': small_gt,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency vs recall of tiled inference")
+    parser.add_argument('--weights', default=MODEL_PATH)
+    parser.add_argument('--images', type=int, default=30, help="Number of labelled test3 images")
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--iou', type=float, default=0.6)
+    parser.add_argument('--tile-sizes', type=int, nargs='+', default=[480, 640, 960])
+    parser.add_argument('--overlaps', type=float, nargs='+', default=[0.2])
+    parser.add_argument('--tile-batch', type=int, default=8)
+    parser.add_argument('--match-iou', type=float, default=0.5, help="IoU for a prediction to count as a hit")
+    parser.add_argument('--small-px', type=int, default=32, help="Small object: longest side at --imgsz below this")
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--output', default='benchmark_tiling_results.json')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("🧩 FALCON TILED INFERENCE BENCHMARK")
+    print("=" * 70)
+
+    weights = Path(args.weights)
+    if not weights.exists():
+        print(f"\n⚠️  Trained model not found at {weights}, using pretrained: yolov8m.pt")
+        weights = Path('yolov8m.pt')
+    samples = load_labelled_images(args.images)
+    if not samples:
+        print(f"\n❌ No labelled images found in {TEST_IMAGE_DIR} / {TEST_LABEL_DIR}")
+        exit(1)
+    print(f"\n📸 Images: {len(samples)} ({sum(len(gt) for _, gt in samples)} objects)")
+
+    model = YOLO(str(weights), task='detect')
+    predict_args = dict(conf=args.conf, iou=args.iou, imgsz=args.imgsz, verbose=False, device='cpu')
+
+    configs = {'full': lambda image: model.predict(image, **predict_args)[0].boxes.data.cpu().numpy()}
+    for tile_size in args.tile_sizes:
+        for overlap in args.overlaps:
+            configs[f"tiled_{tile_size}_{overlap:g}"] = (
+                lambda image, tile_size=tile_size, overlap=overlap:
+                predict_tiled(model, image, tile_size, overlap, args.tile_batch, predict_args)[0]
+            )
+
+    results = {}
+    for name, predict in configs.items():
+        print(f"\n🔬 {name}...")
+        results[name] = evaluate(samples, predict, args.imgsz, args.small_px, args.match_iou, args.warmup)
+
+    print("\n" + "=" * 70)
+    print("📊 LATENCY vs RECALL (per image)")
+    print("=" * 70)
+    print(f"{'Config':<18} {'Mean':>10} {'p95':>10} {'Recall':>8} {'Small':>8} {'Prec':>8}")
+    print("-" * 70)
+    for name, stats in results.items():
+        small = f"{stats['small_recall']:.3f}" if stats['small_recall'] is not None else "-"
+        print(f"{name:<18} {stats['mean_ms']:>8.1f}ms {stats['p95_ms']:>8.1f}ms "
+              f"{stats['recall']:>8.3f} {small:>8} {stats['precision']:>8.3f}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'weights': str(weights),
+            'imgsz': args.imgsz,
+            'conf': args.conf,
+            'match_iou': args.match_iou,
+            'small_px': args.small_px,
+            'images': len(samples),
+            'results': results,
+        }, f, indent=2)
+    print(f"\n💾 Results saved to: {args.output}")
@@ -0,0 +1,200 @@
+"""
+👷 Falcon Detection - Worker Scaling Benchmark
+Throughput of the backend as the number of server worker processes grows
+(FALCON_SERVER_WORKERS, see serve_workers in backend/app.py).
+
+For every worker count the server is started with python app.py, warmed up
+until /ready answers, then loaded by concurrent clients posting distinct
+images to /predict/base64 for a fixed duration. The result cache is disabled
+so every request runs inference.
+
+Reported per worker count: requests/s, scaling efficiency against one
+worker, p50/p95 latency and - on Linux - the total and per-worker memory
+(PSS, which splits shared pages such as the forked model weights fairly
+between processes).
+
+Usage:
+    python benchmark_workers.py
+    python benchmark_workers.py --workers 1 2 4 --duration 30 --clients-per-worker 4
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import base64
+import json
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from benchmark_startup import free_port, http, wait_for
+
+
+def make_payloads(count: int, width: int, height: int) -> list:
+    """Distinct synthetic JPEGs as /predict/base64 payloads"""
+    rng = np.random.default_rng(0)
+    payloads = []
+    for _ in range(count):
+        image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        payloads.append({'image': base64.b64encode(cv2.imencode('.jpg', image)[1].tobytes()).decode()})
+    return payloads
+
+
+def process_tree_pss(pid: int) -> list:
+    """PSS in MB of pid and its children (Linux only, empty elsewhere)"""
+    pids = [pid]
+    children_file = Path(f"/proc/{pid}/task/{pid}/children")
+    if children_file.exists():
+        pids += [int(child) for child in children_file.read_text().split()]
+    usage = []
+    for p in pids:
+        rollup = Path(f"/proc/{p}/smaps_rollup")
+        if not rollup.exists():
+            continue
+        for line in rollup.read_text().splitlines():
+            if line.startswith('Pss:'):
+                usage.append(int(line.split()[1]) / 1024)
+    return usage
+
+
+def load_test(base: str, payloads: list, clients: int, duration: float) -> dict:
+    """Closed-loop load: every client sends its next request as soon as the previous one returns"""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset: int):
+        nonlocal errors
+        i = offset
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                status, _ = http(f"{base}/predict/base64", payloads[i % len(payloads)])
+            except OSError:
+                status = None
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+            i += clients
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        'requests': int(len(latencies)),
+        'errors': errors,
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+    }
+
+
+def run(workers: int, args, payloads: list) -> dict:
+    """Start the server with the given worker count and load it"""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        'FALCON_SERVER_WORKERS': str(workers),
+        'FALCON_HOST': '127.0.0.1',
+        'FALCON_PORT': str(port),
+        'FALCON_RESULT_CACHE_SIZE': '0',
+        'FALCON_DETECTION_DB': str(Path(args.db).resolve()),
+    }
+    if args.threads:
+        env['FALCON_TORCH_THREADS'] = str(args.threads)
+    process = subprocess.Popen([sys.executable, 'app.py'], cwd='backend', env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(f"{base}/ready", time.perf_counter() + args.timeout, process)
+        # Every worker answers /ready on its own - wait until a run of probes all succeed
+        time.sleep(1.0)
+        wait_for(f"{base}/ready", time.perf_counter() + args.timeout, process)
+
+        clients = args.clients or args.clients_per_worker * workers
+        load_test(base, payloads, clients, args.warmup)
+        result = load_test(base, payloads, clients, args.duration)
+        pss = process_tree_pss(process.pid)
+        result.update({
+            'workers': workers,
+            'clients': clients,
+            'memory_pss_mb': round(sum(pss), 1) if pss else None,
+            'memory_per_process_mb': [round(m, 1) for m in pss],
+        })
+        return result
+    finally:
+        process.terminate()
+        try:
+            process.wait(20)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput vs number of server worker processes")
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, max(1, (os.cpu_count() or 2) // 2), os.cpu_count() or 1}))
+    parser.add_argument('--threads', type=int, default=0,
+                        help="torch threads per worker (0 = the server's default: cores / workers)")
+    parser.add_argument('--clients', type=int, default=0, help="Concurrent clients (0 = per-worker setting)")
+    parser.add_argument('--clients-per-worker', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=20.0, help="Measured seconds per worker count")
+    parser.add_argument('--warmup', type=float, default=3.0, help="Unmeasured load seconds before measuring")
+    parser.add_argument('--images', type=int, default=64, help="Distinct synthetic images")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--timeout', type=float, default=300.0, help="Seconds to wait for the server")
+    parser.add_argument('--db', default='benchmark_workers.db', help="Detection log used by the server")
+    parser.add_argument('--output', default='benchmark_workers_results.json')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("👷 FALCON WORKER SCALING BENCHMARK")
+    print("=" * 70)
+    print(f"\n🖥️  CPU cores: {os.cpu_count()}")
+    print(f"   Worker counts: {args.workers}")
+
+    payloads = make_payloads(args.images, args.width, args.height)
+    results = []
+    for workers in args.workers:
+        print(f"\n🔬 {workers} worker(s)...")
+        results.append(run(workers, args, payloads))
+
+    print("\n" + "=" * 70)
+    print("📊 THROUGHPUT vs WORKERS")
+    print("=" * 70)
+    print(f"{'Workers':>8} {'Clients':>8} {'req/s':>9} {'Scaling':>8} {'p50':>10} {'p95':>10} {'PSS':>10}")
+    print("-" * 70)
+    baseline = results[0]['throughput_rps'] / results[0]['workers'] if results[0]['throughput_rps'] else 0
+    for result in results:
+        efficiency = result['throughput_rps'] / (baseline * result['workers']) if baseline else 0
+        result['scaling_efficiency'] = efficiency
+        memory = f"{result['memory_pss_mb']:.0f}MB" if result['memory_pss_mb'] else "-"
+        print(f"{result['workers']:>8} {result['clients']:>8} {result['throughput_rps']:>9.2f} {efficiency:>7.0%} "
+              f"{result['p50_ms']:>8.1f}ms {result['p95_ms']:>8.1f}ms {memory:>10}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'cpu_count': os.cpu_count(),
+            'image_size': [args.width, args.height],
+            'duration_s': args.duration,
+            'results': results,
+        }, f, indent=2)
+    print(f"\n💾 Results saved to: {args.output}")
@@ -0,0 +1,291 @@
+"""
+📦 Falcon Detection - Bulk Inference
+Runs the model over a whole image directory (e.g. test3/images) as fast as
+the CPU allows, with resumable output.
+
+Pipeline per worker process:
+- A thread pool prefetches and decodes images with cv2 (bounded read-ahead)
+- Decoded images are run through the model in batches
+- Results are appended to the worker's own JSONL shard and flushed after
+  every batch (checkpoint)
+
+Re-running the same command after a crash skips every image that already has
+a result in the output shards.
+
+With --tiled each image is split into overlapping tiles (plus a downscaled
+whole-image pass), the tiles are batched through the model and the
+detections are merged with a class-aware cross-tile NMS, the same code
+(backend/detection_ops.py) the backend's tiled /predict runs. This is slower but
+finds small objects that shrink to a few pixels at --imgsz.
+
+Output (in --output):
+    manifest.json           run settings and class names
+    results-00.jsonl ...    one line per image:
+        {"image": "000000001_dark_clutter.png", "width": 1920, "height": 1080,
+         "boxes": [[x1, y1, x2, y2, conf, class_id], ...], "speed": {...}}
+
+Usage:
+    python bulk_inference.py
+    python bulk_inference.py --source test3/images --workers 4 --batch-size 8
+    python bulk_inference.py --tiled --tile-size 640 --tile-overlap 0.2 --output runs/bulk/test3_tiled
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend'))
+from detection_ops import make_tiles, merge_tile_detections  # Same tiling as POST /predict/image?tiled=true
+
+MODEL_PATH = "runs/train/falcon_yolov8m_final/weights/best.pt"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parallel, resumable bulk inference over an image directory")
+    parser.add_argument('--source', default='test3/images', help="Image directory (searched recursively)")
+    parser.add_argument('--output', default='runs/bulk/test3', help="Output directory for the JSONL shards")
+    parser.add_argument('--weights', default=MODEL_PATH)
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 4),
+                        help="Worker processes (each loads its own model)")
+    parser.add_argument('--threads-per-worker', type=int, default=0,
+                        help="torch threads per worker (0 = CPU cores / workers)")
+    parser.add_argument('--decode-threads', type=int, default=4, help="cv2 decode threads per worker")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--iou', type=float, default=0.6)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--tiled', action='store_true', help="Sliced inference over overlapping tiles")
+    parser.add_argument('--tile-size', type=int, default=640, help="Tile side in original image pixels")
+    parser.add_argument('--tile-overlap', type=float, default=0.2, help="Fraction of a tile shared with its neighbour")
+    parser.add_argument('--tile-batch', type=int, default=8, help="Tiles per model call")
+    parser.add_argument('--tile-merge-threshold', type=float, default=0.6,
+                        help="Cross-tile NMS threshold (intersection over the smaller box)")
+    parser.add_argument('--no-full-image', action='store_true',
+                        help="Skip the whole-image pass that catches objects larger than a tile")
+    return parser.parse_args()
+
+
+def find_images(source: Path) -> list:
+    """All image files under source, as paths relative to source"""
+    return sorted(
+        p.relative_to(source).as_posix()
+        for p in source.rglob('*')
+        if p.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def load_completed(output: Path) -> set:
+    """Images that already have a result in any shard (partial lines are ignored)"""
+    completed = set()
+    for shard in output.glob('results-*.jsonl'):
+        with open(shard, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    completed.add(json.loads(line)['image'])
+                except (json.JSONDecodeError, KeyError):
+                    continue  # Line cut off by a crash - the image is processed again
+    return completed
+
+
+def open_shard(path: Path):
+    """Open a shard for appending, dropping a line cut off by a crash first"""
+    if path.exists() and path.stat().st_size > 0:
+        with open(path, 'r+b') as f:
+            # Scan back in blocks to the last complete line and cut everything after it
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - (1 << 16))
+                f.seek(start)
+                newline = f.read(position - start).rfind(b'\n')
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                f.truncate(position)
+    return open(path, 'a', encoding='utf-8')
+
+
+def prefetch_images(source: Path, images: list, decode_threads: int, read_ahead: int):
+    """Yield (name, image) in order while a thread pool decodes up to read_ahead images ahead"""
+    with ThreadPoolExecutor(max_workers=decode_threads) as pool:
+        pending = deque()
+        names = iter(images)
+        for name in names:
+            pending.append((name, pool.submit(cv2.imread, str(source / name))))
+            if len(pending) >= read_ahead:
+                break
+        while pending:
+            name, future = pending.popleft()
+            next_name = next(names, None)
+            if next_name is not None:
+                pending.append((next_name, pool.submit(cv2.imread, str(source / next_name))))
+            yield name, future.result()
+
+
+def predict_batch(model, images: list, args) -> list:
+    """Batched model call, returns one (boxes, speed) pair per image"""
+    results = model.predict(images, conf=args.conf, iou=args.iou, imgsz=args.imgsz,
+                            verbose=False, device=args.device)
+    return [(result.boxes.data.cpu().numpy(), dict(result.speed)) for result in results]
+
+
+def predict_tiled(model, image, tile_size: int, overlap: float, tile_batch: int, predict_args: dict,
+                  full_image: bool = True, merge_threshold: float = 0.6) -> tuple:
+    """Sliced inference on one image, returns (merged boxes, summed speed)"""
+    height, width = image.shape[:2]
+    windows = make_tiles(width, height, tile_size, overlap, full_image)
+
+    boxes, speed = [], {}
+    for start in range(0, len(windows), tile_batch):
+        batch = windows[start:start + tile_batch]
+        results = model.predict([image[y1:y2, x1:x2] for x1, y1, x2, y2 in batch], **predict_args)
+        for result in results:
+            boxes.append(result.boxes.data.cpu().numpy())
+            for stage, ms in result.speed.items():
+                speed[stage] = speed.get(stage, 0.0) + ms
+    return merge_tile_detections(boxes, windows, merge_threshold), speed
+
+
+def run_worker(worker_id: int, images: list, args) -> dict:
+    """Process one worker's share of the images into its own shard"""
+    import torch
+    from ultralytics import YOLO
+
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    torch.set_num_threads(threads)
+    model = YOLO(args.weights, task='detect')
+
+    source, output = Path(args.source), Path(args.output)
+    processed = failed = 0
+    started = time.perf_counter()
+
+    with open_shard(output / f"results-{worker_id:02d}.jsonl") as shard:
+        batch = []
+
+        def flush(batch):
+            if args.tiled:
+                predict_args = dict(conf=args.conf, iou=args.iou, imgsz=args.imgsz, verbose=False, device=args.device)
+                predictions = [predict_tiled(model, image, args.tile_size, args.tile_overlap, args.tile_batch,
+                                             predict_args, not args.no_full_image, args.tile_merge_threshold)
+                               for _, image in batch]
+            else:
+                predictions = predict_batch(model, [image for _, image in batch], args)
+            for (name, image), (boxes, speed) in zip(batch, predictions):
+                shard.write(json.dumps({
+                    'image': name,
+                    'width': image.shape[1],
+                    'height': image.shape[0],
+                    'boxes': [[round(v, 2) for v in row[:4]] + [round(row[4], 5), int(row[5])]
+                              for row in boxes.tolist()],
+                    'speed': {k: round(v, 3) for k, v in speed.items()},
+                }) + '\n')
+            # Checkpoint: results of this batch survive a crash
+            shard.flush()
+            os.fsync(shard.fileno())
+
+        for name, image in prefetch_images(source, images, args.decode_threads, args.batch_size * 2):
+            if image is None:
+                failed += 1
+                print(f"   ⚠️  [worker {worker_id}] Could not read {name}")
+                continue
+            batch.append((name, image))
+            if len(batch) == args.batch_size:
+                flush(batch)
+                processed += len(batch)
+                batch = []
+                if processed % (args.batch_size * 25) == 0:
+                    rate = processed / (time.perf_counter() - started)
+                    print(f"   [worker {worker_id}] {processed}/{len(images)} images ({rate:.1f} img/s)")
+        if batch:
+            flush(batch)
+            processed += len(batch)
+
+    return {'worker': worker_id, 'processed': processed, 'failed': failed,
+            'elapsed_s': time.perf_counter() - started}
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+    args = parse_args()
+
+    print("\n" + "=" * 70)
+    print("📦 FALCON BULK INFERENCE")
+    print("=" * 70)
+
+    source, output = Path(args.source), Path(args.output)
+    if not source.exists():
+        print(f"\n❌ Source directory not found: {source}")
+        exit(1)
+    if not Path(args.weights).exists():
+        print(f"\n⚠️  Trained model not found at {args.weights}, using pretrained: yolov8m.pt")
+        args.weights = 'yolov8m.pt'
+    output.mkdir(parents=True, exist_ok=True)
+
+    images = find_images(source)
+    completed = load_completed(output)
+    pending = [name for name in images if name not in completed]
+
+    print(f"\n📁 Source: {source} ({len(images)} images)")
+    print(f"💾 Output: {output}")
+    print(f"   Already done: {len(images) - len(pending)}")
+    print(f"   Remaining: {len(pending)}")
+    print(f"⚙️  Workers: {args.workers}, batch size: {args.batch_size}, decode threads: {args.decode_threads}")
+    if args.tiled:
+        print(f"🧩 Tiled: {args.tile_size}px tiles, {args.tile_overlap:.0%} overlap, {args.tile_batch} tiles per batch")
+
+    # Class names from the weights actually used (the pretrained fallback has COCO classes)
+    from ultralytics import YOLO
+    names = {int(k): v for k, v in YOLO(args.weights, task='detect').names.items()}
+
+    with open(output / 'manifest.json', 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'source': str(source),
+            'weights': str(args.weights),
+            'conf': args.conf,
+            'iou': args.iou,
+            'imgsz': args.imgsz,
+            'tiling': {'tile_size': args.tile_size, 'tile_overlap': args.tile_overlap,
+                       'tile_batch': args.tile_batch, 'merge_threshold': args.tile_merge_threshold,
+                       'full_image': not args.no_full_image} if args.tiled else None,
+            'names': names,
+        }, f, indent=2)
+
+    if not pending:
+        print("\n✅ Nothing to do - all images already have results")
+        exit(0)
+
+    started = time.perf_counter()
+    workers = max(1, min(args.workers, len(pending)))
+    args.workers = workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_worker, worker_id, pending[worker_id::workers], args)
+                   for worker_id in range(workers)]
+        summaries = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    processed = sum(s['processed'] for s in summaries)
+    failed = sum(s['failed'] for s in summaries)
+    print("\n" + "=" * 70)
+    print("📊 BULK INFERENCE SUMMARY")
+    print("=" * 70)
+    print(f"   Processed: {processed} images")
+    print(f"   Failed: {failed} images")
+    print(f"   Elapsed: {elapsed:.1f}s ({processed / elapsed:.1f} images/s)")
+    print(f"\n💾 Results: {output}/results-*.jsonl")
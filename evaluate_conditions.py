@@ -0,0 +1,154 @@
+"""
+🌗 Falcon Detection - Per-Condition Breakdown
+Splits the test3 evaluation by the lighting / clutter condition in the image
+names (e.g. 000123_vdark_clutter.png) and reports accuracy and inference
+latency per condition, from cached predictions (see evaluate_predictions.py).
+
+Predictions are matched to the labels once; every condition is then a
+subset of the same matches, so the whole breakdown is one pass.
+
+Per condition:
+- mAP50, mAP50-95, precision, recall and F1 at --conf
+- boxes per image, both cached (at the run's low threshold, i.e. what NMS
+  had to work through) and at --conf
+- mean preprocess / inference / postprocess (NMS) ms per image, from the
+  "speed" field of bulk_inference.py output (--speeds); model.val's
+  predictions.json carries no timings
+
+Usage:
+    python evaluate_conditions.py --predictions runs/bulk/test3
+    python evaluate_conditions.py --predictions runs/detect/val/predictions.json --speeds runs/bulk/test3
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from evaluate_predictions import add_source_args, evaluate, load_class_names, load_matched
+
+CONDITION_PATTERN = re.compile(r'_((?:v?dark|v?light)_(?:un)?clutter)$')
+CONDITION_ORDER = ['vlight_unclutter', 'vlight_clutter', 'light_unclutter', 'light_clutter',
+                   'dark_unclutter', 'dark_clutter', 'vdark_unclutter', 'vdark_clutter']
+SPEED_STAGES = ('preprocess', 'inference', 'postprocess')
+
+
+def image_condition(stem: str) -> str:
+    """Condition tag of an image name, 'other' when it has none"""
+    match = CONDITION_PATTERN.search(stem)
+    return match.group(1) if match else 'other'
+
+
+def load_speeds(source: str) -> dict:
+    """{image stem: {stage: ms}} from bulk_inference.py shards, {} when there are none"""
+    speeds = {}
+    for shard in sorted(Path(source).glob('results-*.jsonl')) if Path(source).is_dir() else []:
+        with open(shard) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Line cut off by a crash
+                if record.get('speed'):
+                    speeds[Path(record['image']).stem] = record['speed']
+    return speeds
+
+
+def mean_speed(stems: list, speeds: dict) -> Optional[dict]:
+    timed = [speeds[stem] for stem in stems if stem in speeds]
+    if not timed:
+        return None
+    result = {stage: float(np.mean([speed.get(stage, 0.0) for speed in timed])) for stage in SPEED_STAGES}
+    result['total'] = sum(result.values())
+    result['images'] = len(timed)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy and latency per lighting / clutter condition")
+    add_source_args(parser)
+    parser.add_argument('--speeds', default=None,
+                        help="bulk_inference.py output directory with per-image timings (default: --predictions)")
+    parser.add_argument('--conf', type=float, default=0.25, help="Confidence threshold for P / R / F1")
+    parser.add_argument('--match-iou', type=float, default=0.5, help="IoU for precision / recall / F1")
+    parser.add_argument('--output', default='condition_results.json')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("🌗 FALCON PER-CONDITION BREAKDOWN")
+    print("=" * 70)
+
+    names = load_class_names(args.dataset)
+    matched = load_matched(args)
+    if not matched.images:
+        print(f"\n❌ No labelled images found in {args.labels}")
+        exit(1)
+    speeds = load_speeds(args.speeds or args.predictions)
+    print(f"\n📁 Predictions: {args.predictions} ({len(matched.conf)} boxes)")
+    print(f"🏷️  Labels: {args.labels} ({len(matched.images)} images, {len(matched.gt_cls)} objects)")
+    if not speeds:
+        print("⚠️  No per-image timings found (pass a bulk_inference.py directory with --speeds), latency skipped")
+
+    conditions = np.array([image_condition(stem) for stem in matched.images])
+    present = sorted(set(conditions),
+                     key=lambda c: CONDITION_ORDER.index(c) if c in CONDITION_ORDER else len(CONDITION_ORDER))
+    kept_boxes = matched.conf >= args.conf
+
+    results = {}
+    for condition in ['all'] + present:
+        mask = np.ones(len(matched.images), dtype=bool) if condition == 'all' else conditions == condition
+        subset = matched.subset(mask)
+        overall = evaluate(subset, list(names), args.match_iou, args.conf)['overall']
+        images = int(mask.sum())
+        results[condition] = {
+            'images': images,
+            'objects': len(subset.gt_cls),
+            'mAP50': overall['mAP50'],
+            'mAP50_95': overall['mAP50_95'],
+            'precision': overall['precision'],
+            'recall': overall['recall'],
+            'f1': overall['f1'],
+            'cached_boxes_per_image': len(subset.conf) / images,
+            'boxes_per_image': int(kept_boxes[mask[matched.image_index]].sum()) / images,
+            'latency_ms': mean_speed(subset.images, speeds),
+        }
+
+    print("\n" + "=" * 70)
+    print(f"📊 ACCURACY (conf >= {args.conf:g}, IoU {args.match_iou:.2f})")
+    print("=" * 70)
+    print(f"{'Condition':<18} {'Images':>6} {'Objects':>7} {'mAP50':>7} {'mAP50-95':>8} {'P':>6} {'R':>6} {'F1':>6}")
+    print("-" * 70)
+    for condition, stats in results.items():
+        print(f"{condition:<18} {stats['images']:>6} {stats['objects']:>7} {stats['mAP50']:>7.3f} "
+              f"{stats['mAP50_95']:>8.3f} {stats['precision']:>6.3f} {stats['recall']:>6.3f} {stats['f1']:>6.3f}")
+
+    print("\n" + "=" * 70)
+    print("⏱️  LATENCY (mean ms per image) AND NMS LOAD")
+    print("=" * 70)
+    print(f"{'Condition':<18} {'Cached/img':>10} {'Kept/img':>8} {'Pre':>7} {'Infer':>7} {'Post':>7} {'Total':>7}")
+    print("-" * 70)
+    for condition, stats in results.items():
+        latency = stats['latency_ms']
+        timings = (f"{latency['preprocess']:>7.1f} {latency['inference']:>7.1f} {latency['postprocess']:>7.1f} "
+                   f"{latency['total']:>7.1f}") if latency else f"{'n/a':>7} {'n/a':>7} {'n/a':>7} {'n/a':>7}"
+        print(f"{condition:<18} {stats['cached_boxes_per_image']:>10.1f} {stats['boxes_per_image']:>8.1f} {timings}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'predictions': args.predictions,
+            'speeds': args.speeds or args.predictions,
+            'labels': args.labels,
+            'nms_iou': args.nms_iou,
+            'conf': args.conf,
+            'match_iou': args.match_iou,
+            'conditions': results,
+        }, f, indent=2)
+    print(f"\n💾 Results saved to: {args.output}")
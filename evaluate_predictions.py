@@ -0,0 +1,331 @@
+"""
+🧮 Falcon Detection - Fast Evaluation from Cached Predictions
+Computes mAP50, mAP50-95, per-class precision / recall / F1 and PR curves
+from predictions that were saved once, instead of re-running model.val (and
+inference) for every metric or threshold.
+
+Prediction sources:
+- a model.val save_json file, e.g. runs/detect/val/predictions.json
+  (COCO format, category ids are class + 1 for this dataset)
+- a bulk_inference.py output directory (results-*.jsonl shards)
+
+Run model.val or bulk_inference.py with a low confidence threshold (e.g.
+--conf 0.001) so the cached predictions cover the whole PR curve; any higher
+threshold is then applied here.
+
+Predictions are matched to the YOLO labels once per image, for all ten IoU
+thresholds 0.50:0.95 at the same time (vectorized IoU, greedy matching on
+IoU as in model.val). Every metric after that is array arithmetic on the
+confidence-sorted matches, so sweeping --conf or --match-iou takes well
+under a second.
+
+Usage:
+    python evaluate_predictions.py
+    python evaluate_predictions.py --predictions runs/bulk/test3 --conf 0.25 0.4 0.5
+    python evaluate_predictions.py --predictions runs/detect/val3/predictions.json --nms-iou 0.5
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import yaml
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend'))
+from detection_ops import greedy_nms, pairwise_iou  # Same NMS as the backend's per-class thresholds
+
+TEST_IMAGE_DIR = Path("test3/images")
+TEST_LABEL_DIR = Path("test3/labels")
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+CONF_GRID = np.linspace(0, 1, 1001)
+
+
+def load_class_names(dataset: str = 'dataset.yaml') -> dict:
+    with open(dataset, 'r') as f:
+        return {int(k): v for k, v in yaml.safe_load(f)['names'].items()}
+
+
+def load_predictions(source: str, category_offset: int = None) -> tuple:
+    """({image stem: N x 6 [x1, y1, x2, y2, conf, class]}, {image stem: (width, height)}) from a cached run"""
+    source = Path(source)
+    predictions, sizes = {}, {}
+    if source.is_dir():
+        for shard in sorted(source.glob('results-*.jsonl')):
+            with open(shard) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Line cut off by a crash (bulk_inference.py redoes that image)
+                    stem = Path(record['image']).stem
+                    predictions[stem] = np.array(record['boxes'], dtype=np.float64).reshape(-1, 6)
+                    sizes[stem] = (record['width'], record['height'])
+        return predictions, sizes
+
+    with open(source) as f:
+        records = json.load(f)
+    if not records:
+        return predictions, sizes
+    if category_offset is None:
+        # model.val numbers categories from 1 on non-COCO datasets (older versions from 0)
+        category_offset = 1 if min(r['category_id'] for r in records) >= 1 else 0
+    rows = {}
+    for r in records:
+        x, y, w, h = r['bbox']
+        # image_id is int(stem) for numeric stems ("000123" -> 123), so prefer the file name
+        stem = Path(r['file_name']).stem if 'file_name' in r else str(r['image_id'])
+        rows.setdefault(stem, []).append([x, y, x + w, y + h, r['score'], r['category_id'] - category_offset])
+    predictions = {stem: np.array(boxes, dtype=np.float64) for stem, boxes in rows.items()}
+    return predictions, sizes
+
+
+def load_ground_truth(label_dir: Path, image_dir: Path, sizes: dict = None) -> dict:
+    """{image stem: N x 5 [x1, y1, x2, y2, class]} in pixels, for every label file"""
+    sizes = dict(sizes or {})
+    images = {p.stem: p for p in image_dir.glob('*') if p.suffix.lower() in IMAGE_EXTENSIONS} \
+        if image_dir.exists() else {}
+    ground_truth = {}
+    for label_path in sorted(label_dir.glob('*.txt')):
+        stem = label_path.stem
+        if stem not in sizes:
+            if stem not in images:
+                continue
+            with Image.open(images[stem]) as image:  # Reads the header only
+                sizes[stem] = image.size
+        w, h = sizes[stem]
+        labels = np.array(label_path.read_text().split(), dtype=np.float64).reshape(-1, 5)
+        cls, cx, cy, bw, bh = labels.T
+        ground_truth[stem] = np.stack([(cx - bw / 2) * w, (cy - bh / 2) * h,
+                                       (cx + bw / 2) * w, (cy + bh / 2) * h, cls], axis=1)
+    return ground_truth
+
+
+def match_image(pred: np.ndarray, gt: np.ndarray) -> np.ndarray:
+    """
+    D x 10 true-positive matrix of one-to-one same-class matches per IoU
+    threshold, as model.val does: every prediction takes its best label,
+    then every label keeps its most confident prediction (pred must be
+    sorted by descending confidence)
+    """
+    tp = np.zeros((len(pred), len(IOU_THRESHOLDS)), dtype=bool)
+    if not len(pred) or not len(gt):
+        return tp
+    iou = pairwise_iou(pred, gt)
+    iou[pred[:, None, 5] != gt[None, :, 4]] = 0
+    for t, threshold in enumerate(IOU_THRESHOLDS):
+        p, g = np.nonzero(iou >= threshold)
+        if not len(p):
+            continue
+        order = np.argsort(-iou[p, g], kind='stable')
+        p, g = p[order], g[order]
+        _, first = np.unique(p, return_index=True)  # Best label per prediction, now in prediction order
+        p, g = p[first], g[first]
+        _, first = np.unique(g, return_index=True)  # Most confident prediction per label
+        tp[p[first], t] = True
+    return tp
+
+
+class MatchedPredictions:
+    """
+    Every prediction of a run matched against the labels once
+
+    Holds flat arrays over all predictions (confidence, class, image index,
+    true-positive flags at each IoU threshold) and the label classes, so
+    metrics for any subset of images or any confidence threshold are plain
+    array operations.
+    """
+
+    def __init__(self, predictions: dict, ground_truth: dict, nms_iou: float = None):
+        self.images = sorted(ground_truth)
+        conf, cls, image_index, tp, gt_cls, gt_image = [], [], [], [], [], []
+        for index, stem in enumerate(self.images):
+            pred = predictions.get(stem, np.zeros((0, 6)))
+            pred = pred[np.argsort(-pred[:, 4], kind='stable')]
+            if nms_iou is not None:
+                pred = greedy_nms(pred, nms_iou)
+            gt = ground_truth[stem]
+            tp.append(match_image(pred, gt))
+            conf.append(pred[:, 4])
+            cls.append(pred[:, 5])
+            image_index.append(np.full(len(pred), index))
+            gt_cls.append(gt[:, 4])
+            gt_image.append(np.full(len(gt), index))
+        self.conf = np.concatenate(conf)
+        self.cls = np.concatenate(cls).astype(int)
+        self.image_index = np.concatenate(image_index).astype(int)
+        self.tp = np.concatenate(tp)
+        self.gt_cls = np.concatenate(gt_cls).astype(int)
+        self.gt_image = np.concatenate(gt_image).astype(int)
+        self.unmatched_images = len(set(predictions) - set(ground_truth))
+
+    def subset(self, image_mask: np.ndarray) -> "MatchedPredictions":
+        """The same matches restricted to the images where image_mask is True"""
+        subset = object.__new__(MatchedPredictions)
+        keep, keep_gt = image_mask[self.image_index], image_mask[self.gt_image]
+        subset.images = [stem for stem, selected in zip(self.images, image_mask) if selected]
+        subset.conf, subset.cls, subset.image_index, subset.tp = (
+            self.conf[keep], self.cls[keep], self.image_index[keep], self.tp[keep])
+        subset.gt_cls, subset.gt_image = self.gt_cls[keep_gt], self.gt_image[keep_gt]
+        subset.unmatched_images = 0
+        return subset
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> float:
+    """Area under the PR envelope, 101-point interpolation (COCO / model.val)"""
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(np.concatenate(([1.0], precision, [0.0])))))
+    y = np.interp(np.linspace(0, 1, 101), mrec, mpre)
+    return float((y[1:] + y[:-1]).sum() / 2 / 100)  # Trapezoidal rule
+
+
+def evaluate(matched: MatchedPredictions, classes: list, match_iou: float = 0.5, conf: float = 0.25) -> dict:
+    """
+    Per-class AP50, AP50-95, PR curves over CONF_GRID and precision / recall
+    / F1 at conf, matching at match_iou (one of 0.50, 0.55, .. 0.95)
+    """
+    t = int(np.argmin(np.abs(IOU_THRESHOLDS - match_iou)))
+    order = np.argsort(-matched.conf, kind='stable')
+    conf_sorted, cls_sorted, tp_sorted = matched.conf[order], matched.cls[order], matched.tp[order]
+
+    per_class, curves = {}, {}
+    for c in classes:
+        n_gt = int((matched.gt_cls == c).sum())
+        mask = cls_sorted == c
+        class_conf, class_tp = conf_sorted[mask], tp_sorted[mask]
+        tpc = np.cumsum(class_tp, axis=0)
+        fpc = np.cumsum(~class_tp, axis=0)
+        recall = tpc / max(n_gt, 1)
+        precision = tpc / np.maximum(tpc + fpc, 1)
+        ap = np.array([average_precision(recall[:, i], precision[:, i]) for i in range(len(IOU_THRESHOLDS))]) \
+            if n_gt and len(class_conf) else np.zeros(len(IOU_THRESHOLDS))
+
+        # Curves against confidence: predictions are sorted by descending confidence, so the
+        # metrics at threshold x are the cumulative counts at the last prediction with conf >= x
+        kept = np.searchsorted(-class_conf, -CONF_GRID, side='right')
+        tp_at = np.concatenate(([0], tpc[:, t]))[kept]
+        fp_at = np.concatenate(([0], fpc[:, t]))[kept]
+        p_curve = np.where(tp_at + fp_at > 0, tp_at / np.maximum(tp_at + fp_at, 1), 1.0)
+        r_curve = tp_at / max(n_gt, 1)
+        f1_curve = 2 * p_curve * r_curve / np.maximum(p_curve + r_curve, 1e-9)
+
+        at = int(np.searchsorted(CONF_GRID, conf))
+        best = int(np.argmax(f1_curve))
+        per_class[c] = {
+            'labels': n_gt,
+            'predictions': int(kept[at]),
+            'precision': float(p_curve[at]),
+            'recall': float(r_curve[at]),
+            'f1': float(f1_curve[at]),
+            'ap50': float(ap[0]),
+            'ap50_95': float(ap.mean()),
+            'best_f1': float(f1_curve[best]),
+            'best_f1_conf': float(CONF_GRID[best]),
+        }
+        curves[c] = {'precision': p_curve, 'recall': r_curve, 'f1': f1_curve, 'predictions': tp_at + fp_at}
+
+    present = [c for c in classes if per_class[c]['labels']]
+    mean = lambda key: float(np.mean([per_class[c][key] for c in present])) if present else 0.0
+    mean_f1 = np.mean([curves[c]['f1'] for c in present], axis=0) if present else np.zeros(len(CONF_GRID))
+    overall = {key: mean(key) for key in ('precision', 'recall', 'f1', 'ap50', 'ap50_95')}
+    overall['mAP50'], overall['mAP50_95'] = overall.pop('ap50'), overall.pop('ap50_95')
+    overall['best_f1'] = float(mean_f1.max())
+    overall['best_f1_conf'] = float(CONF_GRID[int(np.argmax(mean_f1))])
+    return {'overall': overall, 'per_class': per_class, 'curves': curves,
+            'conf': conf, 'match_iou': float(IOU_THRESHOLDS[t])}
+
+
+def load_matched(args) -> MatchedPredictions:
+    """Cached predictions and labels matched once, shared by the threshold and breakdown tools"""
+    predictions, sizes = load_predictions(args.predictions, args.category_offset)
+    ground_truth = load_ground_truth(Path(args.labels), Path(args.images), sizes)
+    return MatchedPredictions(predictions, ground_truth, args.nms_iou)
+
+
+def add_source_args(parser):
+    parser.add_argument('--predictions', default='runs/detect/val/predictions.json',
+                        help="model.val predictions.json or bulk_inference.py output directory")
+    parser.add_argument('--labels', default=str(TEST_LABEL_DIR), help="YOLO label directory")
+    parser.add_argument('--images', default=str(TEST_IMAGE_DIR), help="Image directory (for image sizes)")
+    parser.add_argument('--dataset', default='dataset.yaml', help="Class names")
+    parser.add_argument('--category-offset', type=int, default=None,
+                        help="predictions.json category_id - class (default: detect)")
+    parser.add_argument('--nms-iou', type=float, default=None,
+                        help="Re-apply class-aware NMS at this IoU (can only be stricter than the cached run)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mAP, PR curves and F1 from cached predictions")
+    add_source_args(parser)
+    parser.add_argument('--conf', type=float, nargs='+', default=[0.25], help="Confidence thresholds to report")
+    parser.add_argument('--match-iou', type=float, default=0.5, help="IoU for precision / recall / F1")
+    parser.add_argument('--output', default='evaluation_results.json')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("🧮 FALCON FAST EVALUATION")
+    print("=" * 70)
+
+    names = load_class_names(args.dataset)
+    started = time.perf_counter()
+    matched = load_matched(args)
+    if not matched.images:
+        print(f"\n❌ No labelled images found in {args.labels}")
+        exit(1)
+    print(f"\n📁 Predictions: {args.predictions} ({len(matched.conf)} boxes)")
+    print(f"🏷️  Labels: {args.labels} ({len(matched.images)} images, {len(matched.gt_cls)} objects)")
+    if matched.unmatched_images:
+        print(f"⚠️  {matched.unmatched_images} predicted images have no label file (or no image to read its size from) and were ignored")
+    print(f"⏱️  Loaded and matched in {time.perf_counter() - started:.2f}s")
+
+    results = {}
+    for conf in args.conf:
+        started = time.perf_counter()
+        result = evaluate(matched, list(names), args.match_iou, conf)
+        elapsed = time.perf_counter() - started
+        results[f"{conf:g}"] = result
+
+        overall = result['overall']
+        print("\n" + "=" * 70)
+        print(f"📊 conf >= {conf:g}, IoU {result['match_iou']:.2f}  (computed in {elapsed * 1000:.0f}ms)")
+        print("=" * 70)
+        print(f"   mAP50     : {overall['mAP50']:.4f}")
+        print(f"   mAP50-95  : {overall['mAP50_95']:.4f}")
+        print(f"   Precision : {overall['precision']:.4f}")
+        print(f"   Recall    : {overall['recall']:.4f}")
+        print(f"   F1-Score  : {overall['f1']:.4f}  (best {overall['best_f1']:.4f} at conf {overall['best_f1_conf']:.3f})")
+        print(f"\n{'Class':<22} {'Labels':>7} {'P':>7} {'R':>7} {'F1':>7} {'AP50':>7} {'AP50-95':>8} {'BestConf':>9}")
+        print("-" * 70)
+        for c, stats in result['per_class'].items():
+            print(f"{names[c].replace('_', ' '):<22} {stats['labels']:>7} {stats['precision']:>7.3f} "
+                  f"{stats['recall']:>7.3f} {stats['f1']:>7.3f} {stats['ap50']:>7.3f} {stats['ap50_95']:>8.3f} "
+                  f"{stats['best_f1_conf']:>9.3f}")
+
+    # Curves once (they do not depend on conf), every 10th grid point to keep the file small
+    curves = next(iter(results.values()))['curves']
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'predictions': args.predictions,
+            'labels': args.labels,
+            'nms_iou': args.nms_iou,
+            'match_iou': args.match_iou,
+            'images': len(matched.images),
+            'results': {conf: {'overall': r['overall'],
+                               'per_class': {names[c]: s for c, s in r['per_class'].items()}}
+                        for conf, r in results.items()},
+            'pr_curves': {
+                'conf': CONF_GRID[::10].round(3).tolist(),
+                **{names[c]: {key: values[::10].round(4).tolist() for key, values in curve.items()}
+                   for c, curve in curves.items()},
+            },
+        }, f, indent=2)
+    print(f"\n💾 Results saved to: {args.output}")
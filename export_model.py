@@ -0,0 +1,92 @@
+"""
+⚡ Falcon Detection - Model Export
+NASA Space Apps Challenge 2025
+
+Export the trained YOLOv8m weights to faster CPU inference formats:
+- ONNX (served with ONNX Runtime)
+- OpenVINO IR (optional)
+
+The exported files are written next to best.pt, where the backend looks for
+them when FALCON_MODEL_BACKEND is set to 'onnx' or 'openvino'.
+
+Usage:
+    python export_model.py
+    python export_model.py --formats onnx openvino
+"""
+
+import os
+# Fix OpenMP duplicate library error on Windows
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+from pathlib import Path
+from ultralytics import YOLO
+
+MODEL_PATH = "runs/train/falcon_yolov8m_final/weights/best.pt"
+SUPPORTED_FORMATS = ['onnx', 'openvino']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export Falcon YOLOv8m to ONNX / OpenVINO")
+    parser.add_argument('--weights', default=MODEL_PATH, help="PyTorch weights to export")
+    parser.add_argument('--formats', nargs='+', default=['onnx'], choices=SUPPORTED_FORMATS,
+                        help="Export formats")
+    parser.add_argument('--imgsz', type=int, default=640, help="Inference image size")
+    parser.add_argument('--opset', type=int, default=None, help="ONNX opset version")
+    parser.add_argument('--static', action='store_true',
+                        help="Export a fixed batch size of 1 (serve it with FALCON_BATCH_MAX_SIZE=1)")
+    return parser.parse_args()
+
+
+def export_model(weights: Path, export_format: str, imgsz: int, dynamic: bool, opset=None) -> Path:
+    """Export weights to a single format and return the exported path"""
+    model = YOLO(str(weights))
+    export_args = dict(format=export_format, imgsz=imgsz, dynamic=dynamic, device='cpu')
+    if export_format == 'onnx':
+        export_args['simplify'] = True
+        if opset is not None:
+            export_args['opset'] = opset
+    return Path(model.export(**export_args))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    print("=" * 60)
+    print("⚡ FALCON DETECTION - MODEL EXPORT")
+    print("NASA Space Apps Challenge 2025 - Duality AI")
+    print("=" * 60)
+
+    weights = Path(args.weights)
+    if not weights.exists():
+        print(f"\n❌ Model not found at: {weights}")
+        print("📝 Train the model first:")
+        print("   python train_model.py")
+        exit(1)
+
+    print(f"\n📦 Weights: {weights}")
+    print(f"   Formats: {', '.join(args.formats)}")
+    print(f"   Image Size: {args.imgsz}x{args.imgsz}")
+    print(f"   Dynamic batch: {not args.static}")
+
+    exported = {}
+    for export_format in args.formats:
+        print(f"\n🔄 Exporting to {export_format}...")
+        try:
+            exported[export_format] = export_model(weights, export_format, args.imgsz,
+                                                   dynamic=not args.static, opset=args.opset)
+            print(f"   ✅ Saved to {exported[export_format]}")
+        except Exception as e:
+            print(f"   ❌ Export to {export_format} failed: {e}")
+
+    print("\n" + "=" * 60)
+    print("✅ Export Complete!" if exported else "❌ No model exported")
+    print("=" * 60)
+
+    if exported:
+        print("\n🎯 Next Steps:")
+        print("1. Compare latency: python benchmark_backends.py")
+        print(f"2. Serve it: set FALCON_MODEL_BACKEND={next(iter(exported))} and run cd backend && python app.py")
+        if args.static:
+            print("   The export takes one image per call: also set FALCON_BATCH_MAX_SIZE=1 "
+                  "(the backend otherwise splits every micro-batch)")
@@ -11,6 +11,7 @@ import axios from 'axios';
 import './App.css';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
+const WS_URL = API_URL.replace(/^http/, 'ws') + '/ws/detect';
 
 const CLASS_COLORS = [
   '#FF6B6B', // Oxygen Tank - Red
@@ -57,8 +58,12 @@ function App() {
   const detectionInterval = useRef(null);
   const fpsInterval = useRef(null);
   const frameCount = useRef(0);
+  const sessionId = useRef(Math.random().toString(36).slice(2));
   const lastDetectionCount = useRef({});
   const voiceAnnouncementTimeout = useRef(null);
+  const detectionSocket = useRef(null);
+  const framesSent = useRef(0);
+  const frameSendTimes = useRef({});
 
   // Fetch stats on mount
   useEffect(() => {
@@ -168,7 +173,8 @@ function App() {
       formData.append('file', file);
 
       const response = await axios.post(`${API_URL}/predict/image`, formData, {
-        headers: { 'Content-Type': 'multipart/form-data' }
+        headers: { 'Content-Type': 'multipart/form-data' },
+        params: { render: 'jpeg' }
       });
 
       const endTime = Date.now();
@@ -241,6 +247,49 @@ function App() {
     });
   }, []);
 
+  const handleStreamMessage = useCallback((event) => {
+    const message = JSON.parse(event.data);
+    
+    // Measure end-to-end latency using the per-connection sequence number
+    const sentAt = frameSendTimes.current[message.seq];
+    Object.keys(frameSendTimes.current).forEach(seq => {
+      if (Number(seq) <= message.seq) delete frameSendTimes.current[seq];
+    });
+    if (sentAt !== undefined) {
+      setProcessingTime(Math.round(performance.now() - sentAt));
+    }
+    if (message.error) return;
+
+    // Expand compact [x1, y1, x2, y2, conf, class_id] rows
+    const streamDetections = message.detections.map(([x1, y1, x2, y2, confidence, classId]) => ({
+      class: CLASS_NAMES[classId]?.key || `Class_${classId}`,
+      class_id: classId,
+      confidence,
+      bbox: { x1, y1, x2, y2 }
+    }));
+
+    setDetections(streamDetections);
+    drawBoundingBoxes(streamDetections);
+    announceDetections(streamDetections);
+  }, [drawBoundingBoxes, announceDetections]);
+
+  const openDetectionSocket = () => {
+    const socket = new WebSocket(WS_URL);
+    socket.binaryType = 'arraybuffer';
+    socket.onmessage = handleStreamMessage;
+    socket.onerror = (error) => console.error('Webcam stream error:', error);
+    framesSent.current = 0;
+    frameSendTimes.current = {};
+    detectionSocket.current = socket;
+  };
+
+  const closeDetectionSocket = () => {
+    if (detectionSocket.current) {
+      detectionSocket.current.close();
+      detectionSocket.current = null;
+    }
+  };
+
   const captureAndDetect = useCallback(async () => {
     if (!webcamRef.current || !isDetecting) return;
 
@@ -249,9 +298,24 @@ function App() {
 
     frameCount.current++;
 
+    // Stream binary JPEG frames over the WebSocket when it is connected
+    const socket = detectionSocket.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      // Skip this frame if the previous one is still being sent
+      if (socket.bufferedAmount > 0) return;
+      const frame = await (await fetch(imageSrc)).blob();
+      framesSent.current++;
+      frameSendTimes.current[framesSent.current] = performance.now();
+      socket.send(frame);
+      return;
+    }
+
+    // Fallback: base64 polling
     try {
+      // The session id lets the server reuse detections for unchanged frames
       const response = await axios.post(`${API_URL}/predict/base64`, {
-        image: imageSrc
+        image: imageSrc,
+        session: sessionId.current
       });
 
       setDetections(response.data.detections);
@@ -267,6 +331,7 @@ function App() {
   const startDetection = () => {
     setIsDetecting(true);
     frameCount.current = 0;
+    openDetectionSocket();
     
     detectionInterval.current = setInterval(captureAndDetect, 200); // 5 FPS
     fpsInterval.current = setInterval(() => {
@@ -276,6 +341,7 @@ function App() {
   };
 
   const stopDetection = () => {
+    closeDetectionSocket();
     if (detectionInterval.current) {
       clearInterval(detectionInterval.current);
       detectionInterval.current = null;
@@ -0,0 +1,353 @@
+"""
+🎥 Falcon Detection - Webcam Load Test
+How many live webcam sessions can one backend node sustain?
+
+Every simulated session behaves like the web app's webcam loop
+(setInterval(captureAndDetect, 200) in frontend/src/App.js): it captures a
+frame every 1 / --fps seconds and sends it either
+- base64: as a JSON POST to /predict/base64 with a per-session id (the
+  polling fallback); a tick is dropped when the session already has
+  --max-inflight requests outstanding
+- ws:     as a binary frame on its own /ws/detect connection (the streaming
+  path); the server drops frames that arrive while one is being processed
+  and frames never answered count as dropped
+
+Frames are replayed from --frames (a directory of images) or generated
+synthetically: a short looping clip with a slowly moving object and sensor
+noise, every session starting at a different point of the loop.
+
+For every session count the sessions run concurrently for --duration seconds
+(the first --warmup seconds are not measured) and the harness reports the
+achieved FPS per session, p50/p95/p99 latency, the dropped-frame ratio and
+errors. A session count is sustainable when nearly every session keeps its
+frame rate (10th percentile of per-session FPS >= --fps-tolerance x --fps),
+p95 latency stays under --max-p95-ms and under 1% of requests fail.
+
+Without --sessions the saturation point is searched automatically: the
+session count doubles until it is no longer sustainable, then a binary
+search between the last good and the first bad count finds the maximum.
+
+Requires httpx, and websockets for --mode ws (installed with uvicorn[standard]).
+
+Usage:
+    python load_test_webcam.py --start-server
+    python load_test_webcam.py --url http://gpu-node:8000 --mode ws --sessions 4 8 16
+    python load_test_webcam.py --start-server --frames test3/images --duration 30 --max-p95-ms 500
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import asyncio
+import base64
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import httpx
+import numpy as np
+
+from benchmark_startup import free_port, wait_for
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def load_frames(source: str, count: int, width: int, height: int, quality: int) -> list:
+    """JPEG frames from an image directory, or a synthetic looping clip"""
+    if source:
+        images = []
+        for path in sorted(p for p in Path(source).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS):
+            if len(images) >= count:
+                break
+            image = cv2.imread(str(path))
+            if image is None:
+                print(f"⚠️  Skipping unreadable image: {path}")
+                continue
+            images.append(cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA))
+    else:
+        rng = np.random.default_rng(0)
+        background = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 5)
+        images = []
+        for i in range(count):
+            image = background.copy()
+            x = int((width - width // 4) * (0.5 + 0.5 * np.sin(2 * np.pi * i / count)))
+            cv2.rectangle(image, (x, height // 3), (x + width // 4, height // 3 + height // 3), (40, 40, 200), -1)
+            noise = rng.integers(-3, 4, image.shape)
+            images.append(np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    return [cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes() for image in images]
+
+
+class SessionStats:
+    """What one simulated webcam session saw during the measured window"""
+
+    def __init__(self):
+        self.sent = 0
+        self.completed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.gated = 0
+        self.latencies = []
+
+    def record(self, message: dict, latency_ms: float):
+        if message.get('error'):
+            self.errors += 1
+            return
+        self.completed += 1
+        self.gated += bool(message.get('gated'))
+        self.latencies.append(latency_ms)
+
+
+async def base64_session(client, frames: list, offset: int, args, measure_from: float, stop_at: float,
+                         stats: SessionStats):
+    """Polling fallback: one JSON POST per tick, ticks dropped while max_inflight requests are pending"""
+    loop = asyncio.get_running_loop()
+    payloads = [f"data:image/jpeg;base64,{base64.b64encode(frame).decode()}" for frame in frames]
+    session_id = f"loadtest-{offset}"
+    inflight = set()
+
+    async def request(payload: str, measured: bool):
+        started = loop.time()
+        try:
+            response = await client.post('/predict/base64', json={'image': payload, 'session': session_id})
+            message = response.json() if response.status_code == 200 else {'error': response.status_code}
+        except (httpx.HTTPError, ValueError) as e:
+            message = {'error': str(e)}
+        if measured:
+            stats.record(message, (loop.time() - started) * 1000)
+
+    tick = loop.time() + (offset % 97) / 97 / args.fps  # Sessions do not all fire at once
+    index = offset
+    while tick < stop_at:
+        await asyncio.sleep(max(0.0, tick - loop.time()))
+        measured = tick >= measure_from
+        tick += 1 / args.fps
+        index += 1
+        if measured:
+            stats.sent += 1
+        if len(inflight) >= args.max_inflight:
+            stats.dropped += measured
+            continue
+        task = asyncio.create_task(request(payloads[index % len(payloads)], measured))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+    if inflight:
+        await asyncio.wait(inflight, timeout=args.request_timeout)
+
+
+async def ws_session(url: str, frames: list, offset: int, args, measure_from: float, stop_at: float,
+                     stats: SessionStats):
+    """Streaming path: one binary frame per tick on a dedicated WebSocket, replies matched by sequence number"""
+    import websockets
+
+    loop = asyncio.get_running_loop()
+    sent_at = {}
+    async with websockets.connect(url, max_size=None) as socket:
+        async def receive():
+            async for raw in socket:
+                message = json.loads(raw)
+                seq = message.get('seq', 0)
+                started = sent_at.pop(seq, None)
+                if started is not None:
+                    stats.record(message, (loop.time() - started) * 1000)
+                # Replies come in order, so earlier frames still waiting were dropped by the server
+                for skipped in [s for s in sent_at if s < seq]:
+                    del sent_at[skipped]
+                    stats.dropped += 1
+
+        receiver = asyncio.create_task(receive())
+        tick = loop.time() + (offset % 97) / 97 / args.fps
+        index = offset
+        seq = 0
+        while tick < stop_at:
+            await asyncio.sleep(max(0.0, tick - loop.time()))
+            measured = tick >= measure_from
+            tick += 1 / args.fps
+            index += 1
+            seq += 1
+            if measured:
+                stats.sent += 1
+                sent_at[seq] = loop.time()
+            await socket.send(frames[index % len(frames)])
+        # Let the last replies arrive, then whatever was never answered was dropped
+        deadline = loop.time() + min(args.request_timeout, 5.0)
+        while sent_at and loop.time() < deadline and not receiver.done():
+            await asyncio.sleep(0.05)
+        receiver.cancel()
+    stats.dropped += len(sent_at)
+
+
+async def run_level(sessions: int, frames: list, args) -> dict:
+    """All sessions concurrently for warmup + duration seconds"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    measure_from, stop_at = started + args.warmup, started + args.warmup + args.duration
+    stats = [SessionStats() for _ in range(sessions)]
+    offsets = [i * len(frames) // sessions for i in range(sessions)]
+
+    if args.mode == 'base64':
+        limits = httpx.Limits(max_connections=sessions * args.max_inflight,
+                              max_keepalive_connections=sessions * args.max_inflight)
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.request_timeout, limits=limits) as client:
+            await asyncio.gather(*(base64_session(client, frames, offset, args, measure_from, stop_at, s)
+                                   for offset, s in zip(offsets, stats)))
+    else:
+        ws_url = args.url.replace('http', 'ws', 1) + '/ws/detect'
+        await asyncio.gather(*(ws_session(ws_url, frames, offset, args, measure_from, stop_at, s)
+                               for offset, s in zip(offsets, stats)))
+
+    session_fps = np.array([s.completed / args.duration for s in stats])
+    latencies = np.concatenate([s.latencies for s in stats]) if any(s.latencies for s in stats) else np.zeros(1)
+    sent = sum(s.sent for s in stats)
+    completed = sum(s.completed for s in stats)
+    errors = sum(s.errors for s in stats)
+    result = {
+        'sessions': sessions,
+        'target_fps': args.fps,
+        'fps_mean': float(session_fps.mean()),
+        'fps_p10': float(np.percentile(session_fps, 10)),
+        'fps_min': float(session_fps.min()),
+        'total_fps': float(session_fps.sum()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'frames_sent': sent,
+        'dropped_ratio': sum(s.dropped for s in stats) / sent if sent else 0.0,
+        'error_ratio': errors / (completed + errors) if completed + errors else 0.0,
+        'gated_ratio': sum(s.gated for s in stats) / completed if completed else 0.0,
+    }
+    result['sustainable'] = (result['fps_p10'] >= args.fps * args.fps_tolerance
+                             and result['p95_ms'] <= args.max_p95_ms and result['error_ratio'] < 0.01)
+    return result
+
+
+async def find_saturation(frames: list, args) -> tuple:
+    """Explicit session counts, or doubling then binary search for the largest sustainable count"""
+    levels = {}
+
+    async def measure(sessions: int) -> bool:
+        if sessions not in levels:
+            print(f"\n🔬 {sessions} session(s)...")
+            levels[sessions] = await run_level(sessions, frames, args)
+            r = levels[sessions]
+            print(f"   FPS/session {r['fps_mean']:.2f} (p10 {r['fps_p10']:.2f}), p95 {r['p95_ms']:.0f}ms, "
+                  f"dropped {r['dropped_ratio']:.1%}, errors {r['error_ratio']:.1%} "
+                  f"-> {'✅ sustainable' if r['sustainable'] else '❌ saturated'}")
+        return levels[sessions]['sustainable']
+
+    if args.sessions:
+        for sessions in args.sessions:
+            await measure(sessions)
+        good = [s for s in args.sessions if levels[s]['sustainable']]
+        return sorted(levels.values(), key=lambda r: r['sessions']), max(good) if good else 0
+
+    good, bad = 0, None
+    sessions = 1
+    while sessions <= args.max_sessions:
+        if not await measure(sessions):
+            bad = sessions
+            break
+        good = sessions
+        sessions *= 2
+    if bad is not None:
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            if await measure(middle):
+                good = middle
+            else:
+                bad = middle
+    return sorted(levels.values(), key=lambda r: r['sessions']), good
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent webcam session load test with saturation search")
+    parser.add_argument('--url', default='http://localhost:8000', help="Backend to load (ignored with --start-server)")
+    parser.add_argument('--start-server', action='store_true', help="Start a local backend under uvicorn")
+    parser.add_argument('--env', nargs='*', default=[], help="Extra env vars for --start-server")
+    parser.add_argument('--mode', choices=['base64', 'ws'], default='base64')
+    parser.add_argument('--sessions', type=int, nargs='+', default=None,
+                        help="Session counts to run (default: search for the saturation point)")
+    parser.add_argument('--max-sessions', type=int, default=256, help="Upper bound of the automatic search")
+    parser.add_argument('--fps', type=float, default=5.0, help="Frames per second per session (App.js: 5)")
+    parser.add_argument('--max-inflight', type=int, default=1, help="base64: outstanding requests per session")
+    parser.add_argument('--duration', type=float, default=20.0, help="Measured seconds per session count")
+    parser.add_argument('--warmup', type=float, default=3.0, help="Unmeasured seconds at the start of each count")
+    parser.add_argument('--fps-tolerance', type=float, default=0.9)
+    parser.add_argument('--max-p95-ms', type=float, default=1000.0)
+    parser.add_argument('--frames', default=None, help="Image directory to replay (default: synthetic frames)")
+    parser.add_argument('--clip-frames', type=int, default=50, help="Frames in the replayed / synthetic loop")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--quality', type=int, default=92, help="JPEG quality (react-webcam default: 0.92)")
+    parser.add_argument('--request-timeout', type=float, default=30.0)
+    parser.add_argument('--timeout', type=float, default=300.0, help="Seconds to wait for --start-server")
+    parser.add_argument('--output', default='load_test_webcam_results.json')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("🎥 FALCON WEBCAM LOAD TEST")
+    print("=" * 70)
+
+    frames = load_frames(args.frames, args.clip_frames, args.width, args.height, args.quality)
+    if not frames:
+        print(f"\n❌ No readable images found in {args.frames}")
+        exit(1)
+    print(f"\n📸 Frames: {len(frames)} x {args.width}x{args.height} "
+          f"({'replayed from ' + args.frames if args.frames else 'synthetic'})")
+    print(f"⚙️  Mode: {args.mode}, {args.fps:g} FPS per session, {args.duration:g}s per level")
+
+    server = None
+    server_env = dict(item.split('=', 1) for item in args.env)
+    if args.start_server:
+        port = free_port()
+        args.url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1', '--port', str(port),
+             '--log-level', 'warning'],
+            cwd='backend', env={**os.environ, **server_env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+    try:
+        if server is not None:
+            wait_for(f"{args.url}/ready", time.perf_counter() + args.timeout, server)
+        print(f"🌐 Target: {args.url}")
+        levels, saturation = asyncio.run(find_saturation(frames, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(20)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    print("\n" + "=" * 70)
+    print("📊 SESSIONS vs ACHIEVED FPS")
+    print("=" * 70)
+    print(f"{'Sessions':>8} {'FPS/sess':>9} {'p10 FPS':>8} {'Total':>8} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'Drop':>6} {'Err':>6}")
+    print("-" * 70)
+    for r in levels:
+        marker = " ✅" if r['sustainable'] else " ❌"
+        print(f"{r['sessions']:>8} {r['fps_mean']:>9.2f} {r['fps_p10']:>8.2f} {r['total_fps']:>8.1f} "
+              f"{r['p50_ms']:>7.0f}ms {r['p95_ms']:>7.0f}ms {r['p99_ms']:>7.0f}ms "
+              f"{r['dropped_ratio']:>6.1%} {r['error_ratio']:>6.1%}{marker}")
+    print(f"\n🏁 Sustainable sessions at {args.fps:g} FPS: {saturation}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'url': args.url,
+            'mode': args.mode,
+            'fps': args.fps,
+            'duration_s': args.duration,
+            'criteria': {'fps_tolerance': args.fps_tolerance, 'max_p95_ms': args.max_p95_ms},
+            'frames': args.frames or 'synthetic',
+            'frame_size': [args.width, args.height],
+            'server_env': server_env,
+            'levels': levels,
+            'sustainable_sessions': saturation,
+        }, f, indent=2)
+    print(f"\n💾 Results saved to: {args.output}")
@@ -0,0 +1,278 @@
+"""
+🗜️ Falcon Detection - INT8 Post-Training Quantization
+NASA Space Apps Challenge 2025
+
+Quantizes the trained YOLOv8m model to INT8 for faster CPU inference:
+1. Calibrates on a random sample of train_3 images (from dataset.yaml)
+2. Evaluates FP32 and INT8 models with the same model.val(split='test')
+   settings as test_accuracy.py
+3. Reports mAP50 / mAP50-95 deltas next to the latency gain
+4. Promotes the INT8 model (so the backend can load it) only if the
+   accuracy loss is within the allowed limits
+
+Backends:
+- onnx:     ONNX Runtime static QDQ quantization of the exported ONNX model
+- openvino: OpenVINO / NNCF quantization through the ultralytics exporter
+
+Usage:
+    python quantize_model.py
+    python quantize_model.py --backend openvino --calib-images 300 --max-map50-drop 0.005
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+from ultralytics import YOLO
+
+from benchmark_backends import benchmark, load_images
+
+MODEL_PATH = "runs/train/falcon_yolov8m_final/weights/best.pt"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_config():
+    """Load dataset configuration"""
+    with open('dataset.yaml', 'r') as f:
+        config = yaml.safe_load(f)
+    return config
+
+
+def sample_calibration_images(config: dict, count: int, seed: int) -> list:
+    """Random sample of train_3 image paths for calibration"""
+    train_dir = Path(config['path']) / config['train']
+    if not train_dir.exists():
+        train_dir = Path(config['train'])  # Dataset relative to the project folder
+    images = sorted(p for p in train_dir.glob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if not images:
+        raise FileNotFoundError(f"No calibration images found in {train_dir}")
+    random.Random(seed).shuffle(images)
+    return images[:count]
+
+
+def letterbox(image: np.ndarray, imgsz: int) -> np.ndarray:
+    """Resize with unchanged aspect ratio and pad to imgsz x imgsz (ultralytics LetterBox)"""
+    h, w = image.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas
+
+
+def quantize_onnx(weights: Path, calib_images: list, imgsz: int, output: Path) -> Path:
+    """Static INT8 quantization of the exported ONNX model with ONNX Runtime"""
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat,
+                                          QuantType, quantize_static)
+
+    fp32_path = weights.with_suffix('.onnx')
+    if not fp32_path.exists():
+        print("   Exporting FP32 ONNX model first...")
+        fp32_path = Path(YOLO(str(weights)).export(format='onnx', imgsz=imgsz, dynamic=True,
+                                                  simplify=True, device='cpu'))
+
+    class FalconCalibrationReader(CalibrationDataReader):
+        def __init__(self, paths):
+            self.paths = iter(paths)
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(str(path))
+                if image is None:
+                    continue
+                # BGR HWC uint8 -> RGB NCHW float32 in [0, 1], same as the ultralytics predictor
+                blob = letterbox(image, imgsz)[:, :, ::-1].transpose(2, 0, 1)
+                return {'images': np.ascontiguousarray(blob, dtype=np.float32)[None] / 255.0}
+            return None
+
+    model_input = fp32_path
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        model_input = Path(tempfile.mkdtemp()) / 'preprocessed.onnx'
+        quant_pre_process(str(fp32_path), str(model_input))
+    except Exception as e:
+        print(f"   ⚠️  Skipping ONNX pre-processing: {e}")
+        model_input = fp32_path
+
+    quantize_static(
+        str(model_input),
+        str(output),
+        FalconCalibrationReader(calib_images),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    return output
+
+
+def quantize_openvino(weights: Path, calib_images: list, imgsz: int, output: Path) -> Path:
+    """INT8 quantization with OpenVINO / NNCF, calibrated on the sampled train_3 images"""
+    config = load_config()
+    work_dir = Path(tempfile.mkdtemp())
+
+    # The ultralytics exporter calibrates on the 'val' split, so point it at the sample
+    calib_list = work_dir / 'calibration.txt'
+    calib_list.write_text('\n'.join(str(p.resolve()) for p in calib_images))
+    calib_yaml = work_dir / 'calibration.yaml'
+    with open(calib_yaml, 'w') as f:
+        yaml.safe_dump({'path': str(work_dir), 'train': str(calib_list), 'val': str(calib_list),
+                        'nc': config['nc'], 'names': config['names']}, f)
+
+    exported = Path(YOLO(str(weights)).export(format='openvino', int8=True, data=str(calib_yaml),
+                                              imgsz=imgsz, dynamic=True, device='cpu'))
+    if output.exists():
+        shutil.rmtree(output)
+    shutil.move(str(exported), str(output))
+    return output
+
+
+def evaluate(model_path: Path, imgsz: int, device: str) -> dict:
+    """Same test-set evaluation as test_accuracy.py"""
+    metrics = YOLO(str(model_path), task='detect').val(
+        data='dataset.yaml',
+        split='test',
+        batch=8,
+        imgsz=imgsz,
+        device=device,
+        plots=False,
+        conf=0.25,  # Confidence threshold
+        iou=0.6,    # IoU threshold for NMS
+        verbose=False,
+    )
+    return {
+        'mAP50': float(metrics.box.map50),
+        'mAP50_95': float(metrics.box.map),
+        'precision': float(metrics.box.mp),
+        'recall': float(metrics.box.mr),
+    }
+
+
+def promoted_path(weights: Path, backend: str) -> Path:
+    """Where the backend loads INT8 models from (see get_exported_model_path in backend/app.py)"""
+    if backend == 'onnx':
+        return weights.with_name(f"{weights.stem}_int8.onnx")
+    return weights.parent / f"{weights.stem}_int8_openvino_model"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization for Falcon YOLOv8m")
+    parser.add_argument('--weights', default=MODEL_PATH)
+    parser.add_argument('--backend', default='onnx', choices=['onnx', 'openvino'])
+    parser.add_argument('--calib-images', type=int, default=200, help="Number of train_3 calibration images")
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-map50-drop', type=float, default=0.01,
+                        help="Largest acceptable absolute mAP50 drop")
+    parser.add_argument('--max-map50-95-drop', type=float, default=0.015,
+                        help="Largest acceptable absolute mAP50-95 drop")
+    parser.add_argument('--latency-images', type=int, default=20)
+    parser.add_argument('--skip-eval', action='store_true', help="Quantize only (never promotes)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+    args = parse_args()
+
+    print("\n" + "=" * 70)
+    print("🗜️  FALCON INT8 QUANTIZATION")
+    print("=" * 70)
+
+    weights = Path(args.weights)
+    if not weights.exists():
+        print(f"\n❌ Model not found at: {weights}")
+        print("📝 Train the model first:")
+        print("   python train_model.py")
+        exit(1)
+
+    config = load_config()
+    calib_images = sample_calibration_images(config, args.calib_images, args.seed)
+    print(f"\n📦 Weights: {weights}")
+    print(f"   Backend: {args.backend}")
+    print(f"   Calibration: {len(calib_images)} train_3 images")
+
+    # Quantize into a candidate location first - promotion happens after evaluation
+    target = promoted_path(weights, args.backend)
+    candidate = target.with_name(target.name.replace('_int8', '_int8_candidate'))
+    print("\n🔄 Quantizing...")
+    if args.backend == 'onnx':
+        quantize_onnx(weights, calib_images, args.imgsz, candidate)
+    else:
+        quantize_openvino(weights, calib_images, args.imgsz, candidate)
+    print(f"   ✅ INT8 model written to {candidate}")
+
+    if args.skip_eval:
+        print("\n⚠️  Evaluation skipped - model was NOT promoted")
+        exit(0)
+
+    fp32_path = weights.with_suffix('.onnx') if args.backend == 'onnx' else weights
+    print("\n🔬 Evaluating FP32 and INT8 models on the test split...")
+    fp32_metrics = evaluate(fp32_path, args.imgsz, 'cpu')
+    int8_metrics = evaluate(candidate, args.imgsz, 'cpu')
+
+    print("\n⏱️  Measuring latency...")
+    images = load_images(args.latency_images, args.imgsz)
+    fp32_latency = benchmark(YOLO(str(fp32_path), task='detect'), images, args.imgsz, warmup=3)
+    int8_latency = benchmark(YOLO(str(candidate), task='detect'), images, args.imgsz, warmup=3)
+
+    map50_drop = fp32_metrics['mAP50'] - int8_metrics['mAP50']
+    map50_95_drop = fp32_metrics['mAP50_95'] - int8_metrics['mAP50_95']
+    speedup = fp32_latency['mean_ms'] / int8_latency['mean_ms']
+    accepted = map50_drop <= args.max_map50_drop and map50_95_drop <= args.max_map50_95_drop
+
+    print("\n" + "=" * 70)
+    print("📊 QUANTIZATION RESULTS")
+    print("=" * 70)
+    print(f"{'':<14} {'FP32':>10} {'INT8':>10} {'Delta':>10}")
+    print("-" * 70)
+    print(f"{'mAP50':<14} {fp32_metrics['mAP50']:>10.4f} {int8_metrics['mAP50']:>10.4f} {-map50_drop:>+10.4f}")
+    print(f"{'mAP50-95':<14} {fp32_metrics['mAP50_95']:>10.4f} {int8_metrics['mAP50_95']:>10.4f} {-map50_95_drop:>+10.4f}")
+    print(f"{'Latency (ms)':<14} {fp32_latency['mean_ms']:>10.1f} {int8_latency['mean_ms']:>10.1f} "
+          f"{speedup:>9.2f}x")
+
+    if accepted:
+        if target.is_dir():
+            shutil.rmtree(target)
+        elif target.exists():
+            target.unlink()
+        shutil.move(str(candidate), str(target))
+        print(f"\n✅ Accuracy loss within limits - promoted to {target}")
+        print(f"   Serve it: set FALCON_MODEL_BACKEND={args.backend}_int8")
+    else:
+        print(f"\n❌ Accuracy loss too large (max mAP50 drop {args.max_map50_drop}, "
+              f"max mAP50-95 drop {args.max_map50_95_drop}) - model NOT promoted")
+        print(f"   Candidate kept at {candidate} for inspection")
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'weights': str(weights),
+        'backend': args.backend,
+        'calibration_images': len(calib_images),
+        'fp32': {**fp32_metrics, 'latency': fp32_latency},
+        'int8': {**int8_metrics, 'latency': int8_latency},
+        'mAP50_drop': map50_drop,
+        'mAP50_95_drop': map50_95_drop,
+        'speedup': speedup,
+        'promoted': accepted,
+        'model_path': str(target if accepted else candidate),
+    }
+    report_file = Path('quantization_report.json')
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report saved to: {report_file}")
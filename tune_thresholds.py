@@ -0,0 +1,147 @@
+"""
+🎚️ Falcon Detection - Per-Class Threshold Tuning
+Picks a confidence and NMS IoU threshold for every class from cached
+test-set predictions (see evaluate_predictions.py) and writes them to the
+config the backend loads (FALCON_CLASS_THRESHOLDS, default
+backend/class_thresholds.json).
+
+The NMS IoU values are swept in parallel (one process each): the cached
+predictions are suppressed again at every --nms-ious value, matched once,
+and the whole confidence range is then read off the per-class PR curves.
+Re-suppressing can only make NMS stricter, so cache the predictions at the
+loosest IoU you want to try (e.g. model.val with iou=0.7, conf=0.001).
+
+Per class the operating point is, depending on --objective:
+- f1:        the highest F1
+- precision: the highest recall with precision >= --target
+- recall:    the highest precision (fewest boxes) with recall >= --target
+Classes that cannot reach the target get their best-effort point and are
+flagged.
+
+The backend runs the model at the lowest class confidence and the loosest
+class IoU and applies each class' thresholds to the output, so a higher
+per-class confidence also means fewer boxes through NMS and rendering.
+
+Usage:
+    python tune_thresholds.py
+    python tune_thresholds.py --objective precision --target 0.95
+    python tune_thresholds.py --predictions runs/bulk/test3 --nms-ious 0.4 0.5 0.6 --output class_thresholds.json
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from evaluate_predictions import (CONF_GRID, MatchedPredictions, add_source_args, evaluate, load_class_names,
+                                  load_ground_truth, load_predictions)
+
+
+def sweep_iou(predictions: dict, ground_truth: dict, classes: list, nms_iou: float, match_iou: float) -> dict:
+    """Per-class curves over the confidence grid after re-suppressing at nms_iou"""
+    matched = MatchedPredictions(predictions, ground_truth, nms_iou)
+    return evaluate(matched, classes, match_iou)['curves']
+
+
+def pick_operating_point(curve: dict, objective: str, target: float) -> tuple:
+    """(confidence grid index, target met) for one class' curves"""
+    precision, recall, f1, kept = curve['precision'], curve['recall'], curve['f1'], curve['predictions']
+    if objective == 'f1':
+        return int(np.argmax(f1)), True
+    # Ties go to the highest confidence: the same quality with the fewest boxes
+    if objective == 'precision':
+        meets = (precision >= target) & (kept > 0)
+        score = np.where(meets, recall, -1.0)
+        fallback = np.where(kept > 0, precision, -1.0)
+    else:
+        meets = recall >= target
+        score = np.where(meets, precision, -1.0)
+        fallback = recall
+    if not meets.any():
+        return len(fallback) - 1 - int(np.argmax(fallback[::-1])), False
+    return len(score) - 1 - int(np.argmax(score[::-1])), True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-class confidence / NMS IoU thresholds from cached predictions")
+    add_source_args(parser)
+    parser.add_argument('--nms-ious', type=float, nargs='+', default=[0.3, 0.4, 0.45, 0.5, 0.6, 0.7])
+    parser.add_argument('--objective', choices=['f1', 'precision', 'recall'], default='f1')
+    parser.add_argument('--target', type=float, default=0.9, help="Precision / recall the class must reach")
+    parser.add_argument('--match-iou', type=float, default=0.5, help="IoU for a prediction to count as a hit")
+    parser.add_argument('--min-conf', type=float, default=0.05, help="Never pick a confidence below this")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', default='backend/class_thresholds.json')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("🎚️  FALCON PER-CLASS THRESHOLD TUNING")
+    print("=" * 70)
+
+    names = load_class_names(args.dataset)
+    predictions, sizes = load_predictions(args.predictions, args.category_offset)
+    ground_truth = load_ground_truth(Path(args.labels), Path(args.images), sizes)
+    if not ground_truth:
+        print(f"\n❌ No labelled images found in {args.labels}")
+        exit(1)
+    print(f"\n📁 Predictions: {args.predictions} ({sum(len(p) for p in predictions.values())} boxes)")
+    print(f"🏷️  Labels: {args.labels} ({len(ground_truth)} images)")
+    print(f"🎯 Objective: {args.objective}" + (f" >= {args.target:g}" if args.objective != 'f1' else ""))
+
+    ious = sorted(set(args.nms_ious))
+    print(f"\n🔬 Sweeping NMS IoU {ious} on {min(args.workers, len(ious))} worker(s)...")
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(ious)))) as pool:
+        sweeps = dict(zip(ious, pool.map(sweep_iou, *zip(*[(predictions, ground_truth, list(names), iou,
+                                                            args.match_iou) for iou in ious]))))
+
+    allowed = CONF_GRID >= args.min_conf
+    chosen = {}
+    for c, name in names.items():
+        best = None
+        for iou, curves in sweeps.items():
+            curve = {key: np.where(allowed, values, -1.0 if key != 'predictions' else 0)
+                     for key, values in curves[c].items()}
+            index, met = pick_operating_point(curve, args.objective, args.target)
+            point = {
+                'conf': round(float(CONF_GRID[index]), 3),
+                'iou': iou,
+                'precision': round(float(curves[c]['precision'][index]), 4),
+                'recall': round(float(curves[c]['recall'][index]), 4),
+                'f1': round(float(curves[c]['f1'][index]), 4),
+                'target_met': met,
+            }
+            quality = {'f1': point['f1'], 'precision': point['recall'], 'recall': point['precision']}[args.objective]
+            # Prefer meeting the target, then quality, then fewer boxes (stricter NMS breaks ties)
+            rank = (met, quality, -int(curves[c]['predictions'][index]))
+            if best is None or rank > best[0]:
+                best = (rank, point)
+        chosen[name] = best[1]
+
+    print("\n" + "=" * 70)
+    print("📊 PER-CLASS OPERATING POINTS")
+    print("=" * 70)
+    print(f"{'Class':<22} {'Conf':>6} {'IoU':>6} {'P':>7} {'R':>7} {'F1':>7} {'Target':>7}")
+    print("-" * 70)
+    for name, point in chosen.items():
+        print(f"{name.replace('_', ' '):<22} {point['conf']:>6.3f} {point['iou']:>6.2f} {point['precision']:>7.3f} "
+              f"{point['recall']:>7.3f} {point['f1']:>7.3f} {'✅' if point['target_met'] else '❌':>6}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'predictions': args.predictions,
+            'objective': args.objective,
+            'target': args.target if args.objective != 'f1' else None,
+            'match_iou': args.match_iou,
+            'classes': chosen,
+        }, f, indent=2)
+    print(f"\n💾 Thresholds saved to: {output}")
+    print("   The backend loads them at startup (FALCON_CLASS_THRESHOLDS, default backend/class_thresholds.json)")
@@ -0,0 +1,167 @@
+"""
+🎬 Falcon Detection - Video Inference
+Detects and tracks objects in a video file without ever holding more than a
+batch of frames in memory.
+
+Pipeline:
+- Frames are decoded sequentially with cv2 in a background thread; only
+  every --stride-th frame is converted to an image (the rest are just
+  grabbed), and with --scene-change only frames that differ from the last
+  sampled one
+- Sampled frames are downscaled to --imgsz and run through the model in
+  batches while the next batch is being decoded
+- Detections are linked across sampled frames by a lightweight IoU tracker
+  (backend/detection_ops.py, shared with POST /predict/video); a track is
+  written to the output as soon as it ends
+
+Output (--output, one JSON line per track):
+    {"track_id": 3, "class": "Fire_Extinguisher", "first_frame": 40, "last_frame": 215,
+     "start_s": 1.333, "end_s": 7.167, "frames_detected": 36, "max_confidence": 0.91, ...}
+
+Usage:
+    python video_inference.py inspection.mp4
+    python video_inference.py inspection.mp4 --stride 10 --scene-change --output runs/video/tracks.jsonl
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend'))
+from detection_ops import IoUTracker, format_track  # Same tracker as POST /predict/video
+
+MODEL_PATH = "runs/train/falcon_yolov8m_final/weights/best.pt"
+KEYFRAME_INTERVAL = 150  # With --scene-change, sample at least one frame this often
+
+
+def read_batch(capture, state: dict, args) -> list:
+    """Next batch of sampled frames as (frame index, image, scale to original), [] at the end"""
+    batch = []
+    while len(batch) < args.batch_size:
+        if not capture.grab():
+            break
+        index = state['frames_read']
+        state['frames_read'] += 1
+        if index % args.stride:
+            continue
+        ok, frame = capture.retrieve()
+        if not ok:
+            continue
+        if args.scene_change:
+            thumbnail = cv2.cvtColor(cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            last = state.get('thumbnail')
+            if (last is not None and index - state['last_sampled'] < KEYFRAME_INTERVAL
+                    and cv2.absdiff(thumbnail, last).mean() / 255 < args.scene_threshold):
+                continue
+            state['thumbnail'] = thumbnail
+        state['last_sampled'] = index
+
+        h, w = frame.shape[:2]
+        scale = (1.0, 1.0)
+        if max(h, w) > args.imgsz:
+            gain = args.imgsz / max(h, w)
+            frame = cv2.resize(frame, (max(1, round(w * gain)), max(1, round(h * gain))),
+                               interpolation=cv2.INTER_AREA)
+            scale = (w / frame.shape[1], h / frame.shape[0])
+        state['frames_sampled'] += 1
+        batch.append((index, frame, scale))
+    return batch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming detection and tracking over a video file")
+    parser.add_argument('source', help="Video file (anything OpenCV/FFmpeg can read)")
+    parser.add_argument('--weights', default=MODEL_PATH)
+    parser.add_argument('--output', default='runs/video/tracks.jsonl', help="JSONL file, one line per track")
+    parser.add_argument('--stride', type=int, default=5, help="Sample every Nth frame")
+    parser.add_argument('--scene-change', action='store_true',
+                        help="Of the stride candidates, only sample frames that differ from the last sampled one")
+    parser.add_argument('--scene-threshold', type=float, default=0.08,
+                        help="Mean grayscale difference (0-1) that counts as a change")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--iou', type=float, default=0.6)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--track-iou', type=float, default=0.3, help="IoU to continue a track")
+    parser.add_argument('--track-high', type=float, default=0.4, help="Confidence needed to start a track")
+    parser.add_argument('--max-age', type=int, default=3, help="Sampled frames a track may be missed")
+    parser.add_argument('--min-hits', type=int, default=2, help="Drop tracks detected in fewer sampled frames")
+    args = parser.parse_args()
+    args.stride = max(1, args.stride)
+    if not 0 < args.track_iou <= 1:
+        parser.error("--track-iou must be in (0, 1]")
+
+    print("\n" + "=" * 70)
+    print("🎬 FALCON VIDEO INFERENCE")
+    print("=" * 70)
+
+    capture = cv2.VideoCapture(args.source)
+    if not capture.isOpened():
+        print(f"\n❌ Cannot open video: {args.source}")
+        exit(1)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    print(f"\n🎞️  Source: {args.source} ({int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))}x"
+          f"{int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))}, {fps:.1f} fps, "
+          f"{int(capture.get(cv2.CAP_PROP_FRAME_COUNT))} frames)")
+    print(f"⚙️  Stride: {args.stride}, scene change: {args.scene_change}, batch size: {args.batch_size}")
+
+    if not Path(args.weights).exists():
+        print(f"\n⚠️  Trained model not found at {args.weights}, using pretrained: yolov8m.pt")
+        args.weights = 'yolov8m.pt'
+    from ultralytics import YOLO
+    model = YOLO(args.weights, task='detect')
+    names = dict(model.names)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tracker = IoUTracker(args.track_iou, args.track_high, args.max_age)
+    state = {'frames_read': 0, 'frames_sampled': 0, 'last_sampled': 0}
+    detections = tracks = 0
+    started = time.perf_counter()
+
+    with open(output, 'w') as out, ThreadPoolExecutor(max_workers=1) as decoder:
+        def write(finished):
+            global tracks
+            for track in finished:
+                if track['hits'] >= args.min_hits:
+                    out.write(json.dumps(format_track(track, names)) + "\n")
+                    tracks += 1
+            out.flush()
+
+        pending = decoder.submit(read_batch, capture, state, args)
+        while True:
+            frames = pending.result()
+            if not frames:
+                break
+            # Decode the next batch while this one runs through the model
+            pending = decoder.submit(read_batch, capture, state, args)
+            results = model.predict([image for _, image, _ in frames], conf=args.conf, iou=args.iou,
+                                    imgsz=args.imgsz, verbose=False, device=args.device)
+            for (index, _, (sx, sy)), result in zip(frames, results):
+                boxes = result.boxes.data.cpu().numpy() * np.array([sx, sy, sx, sy, 1, 1], dtype=np.float32)
+                detections += len(boxes)
+                write(tracker.update(boxes, index, round(index / fps, 3) if fps > 0 else None))
+            print(f"   Frame {state['frames_read']}: {state['frames_sampled']} sampled, {tracks} tracks", end="\r")
+        write(tracker.flush())
+    capture.release()
+    elapsed = time.perf_counter() - started
+
+    print("\n\n" + "=" * 70)
+    print("📊 VIDEO INFERENCE SUMMARY")
+    print("=" * 70)
+    print(f"   Frames read: {state['frames_read']}")
+    print(f"   Frames sampled: {state['frames_sampled']}")
+    print(f"   Detections: {detections}")
+    print(f"   Tracks: {tracks}")
+    print(f"   Elapsed: {elapsed:.1f}s ({state['frames_read'] / elapsed:.1f} video frames/s)")
+    print(f"\n💾 Tracks: {output}")